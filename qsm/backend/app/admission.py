@@ -0,0 +1,134 @@
+import contextvars
+import json
+import math
+from typing import Any, Dict, Optional, Tuple, Union
+
+from . import metrics
+from .config import get_settings
+from .token_bucket import MemoryTokenBuckets, RedisTokenBuckets
+
+BucketStore = Union[MemoryTokenBuckets, RedisTokenBuckets]
+
+
+class UpstreamUsage:
+    """单个请求实际触发的夸克上游调用次数（未命中缓存的搜索）"""
+
+    __slots__ = ("quark_calls",)
+
+    def __init__(self) -> None:
+        self.quark_calls = 0
+
+
+_usage: contextvars.ContextVar[Optional[UpstreamUsage]] = contextvars.ContextVar("upstream_usage", default=None)
+
+
+def note_quark_call() -> None:
+    """夸克客户端真正发出上游请求时调用，供准入中间件按未命中缓存计费"""
+    usage = _usage.get()
+    if usage is not None:
+        usage.quark_calls += 1
+
+
+def _build_store() -> BucketStore:
+    settings = get_settings()
+    if settings.rate_limit_backend == "redis":
+        try:
+            return RedisTokenBuckets(
+                settings.redis_url, prefix="qsm:ratelimit:", retry_interval=settings.shared_state_retry_interval
+            )
+        except ImportError:
+            pass
+    return MemoryTokenBuckets()
+
+
+def _header(scope: Dict[str, Any], name: bytes) -> Optional[str]:
+    for key, value in scope.get("headers", []):
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+class AdmissionMiddleware:
+    """
+    按客户端限流的准入控制（仅作用于 RATE_LIMIT_PATH_PREFIX 下的接口）。
+
+    - 客户端以 RATE_LIMIT_API_KEYS 中登记的 X-API-Key 区分，否则按来源 IP；
+    - 每个请求先扣 RATE_LIMIT_HIT_COST（命中缓存的开销）；令牌不足时返回 429 与 Retry-After；
+    - 请求实际访问了夸克上游时，结束后按调用次数追加扣 RATE_LIMIT_MISS_COST，
+      响应头 X-Cache 标明 HIT / MISS。
+    """
+
+    def __init__(self, app, store: Optional[BucketStore] = None) -> None:
+        self.app = app
+        settings = get_settings()
+        self.enabled = settings.rate_limit_enabled
+        self.prefix = settings.rate_limit_path_prefix
+        self.rate = settings.rate_limit_rate
+        self.burst = settings.rate_limit_burst
+        self.hit_cost = settings.rate_limit_hit_cost
+        self.miss_cost = settings.rate_limit_miss_cost
+        self.trust_proxy = settings.rate_limit_trust_proxy
+        self.api_keys = {k.strip() for k in settings.rate_limit_api_keys.split(",") if k.strip()}
+        self.store = store if store is not None else _build_store()
+        bucket_source = self.store if isinstance(self.store, MemoryTokenBuckets) else self.store.fallback
+        metrics.ADMISSION_BUCKETS.set_function(lambda: len(bucket_source))
+
+    def client_key(self, scope: Dict[str, Any]) -> str:
+        api_key = _header(scope, b"x-api-key")
+        if api_key and api_key in self.api_keys:
+            return f"key:{api_key}"
+        if self.trust_proxy:
+            forwarded = _header(scope, b"x-forwarded-for")
+            if forwarded:
+                return f"ip:{forwarded.split(',')[0].strip()}"
+        client: Optional[Tuple[str, int]] = scope.get("client")
+        return f"ip:{client[0] if client else 'unknown'}"
+
+    async def __call__(self, scope, receive, send) -> None:
+        if not self.enabled or scope["type"] != "http" or not scope["path"].startswith(self.prefix):
+            await self.app(scope, receive, send)
+            return
+
+        key = self.client_key(scope)
+        wait = await self.store.take(key, self.hit_cost, self.rate, self.burst)
+        if wait > 0:
+            metrics.ADMISSION_LIMITED.inc()
+            await self._reject(send, wait)
+            return
+        metrics.ADMISSION_ALLOWED.inc()
+        metrics.ADMISSION_HIT_TOKENS.inc(self.hit_cost)
+
+        usage = UpstreamUsage()
+        token = _usage.set(usage)
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                cache_status = b"MISS" if usage.quark_calls else b"HIT"
+                message["headers"] = [*message.get("headers", []), (b"x-cache", cache_status)]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _usage.reset(token)
+            if usage.quark_calls:
+                extra = self.miss_cost * usage.quark_calls - self.hit_cost
+                if extra > 0:
+                    await self.store.charge(key, extra, self.rate, self.burst)
+                    metrics.ADMISSION_MISS_TOKENS.inc(extra)
+
+    async def _reject(self, send, wait: float) -> None:
+        retry_after = max(1, math.ceil(wait))
+        body = json.dumps(
+            {"detail": "请求过于频繁，请稍后重试", "retry_after": retry_after}, ensure_ascii=False
+        ).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,92 @@
+import json
+import logging
+import re
+from pathlib import Path
+from typing import Dict, Optional
+
+import anyio
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+
+from .compression import accepted_encodings
+from .config import get_settings
+
+logger = logging.getLogger(__name__)
+
+STATIC_DIR = Path(__file__).parent / "static"
+MANIFEST_NAME = "manifest.json"
+
+# 构建脚本生成的带内容哈希的文件名，如 css/main.3f2a9c1b.css
+FINGERPRINTED = re.compile(r"\.[0-9a-f]{8,}\.[A-Za-z0-9]+$")
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+# 预压缩文件的后缀，按优先级排列
+PRECOMPRESSED = (("br", ".br"), ("gzip", ".gz"))
+
+_manifest: Optional[Dict[str, str]] = None
+
+
+def load_manifest(static_dir: Path = STATIC_DIR) -> Dict[str, str]:
+    """读取构建脚本生成的 原始路径 -> 指纹路径 映射；未构建时为空"""
+    try:
+        return json.loads((static_dir / MANIFEST_NAME).read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning("静态资源清单读取失败，使用原始路径: %s", e)
+        return {}
+
+
+def asset_url(path: str) -> str:
+    """
+    模板中引用静态资源的地址
+
+    Args:
+        path: 相对 static 目录的路径，如 css/main.css
+
+    Returns:
+        构建过时返回带指纹的地址（可永久缓存），否则返回原始地址
+    """
+    global _manifest
+    if _manifest is None:
+        _manifest = load_manifest()
+    return "/static/" + _manifest.get(path, path)
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+    静态文件服务：客户端支持时直接返回构建好的 .br / .gz 文件，不在请求时压缩；
+    带指纹的文件声明为 immutable 长期缓存，其余文件使用 STATIC_MAX_AGE。
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.max_age = get_settings().static_max_age
+
+    async def get_response(self, path: str, scope) -> Response:
+        response = await super().get_response(path, scope)
+        if response.status_code == 200:
+            encoded = await self._precompressed(path, scope)
+            if encoded is not None:
+                encoding, compressed = encoded
+                if compressed.status_code == 200:
+                    compressed.headers["content-type"] = response.headers["content-type"]
+                    compressed.headers["content-encoding"] = encoding
+                response = compressed
+            response.headers["vary"] = "Accept-Encoding"
+        if response.status_code in (200, 304):
+            response.headers["cache-control"] = (
+                IMMUTABLE if FINGERPRINTED.search(path) else f"public, max-age={self.max_age}"
+            )
+        return response
+
+    async def _precompressed(self, path: str, scope) -> Optional[tuple]:
+        header = next((v.decode("latin-1") for k, v in scope.get("headers", []) if k == b"accept-encoding"), None)
+        accepted = accepted_encodings(header)
+        for encoding, suffix in PRECOMPRESSED:
+            if encoding not in accepted:
+                continue
+            full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, path + suffix)
+            if stat_result is not None:
+                return encoding, self.file_response(full_path, stat_result, scope)
+        return None
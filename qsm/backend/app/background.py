@@ -0,0 +1,53 @@
+import asyncio
+import contextvars
+import logging
+from typing import Any, Coroutine, Optional, Set
+
+from .admission import _usage
+from .deadline import _deadline
+from .scheduler import Priority, _current_priority
+from .tracing import _trace
+
+logger = logging.getLogger(__name__)
+
+_tasks: Set[asyncio.Task] = set()
+
+
+def spawn(
+    coro: Coroutine[Any, Any, Any],
+    name: Optional[str] = None,
+    priority: Priority = Priority.BACKGROUND,
+) -> asyncio.Task:
+    """
+    启动不阻塞当前请求的后台任务。
+
+    任务内的上游调用按 priority 参与调度（默认后台优先级），且不继承请求的截止时间、追踪记录和限流计费；
+    保留任务的强引用直到结束，避免被垃圾回收；异常只记录日志，不向外抛出。
+    """
+    context = contextvars.copy_context()
+    context.run(_current_priority.set, priority)
+    context.run(_deadline.set, None)
+    context.run(_trace.set, None)
+    context.run(_usage.set, None)
+    task = asyncio.create_task(coro, name=name, context=context)
+    _tasks.add(task)
+    task.add_done_callback(_on_done)
+    return task
+
+
+def _on_done(task: asyncio.Task) -> None:
+    _tasks.discard(task)
+    if task.cancelled():
+        return
+    exc = task.exception()
+    if exc is not None:
+        logger.warning("后台任务 %s 失败: %r", task.get_name(), exc)
+
+
+async def cancel_all() -> None:
+    """关闭时取消所有仍在运行的后台任务"""
+    tasks = list(_tasks)
+    for task in tasks:
+        task.cancel()
+    if tasks:
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,157 @@
+import time
+from typing import Any, Dict, Optional
+
+from .background import spawn
+from .config import get_settings
+from .shared_state import RedisBreakerState, get_shared_redis
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """熔断器打开期间的快速失败"""
+
+
+class CircuitBreaker:
+    """
+    上游熔断器：连续失败 failure_threshold 次后打开，reset_timeout 秒内直接拒绝；
+    之后进入半开状态放行一次试探调用，成功则关闭，失败则重新打开。
+
+    配置 shared 后失败计数与熔断标记在多个 worker 间共享：失败与恢复在后台上报，
+    每 sync_interval 秒拉取一次其他进程打开的熔断，放行判断本身不访问 Redis。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        shared: Optional[RedisBreakerState] = None,
+        sync_interval: float = 1.0,
+    ):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_started: Optional[float] = None
+        self.rejected = 0
+        self.shared = shared
+        self.sync_interval = sync_interval
+        self.remote_failures = 0
+        self._last_sync = 0.0
+        self._syncing = False
+
+    def allow(self) -> bool:
+        """是否允许发起一次调用；半开状态同一时间只放行一个试探"""
+        if self.shared is not None:
+            self._maybe_sync()
+        if self.state == CLOSED:
+            return True
+        now = time.monotonic()
+        if self.state == OPEN:
+            if now - (self.opened_at or 0.0) < self.reset_timeout:
+                self.rejected += 1
+                return False
+            self.state = HALF_OPEN
+            self._trial_started = None
+        # 试探调用被取消时不会回报结果，超过 reset_timeout 视为作废
+        if self._trial_started is not None and now - self._trial_started < self.reset_timeout:
+            self.rejected += 1
+            return False
+        self._trial_started = now
+        return True
+
+    def check(self) -> None:
+        """不允许调用时抛出 CircuitOpenError"""
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} circuit open, retry in {self.retry_after():.0f}s")
+
+    def record_success(self) -> None:
+        if self.shared is not None and (self.state != CLOSED or self.failures or self.remote_failures):
+            spawn(self.shared.report_success(self.name), name=f"breaker-success-{self.name}")
+        self.state = CLOSED
+        self.failures = 0
+        self.remote_failures = 0
+        self.opened_at = None
+        self._trial_started = None
+
+    def record_failure(self) -> None:
+        trip = self.state == HALF_OPEN
+        self.failures += 1
+        if trip or self.failures >= self.failure_threshold:
+            self._open(time.monotonic())
+        if self.shared is not None:
+            spawn(self._report_failure(trip), name=f"breaker-failure-{self.name}")
+
+    def _open(self, opened_at: float) -> None:
+        self.state = OPEN
+        self.opened_at = opened_at
+        self._trial_started = None
+
+    def _apply_remote(self, remaining: float, failures: int) -> None:
+        """其他 worker 打开了熔断时本地同步打开，剩余时间与全局一致"""
+        self.remote_failures = failures
+        if remaining > 0 and self.state != OPEN:
+            self._open(time.monotonic() - (self.reset_timeout - remaining))
+
+    async def _report_failure(self, trip: bool) -> None:
+        remaining = await self.shared.report_failure(self.name, self.failure_threshold, self.reset_timeout, trip)
+        if remaining:
+            self._apply_remote(remaining, 0)
+
+    def _maybe_sync(self) -> None:
+        now = time.monotonic()
+        if self._syncing or now - self._last_sync < self.sync_interval:
+            return
+        self._last_sync = now
+        self._syncing = True
+        spawn(self._sync(), name=f"breaker-sync-{self.name}")
+
+    async def _sync(self) -> None:
+        try:
+            state = await self.shared.fetch(self.name)
+        finally:
+            self._syncing = False
+        if state is not None:
+            self._apply_remote(*state)
+
+    def retry_after(self) -> float:
+        if self.state != OPEN or self.opened_at is None:
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "retry_after": round(self.retry_after(), 1),
+            "rejected": self.rejected,
+        }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """按上游名称（quark / tmdb）获取熔断器；SHARED_STATE_BACKEND=redis 时状态跨进程共享"""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        settings = get_settings()
+        client = get_shared_redis()
+        breaker = CircuitBreaker(
+            name,
+            failure_threshold=settings.breaker_failure_threshold,
+            reset_timeout=settings.breaker_reset_timeout,
+            shared=RedisBreakerState(client, retry_interval=settings.shared_state_retry_interval) if client else None,
+            sync_interval=settings.breaker_sync_interval,
+        )
+        _breakers[name] = breaker
+    return breaker
+
+
+def all_breakers() -> Dict[str, CircuitBreaker]:
+    return dict(_breakers)
@@ -0,0 +1,162 @@
+import zlib
+from typing import Any, Dict, List, Optional, Set
+
+from .config import get_settings
+
+try:
+    import brotli
+except ImportError:  # brotli 为可选依赖，未安装时只提供 gzip
+    brotli = None
+
+# 值得压缩的响应类型；图片、已压缩格式与二进制流原样发送
+COMPRESSIBLE_TYPES = (
+    b"text/",
+    b"application/json",
+    b"application/x-ndjson",
+    b"application/javascript",
+    b"image/svg+xml",
+)
+
+
+def accepted_encodings(header: Optional[str]) -> Set[str]:
+    """解析 Accept-Encoding，返回客户端接受的编码（q=0 视为拒绝）"""
+    encodings: Set[str] = set()
+    for part in (header or "").split(","):
+        name, *params = part.split(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params:
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            encodings.add(name)
+    return encodings
+
+
+def choose_encoding(header: Optional[str]) -> Optional[str]:
+    """按 br > gzip 的优先级选择响应编码；都不接受时返回 None"""
+    accepted = accepted_encodings(header)
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+class _Compressor:
+    """gzip / brotli 流式压缩的统一接口；flush 后已写入的数据可被客户端立即解码"""
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        if encoding == "br":
+            self._br = brotli.Compressor(quality=brotli_quality)
+            self._gz = None
+        else:
+            self._br = None
+            self._gz = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes, flush: bool = False) -> bytes:
+        if self._br is not None:
+            out = self._br.process(data)
+            return out + self._br.flush() if flush else out
+        out = self._gz.compress(data)
+        return out + self._gz.flush(zlib.Z_SYNC_FLUSH) if flush else out
+
+    def finish(self, data: bytes = b"") -> bytes:
+        if self._br is not None:
+            return self._br.process(data) + self._br.finish()
+        return self._gz.compress(data) + self._gz.flush(zlib.Z_FINISH)
+
+
+def _header(headers: List[tuple], name: bytes) -> Optional[bytes]:
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+class CompressionMiddleware:
+    """
+    动态响应压缩（客户端支持时优先 brotli，否则 gzip）。
+
+    - 一次性响应体小于 COMPRESSION_MIN_SIZE 时原样发送；
+    - 流式响应（NDJSON 等）逐块压缩并 flush，不会因为压缩而延迟到达；
+    - 已带 Content-Encoding 的响应（预压缩静态文件）与不可压缩类型不处理。
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+        settings = get_settings()
+        self.enabled = settings.compression_enabled
+        self.min_size = settings.compression_min_size
+        self.gzip_level = settings.compression_gzip_level
+        self.brotli_quality = settings.compression_brotli_quality
+
+    async def __call__(self, scope, receive, send) -> None:
+        if not self.enabled or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(
+            next((v.decode("latin-1") for k, v in scope.get("headers", []) if k == b"accept-encoding"), None)
+        )
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Optional[Dict[str, Any]] = None
+        compressor: Optional[_Compressor] = None
+        passthrough = False
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            nonlocal start_message, compressor, passthrough
+            if message["type"] == "http.response.start":
+                headers = message.get("headers", [])
+                content_type = _header(headers, b"content-type") or b""
+                if (
+                    message["status"] < 200
+                    or message["status"] in (204, 304)
+                    or _header(headers, b"content-encoding") is not None
+                    or not content_type.startswith(COMPRESSIBLE_TYPES)
+                ):
+                    passthrough = True
+                    await send(message)
+                    return
+                # 看到第一块响应体才能决定是否压缩，先暂存响应头
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None:
+                if not more_body and len(body) < self.min_size:
+                    await send(start_message)
+                    await send(message)
+                    passthrough = True
+                    return
+                compressor = _Compressor(encoding, self.gzip_level, self.brotli_quality)
+                headers = [
+                    (k, v) for k, v in start_message.get("headers", []) if k.lower() not in (b"content-length", b"vary")
+                ]
+                vary = _header(start_message.get("headers", []), b"vary")
+                headers.append((b"vary", vary + b", Accept-Encoding" if vary else b"Accept-Encoding"))
+                headers.append((b"content-encoding", encoding.encode()))
+                if not more_body:
+                    data = compressor.finish(body)
+                    headers.append((b"content-length", str(len(data)).encode()))
+                    await send({**start_message, "headers": headers})
+                    await send({"type": "http.response.body", "body": data})
+                    return
+                await send({**start_message, "headers": headers})
+
+            data = compressor.compress(body, flush=True) if more_body else compressor.finish(body)
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
@@ -20,6 +20,13 @@ class Settings(BaseSettings):
     default_language: str = Field("zh-CN", alias="DEFAULT_LANG")
     tmdb_api_base: str = Field("https://api.themoviedb.org/3", alias="TMDB_API_BASE")
     tmdb_image_base: str = Field("https://image.tmdb.org/t/p/", alias="TMDB_IMAGE_BASE")
+    tmdb_cache_ttl: int = Field(21600, alias="TMDB_CACHE_TTL")
+    tmdb_timeout: float = Field(10.0, alias="TMDB_TIMEOUT")
+    tmdb_timeout_min: float = Field(2.0, alias="TMDB_TIMEOUT_MIN")
+    tmdb_timeout_p95_multiplier: float = Field(3.0, alias="TMDB_TIMEOUT_P95_MULTIPLIER")
+    tmdb_hedge_enabled: bool = Field(True, alias="TMDB_HEDGE_ENABLED")
+    tmdb_hedge_budget_ratio: float = Field(0.1, alias="TMDB_HEDGE_BUDGET_RATIO")
+    tmdb_hedge_min_delay: float = Field(0.05, alias="TMDB_HEDGE_MIN_DELAY")
     
     # 夸克搜索配置
     quark_search_api_prefix: str = Field("/api/quark", alias="QUARK_SEARCH_API_PREFIX")
@@ -30,6 +37,85 @@ class Settings(BaseSettings):
     quark_search_confidence_weight: float = Field(0.7, alias="QUARK_SEARCH_CONFIDENCE_WEIGHT")
     quark_search_quality_weight: float = Field(0.3, alias="QUARK_SEARCH_QUALITY_WEIGHT")
     quark_search_max_results: int = Field(20, alias="QUARK_SEARCH_MAX_RESULTS")
+    quark_search_batch_concurrency: int = Field(4, alias="QUARK_SEARCH_BATCH_CONCURRENCY")
+    quark_search_dedup_enabled: bool = Field(True, alias="QUARK_SEARCH_DEDUP_ENABLED")
+    quark_search_dedup_max_distance: int = Field(3, alias="QUARK_SEARCH_DEDUP_MAX_DISTANCE")
+    quark_search_dedup_size_tolerance: float = Field(0.05, alias="QUARK_SEARCH_DEDUP_SIZE_TOLERANCE")
+    quark_search_dedup_alternates: bool = Field(False, alias="QUARK_SEARCH_DEDUP_ALTERNATES")
+
+    # 请求截止时间配置
+    request_timeout: float = Field(15.0, alias="REQUEST_TIMEOUT")
+    request_timeout_max: float = Field(60.0, alias="REQUEST_TIMEOUT_MAX")
+
+    # 日志配置
+    log_level: str = Field("INFO", alias="LOG_LEVEL")
+    log_format: str = Field("json", alias="LOG_FORMAT")
+    log_rate_limit: int = Field(10, alias="LOG_RATE_LIMIT")
+    log_rate_interval: float = Field(60.0, alias="LOG_RATE_INTERVAL")
+
+    # 监控配置
+    metrics_enabled: bool = Field(True, alias="METRICS_ENABLED")
+    profile_enabled: bool = Field(False, alias="PROFILE_ENABLED")
+    slow_log_threshold: float = Field(2.0, alias="SLOW_LOG_THRESHOLD")
+    slow_log_path: str = Field("logs/slow.log", alias="SLOW_LOG_PATH")
+    slow_log_max_bytes: int = Field(10 * 1024 * 1024, alias="SLOW_LOG_MAX_BYTES")
+    slow_log_backup_count: int = Field(5, alias="SLOW_LOG_BACKUP_COUNT")
+
+    # 接口限流配置
+    rate_limit_enabled: bool = Field(True, alias="RATE_LIMIT_ENABLED")
+    rate_limit_path_prefix: str = Field("/api/quark/", alias="RATE_LIMIT_PATH_PREFIX")
+    rate_limit_rate: float = Field(1.0, alias="RATE_LIMIT_RATE")
+    rate_limit_burst: float = Field(30.0, alias="RATE_LIMIT_BURST")
+    rate_limit_hit_cost: float = Field(0.2, alias="RATE_LIMIT_HIT_COST")
+    rate_limit_miss_cost: float = Field(5.0, alias="RATE_LIMIT_MISS_COST")
+    rate_limit_backend: str = Field("memory", alias="RATE_LIMIT_BACKEND")
+    rate_limit_api_keys: str = Field("", alias="RATE_LIMIT_API_KEYS")
+    rate_limit_trust_proxy: bool = Field(False, alias="RATE_LIMIT_TRUST_PROXY")
+
+    # 熔断与健康探测配置
+    breaker_failure_threshold: int = Field(5, alias="BREAKER_FAILURE_THRESHOLD")
+    breaker_reset_timeout: float = Field(30.0, alias="BREAKER_RESET_TIMEOUT")
+    health_probe_enabled: bool = Field(True, alias="HEALTH_PROBE_ENABLED")
+    health_probe_interval: float = Field(300.0, alias="HEALTH_PROBE_INTERVAL")
+    health_probe_keyword: str = Field("test", alias="HEALTH_PROBE_KEYWORD")
+    health_probe_max_age: float = Field(900.0, alias="HEALTH_PROBE_MAX_AGE")
+
+    # 上游调度配置
+    quark_scheduler_concurrency: int = Field(4, alias="QUARK_SCHEDULER_CONCURRENCY")
+    tmdb_scheduler_concurrency: int = Field(16, alias="TMDB_SCHEDULER_CONCURRENCY")
+    scheduler_reserved_interactive: int = Field(1, alias="SCHEDULER_RESERVED_INTERACTIVE")
+
+    # HTTP 缓存配置（ETag / Cache-Control）
+    http_cache_enabled: bool = Field(True, alias="HTTP_CACHE_ENABLED")
+    http_cache_page_max_age: int = Field(300, alias="HTTP_CACHE_PAGE_MAX_AGE")
+    http_cache_api_max_age: int = Field(300, alias="HTTP_CACHE_API_MAX_AGE")
+    http_cache_stale_while_revalidate: int = Field(3600, alias="HTTP_CACHE_STALE_WHILE_REVALIDATE")
+    http_cache_max_entries: int = Field(10_000, alias="HTTP_CACHE_MAX_ENTRIES")
+
+    # 响应压缩与静态资源配置
+    compression_enabled: bool = Field(True, alias="COMPRESSION_ENABLED")
+    compression_min_size: int = Field(1024, alias="COMPRESSION_MIN_SIZE")
+    compression_gzip_level: int = Field(5, alias="COMPRESSION_GZIP_LEVEL")
+    compression_brotli_quality: int = Field(4, alias="COMPRESSION_BROTLI_QUALITY")
+    static_max_age: int = Field(3600, alias="STATIC_MAX_AGE")
+    fragment_cache_max_entries: int = Field(5000, alias="FRAGMENT_CACHE_MAX_ENTRIES")
+
+    # 图片代理配置
+    image_proxy_enabled: bool = Field(True, alias="IMAGE_PROXY_ENABLED")
+    image_cache_dir: str = Field("data/images", alias="IMAGE_CACHE_DIR")
+    image_cache_max_bytes: int = Field(1024 * 1024 * 1024, alias="IMAGE_CACHE_MAX_BYTES")
+    image_proxy_sizes: str = Field(
+        "w92,w154,w185,w300,w342,w500,w780,w1280,h632,original", alias="IMAGE_PROXY_SIZES"
+    )
+
+    # 标题联想配置
+    suggest_enabled: bool = Field(True, alias="SUGGEST_ENABLED")
+    suggest_max_entries: int = Field(50000, alias="SUGGEST_MAX_ENTRIES")
+    suggest_query_min_count: int = Field(3, alias="SUGGEST_QUERY_MIN_COUNT")
+    suggest_tmdb_min_length: int = Field(2, alias="SUGGEST_TMDB_MIN_LENGTH")
+    suggest_negative_ttl: float = Field(300.0, alias="SUGGEST_NEGATIVE_TTL")
+    suggest_tmdb_rate: float = Field(2.0, alias="SUGGEST_TMDB_RATE")
+    suggest_tmdb_burst: float = Field(10.0, alias="SUGGEST_TMDB_BURST")
 
     # 缓存配置
     cache_enabled: bool = Field(True, alias="CACHE_ENABLED")
@@ -37,6 +123,36 @@ class Settings(BaseSettings):
     redis_url: str = Field("redis://localhost:6379/0", alias="REDIS_URL")
     cache_ttl: int = Field(3600, alias="CACHE_TTL")
 
+    # 多进程共享状态配置（上游限速与熔断）
+    shared_state_backend: str = Field("memory", alias="SHARED_STATE_BACKEND")
+    shared_state_retry_interval: float = Field(5.0, alias="SHARED_STATE_RETRY_INTERVAL")
+    shared_state_redis_timeout: float = Field(0.5, alias="SHARED_STATE_REDIS_TIMEOUT")
+    breaker_sync_interval: float = Field(1.0, alias="BREAKER_SYNC_INTERVAL")
+
+    # 本地资源索引配置
+    resource_index_enabled: bool = Field(True, alias="RESOURCE_INDEX_ENABLED")
+    resource_index_path: str = Field("data/resource_index.db", alias="RESOURCE_INDEX_PATH")
+    resource_index_min_overlap: float = Field(0.6, alias="RESOURCE_INDEX_MIN_OVERLAP")
+    resource_index_min_hits: int = Field(5, alias="RESOURCE_INDEX_MIN_HITS")
+    resource_index_refresh_ttl: int = Field(21600, alias="RESOURCE_INDEX_REFRESH_TTL")
+    # 搜索模式：upstream（仅上游）/ offline_first（本地优先）/ local（仅本地）
+    quark_search_mode: str = Field("upstream", alias="QUARK_SEARCH_MODE")
+
+    # 资源可用性物化表配置
+    availability_enabled: bool = Field(True, alias="AVAILABILITY_ENABLED")
+    availability_refresh_interval: int = Field(1800, alias="AVAILABILITY_REFRESH_INTERVAL")
+    availability_max_items: int = Field(40, alias="AVAILABILITY_MAX_ITEMS")
+
+    # 详情页预取配置
+    prefetch_enabled: bool = Field(True, alias="PREFETCH_ENABLED")
+    prefetch_max_inflight: int = Field(4, alias="PREFETCH_MAX_INFLIGHT")
+    prefetch_budget_per_minute: int = Field(30, alias="PREFETCH_BUDGET_PER_MINUTE")
+
+    # 启动预热配置
+    warmup_enabled: bool = Field(True, alias="WARMUP_ENABLED")
+    warmup_max_items: int = Field(40, alias="WARMUP_MAX_ITEMS")
+    warmup_interval: float = Field(2.0, alias="WARMUP_INTERVAL")
+
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
 
 
@@ -0,0 +1,118 @@
+import base64
+import heapq
+import json
+from bisect import bisect_right
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .config import get_settings
+from .quark.core.cache import generate_cache_key, get_cache
+
+TOP_CREDITS = 12
+# 人物页首屏展示的作品条数，其余通过 /person/{id}/credits 分页加载
+FIRST_SCREEN_CREDITS = 20
+
+
+def media_type_of(credit: Dict[str, Any]) -> str:
+    return credit.get("media_type") or ("movie" if "title" in credit else "tv")
+
+
+def filter_credits(credits: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """只保留有 id 的电影 / 剧集作品"""
+    return [c for c in credits if c.get("id") and media_type_of(c) in ("movie", "tv")]
+
+
+def credit_score(credit: Dict[str, Any]) -> tuple:
+    va = credit.get("vote_average") or 0
+    pop = credit.get("popularity") or 0
+    date = credit.get("release_date") or credit.get("first_air_date") or ""
+    return (va, pop, date)
+
+
+def top_credits(credits: List[Dict[str, Any]], n: int = TOP_CREDITS) -> List[Dict[str, Any]]:
+    """评分最高的 n 部作品（堆选择，不对全部作品排序）"""
+    return heapq.nlargest(n, credits, key=credit_score)
+
+
+def credit_row(credit: Dict[str, Any]) -> Dict[str, Any]:
+    """作品列表中的一行，只保留页面用到的字段"""
+    date_field = credit.get("release_date") or credit.get("first_air_date") or ""
+    return {
+        "id": credit.get("id"),
+        "media_type": media_type_of(credit),
+        "title": credit.get("title") or credit.get("name") or "未命名",
+        "year": date_field.split("-")[0] if date_field else "",
+        "role": credit.get("character") or credit.get("job") or "",
+    }
+
+
+def row_key(row: Dict[str, Any]) -> Tuple[int, str, int, str]:
+    """作品列表的全序：年份倒序（无年份在最后），同年按类型、id、角色"""
+    year = row["year"]
+    return (-int(year) if year.isdigit() else 0, row["media_type"], int(row["id"]), row["role"])
+
+
+def sorted_rows(credits: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """去重并排好序的作品列表（同一作品的同一角色只保留一行）"""
+    rows = {}
+    for credit in credits:
+        row = credit_row(credit)
+        rows.setdefault(row_key(row), row)
+    return [rows[key] for key in sorted(rows)]
+
+
+def encode_cursor(row: Dict[str, Any]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(row_key(row), ensure_ascii=False).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[int, str, int, str]:
+    """
+    Raises:
+        ValueError: 游标格式不正确
+    """
+    try:
+        year, media_type, item_id, role = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return (int(year), str(media_type), int(item_id), str(role))
+    except (TypeError, ValueError, UnicodeError) as e:
+        raise ValueError("invalid cursor") from e
+
+
+def paginate(
+    rows: List[Dict[str, Any]], cursor: Optional[str], limit: int
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    按游标取一页
+
+    游标记录上一页最后一行的排序键，缓存刷新导致列表变化时也不会重复或跳过未变化的行。
+
+    Returns:
+        (本页各行, 下一页游标；没有更多时为 None)
+    """
+    start = 0
+    if cursor:
+        keys = [row_key(row) for row in rows]
+        start = bisect_right(keys, decode_cursor(cursor))
+    page = rows[start:start + limit]
+    has_more = start + limit < len(rows)
+    return page, encode_cursor(page[-1]) if page and has_more else None
+
+
+async def cached_rows(person_id: int, language: str, credits: Optional[List[Dict[str, Any]]] = None):
+    """
+    人物的完整作品列表（已排序），缓存 TMDB_CACHE_TTL 秒
+
+    Args:
+        credits: 已取得的作品原始数据；缓存未命中且未提供时返回 None，由调用方获取后再调用
+
+    Returns:
+        作品列表，或 None
+    """
+    cache = get_cache()
+    key = generate_cache_key("person:credits", person_id=person_id, language=language)
+    rows = await cache.get(key)
+    if rows is not None:
+        return rows
+    if credits is None:
+        return None
+    rows = sorted_rows(filter_credits(credits))
+    await cache.set(key, rows, get_settings().tmdb_cache_ttl)
+    return rows
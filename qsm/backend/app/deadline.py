@@ -0,0 +1,90 @@
+import asyncio
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Iterator, Optional, TypeVar
+
+from .config import get_settings
+
+T = TypeVar("T")
+
+# 当前请求的截止时间（time.monotonic），None 表示不限时
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """请求截止时间已到，未完成的上游调用被取消"""
+
+
+def request_timeout(query_value: Optional[float] = None, header_value: Optional[str] = None) -> Optional[float]:
+    """
+    解析请求的时限（秒）：查询参数优先，其次 X-Request-Timeout 头，最后取 REQUEST_TIMEOUT 默认值
+
+    Args:
+        query_value: timeout 查询参数
+        header_value: X-Request-Timeout 请求头
+
+    Returns:
+        不超过 REQUEST_TIMEOUT_MAX 的秒数；默认值为 0 且未指定时返回 None（不限时）
+    """
+    settings = get_settings()
+    seconds = query_value
+    if seconds is None and header_value:
+        try:
+            seconds = float(header_value)
+        except ValueError:
+            seconds = None
+    if seconds is None or seconds <= 0:
+        seconds = settings.request_timeout
+    if not seconds or seconds <= 0:
+        return None
+    return min(seconds, settings.request_timeout_max)
+
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]) -> Iterator[None]:
+    """在当前上下文内设置截止时间；已有更早的截止时间时保持不变"""
+    if seconds is None:
+        yield
+        return
+    deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    if current is not None:
+        deadline = min(deadline, current)
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """距离截止时间的剩余秒数，未设置时返回 None"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def expired() -> bool:
+    left = remaining()
+    return left is not None and left <= 0
+
+
+async def within_deadline(awaitable: Awaitable[T]) -> T:
+    """
+    在剩余时间内等待 awaitable，超时则取消它并抛出 DeadlineExceeded
+
+    未设置截止时间时直接等待。
+    """
+    left = remaining()
+    if left is None:
+        return await awaitable
+    if left <= 0:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise DeadlineExceeded("deadline already passed")
+    try:
+        return await asyncio.wait_for(awaitable, timeout=left)
+    except asyncio.TimeoutError as e:
+        raise DeadlineExceeded(f"deadline exceeded after {left:.2f}s") from e
@@ -0,0 +1,87 @@
+import hashlib
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+
+import jinja2
+from markupsafe import Markup
+
+from . import metrics
+
+
+def template_version(env: jinja2.Environment, name: str) -> str:
+    """模板源码的短哈希；模板修改后旧片段自然失效"""
+    source, _, _ = env.loader.get_source(env, name)
+    return hashlib.blake2b(source.encode("utf-8"), digest_size=6).hexdigest()
+
+
+class FragmentCache:
+    """
+    渲染好的模板片段（LRU，最多 max_entries 条）。
+
+    每条记录附带生成它的数据指纹，命中但指纹不同（评分、资源徽标变化）时视为未命中并覆盖，
+    同一条目始终只占一个位置。
+    """
+
+    def __init__(self, max_entries: int = 5_000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[Hashable, Markup]]" = OrderedDict()
+
+    def get(self, key: Hashable, fingerprint: Hashable) -> Optional[Markup]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != fingerprint:
+            metrics.FRAGMENT_MISSES.inc()
+            return None
+        self._entries.move_to_end(key)
+        metrics.FRAGMENT_HITS.inc()
+        return entry[1]
+
+    def put(self, key: Hashable, fingerprint: Hashable, html: Markup) -> None:
+        self._entries[key] = (fingerprint, html)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class PosterFragments:
+    """
+    海报卡片片段：按 (模板版本, 语言, 媒体类型, 条目 id) 缓存 partials/poster_card.html 的渲染结果。
+
+    注册为模板全局函数 poster_card(poster)，页面只拼接缓存的卡片，不再逐个渲染 include。
+    """
+
+    TEMPLATE = "partials/poster_card.html"
+
+    def __init__(self, env: jinja2.Environment, language: str, cache: Optional[FragmentCache] = None):
+        self.template = env.get_template(self.TEMPLATE)
+        self.version = template_version(env, self.TEMPLATE)
+        self.language = language
+        self.cache = cache if cache is not None else FragmentCache()
+        metrics.FRAGMENT_ENTRIES.set_function(lambda: len(self.cache))
+
+    @staticmethod
+    def fingerprint(poster: Dict[str, Any]) -> Tuple:
+        """卡片模板实际用到的字段，与 partials/poster_card.html 保持一致"""
+        availability = poster.get("availability")
+        return (
+            poster.get("tone"),
+            poster.get("poster_url"),
+            poster.get("title"),
+            poster.get("subtitle"),
+            (availability.get("name"), availability.get("resolution")) if availability else None,
+        )
+
+    def __call__(self, poster: Dict[str, Any]) -> Markup:
+        key = (self.version, self.language, poster.get("media_type"), poster.get("id"))
+        fingerprint = self.fingerprint(poster)
+        html = self.cache.get(key, fingerprint)
+        if html is None:
+            html = Markup(self.template.render(poster=poster))
+            self.cache.put(key, fingerprint, html)
+        return html
+
+    def grid(self, posters: Iterable[Dict[str, Any]]) -> Markup:
+        """一组海报卡片（分区、搜索结果、推荐行）拼接后的 HTML"""
+        return Markup("\n").join(self(poster) for poster in posters)
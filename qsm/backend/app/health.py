@@ -0,0 +1,123 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from .circuit_breaker import OPEN, get_breaker
+from .config import get_settings
+from .quark.core.cache import get_cache
+from .scheduler import get_scheduler
+
+logger = logging.getLogger(__name__)
+
+UPSTREAMS = ("tmdb", "quark")
+_started_at = time.time()
+
+
+class ProbeStatus:
+    """单个上游最近一次后台探测的结果"""
+
+    def __init__(self) -> None:
+        self.last_success: Optional[float] = None
+        self.last_failure: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def age(self) -> Optional[float]:
+        """距最近一次成功探测的秒数，从未成功时为 None"""
+        if self.last_success is None:
+            return None
+        return time.time() - self.last_success
+
+    def snapshot(self) -> Dict[str, Any]:
+        age = self.age()
+        return {
+            "last_success_age": round(age, 1) if age is not None else None,
+            "last_error": self.last_error if (self.last_failure or 0) > (self.last_success or 0) else None,
+        }
+
+
+_probes: Dict[str, ProbeStatus] = {name: ProbeStatus() for name in UPSTREAMS}
+
+
+def get_probe_status(name: str) -> ProbeStatus:
+    return _probes[name]
+
+
+async def probe_upstreams(tmdb_client: Any, search_service: Any) -> None:
+    """各上游发一次最小请求（经过熔断器与调度器），记录成功时间"""
+    settings = get_settings()
+    calls = {
+        "tmdb": tmdb_client.ping,
+        "quark": lambda: search_service.quark_client.ping(settings.health_probe_keyword),
+    }
+    for name, call in calls.items():
+        status = _probes[name]
+        try:
+            ok = await call()
+            error = None if ok else "unexpected response"
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            error = str(e) or type(e).__name__
+        if error is None:
+            status.last_success = time.time()
+        else:
+            status.last_failure = time.time()
+            status.last_error = error
+            logger.warning("上游探测失败 %s: %s", name, error)
+
+
+async def run_health_probe(tmdb_client: Any, search_service: Any) -> None:
+    """后台周期任务：按 HEALTH_PROBE_INTERVAL 低频探测上游"""
+    settings = get_settings()
+    while True:
+        await probe_upstreams(tmdb_client, search_service)
+        await asyncio.sleep(settings.health_probe_interval)
+
+
+async def readiness() -> Tuple[bool, Dict[str, Any]]:
+    """
+    就绪检查，只读取进程内状态与缓存后端，不请求上游
+
+    Returns:
+        (是否就绪, 报告)。缓存后端不可用时不就绪；上游熔断或探测过期只标记为 degraded，
+        因为上游故障对所有实例相同，摘除实例并不能恢复服务。
+    """
+    settings = get_settings()
+    cache = get_cache()
+    try:
+        cache_ok = await asyncio.wait_for(cache.ping(), timeout=1.0)
+    except Exception:
+        cache_ok = False
+
+    degraded = False
+    upstreams: Dict[str, Any] = {}
+    for name in UPSTREAMS:
+        breaker = get_breaker(name)
+        scheduler = get_scheduler(name)
+        probe = _probes[name]
+        age = probe.age()
+        stale = settings.health_probe_enabled and (
+            (age is None and time.time() - _started_at > settings.health_probe_max_age)
+            or (age is not None and age > settings.health_probe_max_age)
+        )
+        degraded = degraded or breaker.state == OPEN or stale
+        upstreams[name] = {
+            "circuit": breaker.snapshot(),
+            "pool": {
+                "active": scheduler.active,
+                "capacity": scheduler.concurrency,
+                "queued": scheduler.queued(),
+                "saturation": round(scheduler.active / scheduler.concurrency, 2),
+            },
+            "probe": {**probe.snapshot(), "stale": stale},
+        }
+
+    status = "unavailable" if not cache_ok else ("degraded" if degraded else "ready")
+    report = {
+        "status": status,
+        "uptime": round(time.time() - _started_at, 1),
+        "cache": {"backend": cache.backend_name, "ok": cache_ok},
+        "upstreams": upstreams,
+    }
+    return cache_ok, report
@@ -0,0 +1,95 @@
+import re
+from collections import deque
+from typing import Deque, Dict, Optional
+
+_NUMERIC_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+
+def endpoint_key(path: str) -> str:
+    """把带 ID 的路径归并为端点，如 /movie/603 -> /movie/{id}"""
+    return _NUMERIC_SEGMENT.sub("/{id}", path)
+
+
+class LatencyStats:
+    """单个端点的滚动延迟窗口，按需计算 p95"""
+
+    def __init__(self, window: int = 256, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._p95: Optional[float] = None
+        self._dirty = 0
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+        self._dirty += 1
+
+    def p95(self) -> Optional[float]:
+        """样本不足时返回 None"""
+        if len(self._samples) < self.min_samples:
+            return None
+        if self._p95 is None or self._dirty >= 16:
+            ordered = sorted(self._samples)
+            self._p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+            self._dirty = 0
+        return self._p95
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+
+class LatencyTracker:
+    """按端点记录上游延迟，给出自适应超时与对冲延迟"""
+
+    def __init__(self, min_timeout: float, max_timeout: float, multiplier: float, min_hedge_delay: float):
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.multiplier = multiplier
+        self.min_hedge_delay = min_hedge_delay
+        self._stats: Dict[str, LatencyStats] = {}
+
+    def stats(self, endpoint: str) -> LatencyStats:
+        stats = self._stats.get(endpoint)
+        if stats is None:
+            stats = self._stats[endpoint] = LatencyStats()
+        return stats
+
+    def timeout_for(self, stats: LatencyStats) -> float:
+        p95 = stats.p95()
+        if p95 is None:
+            return self.max_timeout
+        return max(self.min_timeout, min(self.max_timeout, p95 * self.multiplier))
+
+    def hedge_delay_for(self, stats: LatencyStats) -> Optional[float]:
+        p95 = stats.p95()
+        if p95 is None:
+            return None
+        return max(self.min_hedge_delay, p95)
+
+    def snapshot(self) -> Dict[str, Dict[str, Optional[float]]]:
+        return {
+            endpoint: {"samples": len(stats), "p95": stats.p95(), "timeout": self.timeout_for(stats)}
+            for endpoint, stats in self._stats.items()
+        }
+
+
+class HedgeBudget:
+    """
+    对冲请求预算：每个普通请求积累 ratio 个令牌，每次对冲消耗 1 个，
+    令牌上限为 burst，因此对冲带来的额外请求不超过总请求的 ratio 比例。
+    """
+
+    def __init__(self, ratio: float, burst: float = 10.0):
+        self.ratio = ratio
+        self.burst = burst
+        self._tokens = 0.0
+        self.spent = 0
+
+    def on_request(self) -> None:
+        self._tokens = min(self.burst, self._tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        if self._tokens >= 1.0:
+            self._tokens -= 1.0
+            self.spent += 1
+            return True
+        return False
@@ -0,0 +1,173 @@
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import metrics
+from .config import get_settings
+
+# 参与 HTTP 缓存的 GET 路径：HTML 页面与夸克搜索 JSON 接口
+PAGE_PREFIXES = ("/search", "/person/", "/movie/", "/tv/")
+API_PREFIX = "/api/quark/search/"
+
+
+def cache_control_value(max_age: int, stale_while_revalidate: int) -> str:
+    return f"public, max-age={max_age}, stale-while-revalidate={stale_while_revalidate}"
+
+
+def etag_for(body: bytes) -> str:
+    """响应体内容哈希生成的弱 ETag（压缩等编码变换后仍可比较）"""
+    return 'W/"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match 按弱比较规则判断是否命中"""
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+class ValidatorStore:
+    """
+    按 URL 记录最近一次响应的 ETag 与有效期截止时间（LRU，最多 max_entries 条）。
+
+    有效期与响应声明的 max-age 一致：这段时间内客户端与 CDN 本就可以直接复用响应，
+    服务端据此对携带相同 ETag 的条件请求直接回 304，不再渲染模板或序列化。
+    不延长到 stale-while-revalidate 窗口：ETag 不跟踪底层数据（资源可用性、搜索缓存）的变化，
+    每次 304 又会给客户端一个新的 max-age，过长的有效期会让过期内容一直被续用。
+    路由返回不可缓存的响应（失败、部分结果）时记录被移除，之后的条件请求重新渲染并比较。
+    """
+
+    def __init__(self, max_entries: int = 10_000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        etag, fresh_until = entry
+        if time.monotonic() >= fresh_until:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return etag
+
+    def put(self, key: str, etag: str, ttl: float) -> None:
+        self._entries[key] = (etag, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def discard(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _header(scope: Dict[str, Any], name: bytes) -> Optional[str]:
+    for key, value in scope.get("headers", []):
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+class HttpCacheMiddleware:
+    """
+    页面与夸克搜索接口的 HTTP 缓存：响应附加内容哈希 ETag 与
+    Cache-Control（max-age + stale-while-revalidate），If-None-Match 命中时返回 304。
+
+    - max-age 期间的条件请求直接按已记录的 ETag 回 304，不进入路由；
+    - 其余请求照常处理，响应体完整后计算 ETag，与 If-None-Match 相同时同样只回 304；
+    - 只处理 200 响应；路由已设置 Cache-Control 的响应（如超时的部分结果为 no-store、
+      流式渲染的首页）保持原样，不缓冲响应体。
+    """
+
+    def __init__(self, app, store: Optional[ValidatorStore] = None) -> None:
+        self.app = app
+        settings = get_settings()
+        self.enabled = settings.http_cache_enabled
+        self.page_max_age = settings.http_cache_page_max_age
+        self.api_max_age = settings.http_cache_api_max_age
+        self.swr = settings.http_cache_stale_while_revalidate
+        self.store = store if store is not None else ValidatorStore(settings.http_cache_max_entries)
+        metrics.HTTP_VALIDATORS.set_function(lambda: len(self.store))
+
+    def max_age_for(self, path: str) -> Optional[int]:
+        """路径对应的 max-age；不参与 HTTP 缓存时返回 None"""
+        if path.startswith(API_PREFIX):
+            return self.api_max_age
+        if path == "/" or path.startswith(PAGE_PREFIXES):
+            return self.page_max_age
+        return None
+
+    def cache_control(self, max_age: int) -> bytes:
+        return cache_control_value(max_age, self.swr).encode()
+
+    async def __call__(self, scope, receive, send) -> None:
+        if not self.enabled or scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+        max_age = self.max_age_for(scope["path"])
+        if max_age is None:
+            await self.app(scope, receive, send)
+            return
+
+        query = scope.get("query_string", b"")
+        key = scope["path"] + ("?" + query.decode("latin-1") if query else "")
+        cache_control = self.cache_control(max_age)
+        if_none_match = _header(scope, b"if-none-match")
+        if if_none_match:
+            etag = self.store.get(key)
+            if etag is not None and etag_matches(if_none_match, etag):
+                metrics.HTTP_NOT_MODIFIED_SHORTCUT.inc()
+                await self._not_modified(send, etag, cache_control)
+                return
+
+        start_message: Optional[Dict[str, Any]] = None
+        body_parts: List[bytes] = []
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                headers = message.get("headers", [])
+                if message["status"] == 200 and not any(k.lower() == b"cache-control" for k, _ in headers):
+                    # 等响应体完整后才能计算 ETag，先暂存响应头
+                    start_message = message
+                    return
+                # 不可缓存的响应：此前记录的 ETag 不再代表当前内容
+                self.store.discard(key)
+            elif message["type"] == "http.response.body" and start_message is not None:
+                body_parts.append(message.get("body", b""))
+                if message.get("more_body"):
+                    return
+                body = b"".join(body_parts)
+                etag = etag_for(body)
+                self.store.put(key, etag, max_age)
+                if if_none_match and etag_matches(if_none_match, etag):
+                    metrics.HTTP_NOT_MODIFIED_REVALIDATED.inc()
+                    await self._not_modified(send, etag, cache_control)
+                    return
+                headers = [*start_message.get("headers", []), (b"etag", etag.encode()), (b"cache-control", cache_control)]
+                await send({**start_message, "headers": headers})
+                await send({"type": "http.response.body", "body": body})
+                return
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+    async def _not_modified(self, send, etag: str, cache_control: bytes) -> None:
+        await send({
+            "type": "http.response.start",
+            "status": 304,
+            "headers": [(b"etag", etag.encode()), (b"cache-control", cache_control)],
+        })
+        await send({"type": "http.response.body", "body": b""})
@@ -0,0 +1,183 @@
+import asyncio
+import logging
+import os
+import re
+import tempfile
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+
+import httpx
+
+from . import metrics
+from .config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# TMDB 图片路径形如 /kqjL17yufvn9OVLyXYpvtyrFfak.jpg，只允许单层文件名，避免穿越缓存目录
+IMAGE_PATH = re.compile(r"^[A-Za-z0-9_\-]+\.(?:jpg|jpeg|png|webp|svg)$")
+
+
+class ImageNotFound(Exception):
+    """上游不存在该图片（或尺寸/路径不合法）"""
+
+
+class ImageUnavailable(Exception):
+    """上游图片服务暂时不可用"""
+
+
+class DiskLRU:
+    """
+    按总字节数限制的磁盘文件缓存，超过 max_bytes 时删除最久未使用的文件。
+
+    使用顺序只记录在内存中；启动时按文件修改时间恢复顺序。
+    """
+
+    def __init__(self, directory: Path, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._files: "OrderedDict[str, int]" = OrderedDict()
+        self._load()
+
+    def _load(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        entries = []
+        for path in self.directory.rglob("*"):
+            if path.is_file() and not path.name.startswith("."):
+                stat = path.stat()
+                entries.append((stat.st_mtime, path.relative_to(self.directory).as_posix(), stat.st_size))
+        for _, name, size in sorted(entries):
+            self._files[name] = size
+            self.total_bytes += size
+
+    def get(self, name: str) -> Optional[Path]:
+        if name not in self._files:
+            return None
+        self._files.move_to_end(name)
+        return self.directory / name
+
+    def _write(self, name: str, data: bytes) -> Path:
+        target = self.directory / name
+        target.parent.mkdir(parents=True, exist_ok=True)
+        # 先写临时文件再原子替换，读取方不会看到写了一半的图片
+        fd, tmp = tempfile.mkstemp(dir=target.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, target)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+        return target
+
+    async def put(self, name: str, data: bytes) -> Path:
+        """写入文件并淘汰旧文件；刚写入的文件不会被淘汰，总量可能暂时超出一张图片"""
+        target = await asyncio.to_thread(self._write, name, data)
+        self.total_bytes += len(data) - self._files.pop(name, 0)
+        self._files[name] = len(data)
+        evicted = []
+        while self.total_bytes > self.max_bytes and len(self._files) > 1:
+            old, size = self._files.popitem(last=False)
+            self.total_bytes -= size
+            evicted.append(self.directory / old)
+        if evicted:
+            await asyncio.to_thread(lambda: [p.unlink(missing_ok=True) for p in evicted])
+        return target
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+
+class ImageProxy:
+    """
+    TMDB 图片的本地代理：每个 (尺寸, 路径) 只从上游获取一次，之后从磁盘缓存返回。
+
+    同一张图片的并发未命中合并为一次上游请求；upstream_base 与 client 可替换为本地替身。
+    """
+
+    def __init__(
+        self,
+        upstream_base: str,
+        cache_dir: Path,
+        max_bytes: int,
+        sizes: frozenset,
+        timeout: float = 10.0,
+        client: Optional[httpx.AsyncClient] = None,
+    ):
+        self.upstream_base = upstream_base.rstrip("/") + "/"
+        self.sizes = sizes
+        self.cache = DiskLRU(cache_dir, max_bytes)
+        self._client = client or httpx.AsyncClient(timeout=timeout, follow_redirects=True)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        metrics.IMAGE_CACHE_BYTES.set_function(lambda: self.cache.total_bytes)
+
+    async def get(self, size: str, path: str) -> Path:
+        """
+        返回缓存中的图片文件，未命中时从上游获取
+
+        Raises:
+            ImageNotFound: 尺寸或路径不合法，或上游返回 404
+            ImageUnavailable: 上游请求失败
+        """
+        if size not in self.sizes or not IMAGE_PATH.match(path):
+            raise ImageNotFound(f"{size}/{path}")
+        name = f"{size}/{path}"
+        cached = self.cache.get(name)
+        if cached is not None:
+            metrics.IMAGE_HITS.inc()
+            return cached
+
+        future = self._inflight.get(name)
+        if future is None:
+            metrics.IMAGE_MISSES.inc()
+            future = asyncio.ensure_future(self._download(name))
+            self._inflight[name] = future
+            future.add_done_callback(lambda f: self._finished(name, f))
+        else:
+            metrics.IMAGE_COALESCED.inc()
+        # 单个客户端断开不取消下载，其他等待者与缓存仍需要结果
+        return await asyncio.shield(future)
+
+    def _finished(self, name: str, future: asyncio.Future) -> None:
+        self._inflight.pop(name, None)
+        if not future.cancelled() and future.exception() is not None:
+            # 等待者都已断开时异常无人读取，这里记录即可
+            logger.debug("图片获取失败 %s: %s", name, future.exception())
+
+    async def _download(self, name: str) -> Path:
+        try:
+            resp = await self._client.get(self.upstream_base + name)
+        except httpx.HTTPError as e:
+            raise ImageUnavailable(str(e) or type(e).__name__) from e
+        if resp.status_code == 404:
+            raise ImageNotFound(name)
+        if resp.status_code != 200 or not resp.headers.get("content-type", "").startswith("image/"):
+            raise ImageUnavailable(f"upstream returned {resp.status_code}")
+        return await self.cache.put(name, resp.content)
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+_proxy: Optional[ImageProxy] = None
+
+
+def get_image_proxy() -> ImageProxy:
+    global _proxy
+    if _proxy is None:
+        settings = get_settings()
+        _proxy = ImageProxy(
+            settings.tmdb_image_base,
+            Path(settings.image_cache_dir),
+            settings.image_cache_max_bytes,
+            frozenset(s.strip() for s in settings.image_proxy_sizes.split(",") if s.strip()),
+        )
+    return _proxy
+
+
+async def close_image_proxy() -> None:
+    global _proxy
+    if _proxy is not None:
+        await _proxy.close()
+        _proxy = None
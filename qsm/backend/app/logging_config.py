@@ -0,0 +1,151 @@
+import atexit
+import json
+import logging
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, List, Optional, Tuple
+
+from .config import get_settings
+
+# LogRecord 自带的属性，其余属性视为 extra 字段写入 JSON
+_RESERVED = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "suppressed"}
+
+_listeners: List[QueueListener] = []
+_configured = False
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志输出一行 JSON：时间、级别、logger、消息，以及 extra 字段"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload: Dict[str, Any] = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith("_"):
+                payload[key] = value
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            payload["suppressed"] = suppressed
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload["exc"] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    按 (logger, 消息模板) 限流：每个 interval 内最多放行 limit 条 WARNING 及以下的日志，
+    被丢弃的条数记在下一条放行日志的 suppressed 字段上。ERROR 及以上不限流。
+
+    依赖惰性格式化：消息模板（record.msg）不含参数时同类日志才能归为同一个键。
+    """
+
+    def __init__(self, limit: int, interval: float) -> None:
+        super().__init__()
+        self.limit = limit
+        self.interval = interval
+        # key -> [窗口开始时间, 窗口内已放行条数, 已丢弃条数]
+        self._windows: Dict[Tuple[str, Any], List[float]] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.limit <= 0 or record.levelno >= logging.ERROR:
+            return True
+        key = (record.name, record.msg)
+        now = record.created
+        window = self._windows.get(key)
+        if window is None or now - window[0] >= self.interval:
+            suppressed = int(window[2]) if window is not None else 0
+            self._windows[key] = [now, 1, 0]
+            if len(self._windows) > 4096:
+                self._prune(now)
+            if suppressed:
+                record.suppressed = suppressed
+            return True
+        if window[1] < self.limit:
+            window[1] += 1
+            return True
+        window[2] += 1
+        return False
+
+    def _prune(self, now: float) -> None:
+        expired = [key for key, window in self._windows.items() if now - window[0] >= self.interval]
+        for key in expired:
+            del self._windows[key]
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    只把 LogRecord 放入队列，消息格式化与 I/O 都在写线程完成。
+
+    标准 QueueHandler.prepare 会在调用线程（事件循环）上格式化消息；这里不做格式化，
+    只把异常堆栈提前转成文本。因此日志参数应为不会被后续修改的值。
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def queued(*handlers: logging.Handler) -> QueueHandler:
+    """
+    为若干实际输出的 handler 建立队列与后台写线程，返回挂到 logger 上的 QueueHandler
+
+    Args:
+        handlers: 实际执行格式化与写入的 handler（在写线程中运行）
+
+    Returns:
+        非阻塞的 QueueHandler
+    """
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    _listeners.append(listener)
+    return DeferredQueueHandler(log_queue)
+
+
+def configure_logging() -> None:
+    """进程启动时配置一次根 logger：队列 + 写线程，JSON（或文本）格式，重复告警限流；重复调用无副作用"""
+    global _configured
+    if _configured:
+        return
+    settings = get_settings()
+
+    stream = logging.StreamHandler(sys.stderr)
+    if settings.log_format == "json":
+        stream.setFormatter(JsonFormatter())
+    else:
+        stream.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    handler = queued(stream)
+    handler.addFilter(RateLimitFilter(settings.log_rate_limit, settings.log_rate_interval))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(settings.log_level.upper())
+    # httpx 每个上游请求记一条 INFO，非调试时只保留告警
+    if root.level > logging.DEBUG:
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+    _configured = True
+
+
+def stop_logging() -> None:
+    """停止所有写线程，确保队列中的日志写完（关闭时调用）"""
+    while _listeners:
+        listener = _listeners.pop()
+        try:
+            listener.stop()
+        except Exception:
+            pass
+
+
+atexit.register(stop_logging)
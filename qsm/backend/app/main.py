@@ -1,48 +1,138 @@
 import asyncio
+import logging
 from contextlib import asynccontextmanager
 from pathlib import Path
 from typing import Dict, List, Optional
 
 import httpx
-from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import HTMLResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 
+from . import credits as person_credits
+from . import metrics
+from .admission import AdmissionMiddleware
+from .assets import IMMUTABLE, PrecompressedStaticFiles, asset_url
+from .background import cancel_all, spawn
+from .compression import CompressionMiddleware
 from .config import get_settings
-from .tmdb import TmdbClient, adapt_poster, gather_sections
+from .fragments import FragmentCache, PosterFragments
+from .health import readiness, run_health_probe
+from .http_cache import HttpCacheMiddleware
+from .image_proxy import ImageNotFound, ImageUnavailable, close_image_proxy, get_image_proxy
+from .logging_config import configure_logging
+from .streaming import create_stream_environment, stream_template
+from .suggest import get_suggest_index, get_tmdb_fallback_gate, normalize_key
+from .tmdb import SECTION_KEYS, TmdbClient, adapt_poster, iter_sections
+from .tracing import TracingMiddleware
 
 # 导入夸克搜索路由
 from .quark.api.routes import router as quark_router
+from .quark.services.availability import get_availability_store, run_availability_refresher
+from .quark.services.prefetch import get_prefetcher
+from .quark.services.search_service import close_search_service, get_search_service
+from .quark.services.warmup import warm_up
+
+configure_logging()
+logger = logging.getLogger(__name__)
 
 settings = get_settings()
 tmdb_client = TmdbClient(
     settings.tmdb_api_key,
     api_base=settings.tmdb_api_base,
-    image_base=settings.tmdb_image_base,
+    # 启用图片代理时页面中的图片地址指向本地 /img/，由代理从 TMDB_IMAGE_BASE 获取并缓存
+    image_base="/img/" if settings.image_proxy_enabled else settings.tmdb_image_base,
     language=settings.default_language,
 )
 
 
+async def _background_startup() -> None:
+    """启动后的后台任务：先预热缓存，再开始周期刷新资源可用性（后者可直接命中预热结果）"""
+    if settings.warmup_enabled:
+        try:
+            await warm_up(tmdb_client, get_search_service())
+        except Exception as exc:
+            logger.warning("预热中止: %s", exc)
+    if settings.availability_enabled:
+        await run_availability_refresher(tmdb_client, get_search_service())
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    metrics.bind_pool_gauges()
+    if settings.image_proxy_enabled:
+        # 启动时扫描磁盘缓存，避免首个图片请求承担目录遍历
+        get_image_proxy()
+    spawn(_background_startup(), name="background-startup")
+    if settings.health_probe_enabled:
+        spawn(run_health_probe(tmdb_client, get_search_service()), name="health-probe")
     yield
+    await cancel_all()
     await tmdb_client.close()
+    await close_search_service()
+    await close_image_proxy()
 
 
 app = FastAPI(title="TMDB 海报墙", lifespan=lifespan)
+app.add_middleware(metrics.InFlightMiddleware)
+app.add_middleware(TracingMiddleware)
+app.add_middleware(HttpCacheMiddleware)
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(AdmissionMiddleware)
 
 APP_DIR = Path(__file__).parent
 STATIC_DIR = APP_DIR / "static"
 TEMPLATES_DIR = APP_DIR / "templates"
 
-app.mount("/static", StaticFiles(directory=str(STATIC_DIR)), name="static")
+app.mount("/static", PrecompressedStaticFiles(directory=str(STATIC_DIR)), name="static")
 templates = Jinja2Templates(directory=str(TEMPLATES_DIR))
+# 海报卡片按条目缓存渲染结果，各页面与流式首页共用
+poster_fragments = PosterFragments(
+    templates.env, settings.default_language, FragmentCache(settings.fragment_cache_max_entries)
+)
+templates.env.globals.update(
+    asset_url=asset_url, poster_card=poster_fragments, poster_grid=poster_fragments.grid
+)
+stream_env = create_stream_environment(TEMPLATES_DIR, **templates.env.globals)
+availability = get_availability_store()
 
 # 包含夸克搜索路由，添加/api前缀
 app.include_router(quark_router, prefix="/api")
 
 
+@app.get("/healthz", include_in_schema=False)
+async def healthz() -> Dict:
+    """存活检查：只确认进程能处理请求，不访问缓存或上游"""
+    return {"status": "ok"}
+
+
+@app.get("/readyz", include_in_schema=False)
+async def readyz() -> JSONResponse:
+    """就绪检查：熔断器、缓存连通性、上游并发占用与最近一次探测时间"""
+    ready, report = await readiness()
+    return JSONResponse(report, status_code=200 if ready else 503)
+
+
+if settings.metrics_enabled:
+    @app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+    async def metrics_endpoint() -> PlainTextResponse:
+        return PlainTextResponse(metrics.render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+if settings.image_proxy_enabled:
+    @app.get("/img/{size}/{path}", include_in_schema=False)
+    async def image(size: str, path: str) -> FileResponse:
+        """TMDB 图片代理：磁盘缓存命中时直接以文件响应发送（服务器支持时零拷贝）"""
+        try:
+            file_path = await get_image_proxy().get(size, path)
+        except ImageNotFound as exc:
+            raise HTTPException(status_code=404, detail="Image not found") from exc
+        except ImageUnavailable as exc:
+            raise HTTPException(status_code=502, detail="Image upstream unavailable") from exc
+        # TMDB 图片路径随内容变化，同一地址的内容不会改变
+        return FileResponse(file_path, headers={"Cache-Control": IMMUTABLE})
+
+
 def adapt_detail(item: Dict, client: TmdbClient) -> Dict:
     title = item.get("title") or item.get("name") or "未命名"
     date_field = item.get("release_date") or item.get("first_air_date") or ""
@@ -101,52 +191,18 @@ def adapt_detail(item: Dict, client: TmdbClient) -> Dict:
 
 
 def adapt_person(person: Dict, client: TmdbClient, credits: List[Dict]) -> Dict:
+    """人物页数据；credits 为已过滤的作品，代表作只取评分最高的若干部"""
     profile_url = client.image_url(person.get("profile_path"), "w500")
 
-    def credit_score(c: Dict) -> tuple:
-        va = c.get("vote_average") or 0
-        pop = c.get("popularity") or 0
-        date = c.get("release_date") or c.get("first_air_date") or ""
-        return (va, pop, date)
-
-    filtered = []
-    for c in credits:
-        mt = c.get("media_type") or ("movie" if "title" in c else "tv")
-        if mt not in ("movie", "tv") or not c.get("id"):
-            continue
-        filtered.append(c)
-
-    top_sorted = sorted(filtered, key=credit_score, reverse=True)[:12]
     top_credits = []
-    for c in top_sorted:
+    for c in person_credits.top_credits(credits):
         adapted = adapt_poster(c, client)
-        year = (c.get("release_date") or c.get("first_air_date") or "").split("-")[0] if (
-            c.get("release_date") or c.get("first_air_date")
-        ) else ""
-        role = c.get("character") or c.get("job") or ""
-        subtitle_parts = [p for p in [year, role] if p]
+        row = person_credits.credit_row(c)
+        subtitle_parts = [p for p in [row["year"], row["role"]] if p]
         if subtitle_parts:
             adapted["subtitle"] = " · ".join(subtitle_parts)
         top_credits.append(adapted)
 
-    all_credits = []
-    for c in filtered:
-        mt = c.get("media_type") or ("movie" if "title" in c else "tv")
-        title = c.get("title") or c.get("name") or "未命名"
-        date_field = c.get("release_date") or c.get("first_air_date") or ""
-        year = date_field.split("-")[0] if date_field else ""
-        role = c.get("character") or c.get("job") or ""
-        all_credits.append(
-            {
-                "id": c.get("id"),
-                "media_type": mt,
-                "title": title,
-                "year": year,
-                "role": role,
-            }
-        )
-    all_credits.sort(key=lambda x: x.get("year") or "", reverse=True)
-
     return {
         "id": person.get("id"),
         "name": person.get("name") or "",
@@ -156,45 +212,85 @@ def adapt_person(person: Dict, client: TmdbClient, credits: List[Dict]) -> Dict:
         "place_of_birth": person.get("place_of_birth") or "",
         "profile_url": profile_url,
         "top_credits": top_credits,
-        "all_credits": all_credits,
     }
 
 
-@app.get("/", response_class=HTMLResponse)
-async def home(request: Request) -> HTMLResponse:
+async def _load_person(person_id: int) -> Dict:
+    """获取人物详情，中文简介/头像/作品缺失时用英文数据补齐"""
     try:
-        sections_raw = await gather_sections(tmdb_client)
-    except httpx.HTTPError:
-        sections_raw = {key: [] for key in ["trending", "popular", "top_rated", "now_playing"]}
+        data = await tmdb_client.person(person_id)
+        if not data.get("biography") or not data.get("profile_path"):
+            try:
+                data_en = await tmdb_client.person(person_id, language_override="en-US")
+                data["biography"] = data.get("biography") or data_en.get("biography")
+                data["profile_path"] = data.get("profile_path") or data_en.get("profile_path")
+                data["combined_credits"] = data.get("combined_credits") or data_en.get("combined_credits")
+            except httpx.HTTPError:
+                pass
+    except httpx.HTTPStatusError as exc:
+        raise HTTPException(status_code=exc.response.status_code, detail="TMDB error") from exc
+    except httpx.HTTPError as exc:
+        raise HTTPException(status_code=502, detail="TMDB unavailable") from exc
+    return data
 
-    sections = {
-        key: [adapt_poster(item, tmdb_client) for item in value if item.get("id")]
-        for key, value in sections_raw.items()
-    }
-    return templates.TemplateResponse(
-        request,
-        "home.html",
-        {
-            "sections": sections,
-            "page_title": "TMDB 海报墙",
-        },
+
+def _combined_credits(data: Dict) -> List[Dict]:
+    combined = data.get("combined_credits") or {}
+    credits_cast = combined.get("cast") or []
+    credits_crew = combined.get("crew") or []
+    credits = credits_cast + credits_crew
+    if not credits and combined:
+        credits = credits_cast or credits_crew
+    return person_credits.filter_credits(credits)
+
+
+@app.get("/", response_class=HTMLResponse)
+async def home(request: Request) -> StreamingResponse:
+    """
+    首页流式渲染：页面框架与头部立即发出，各分区在对应 TMDB 数据到达后逐个发出，
+    首字节不再等待最慢的分区。
+    """
+
+    async def sections():
+        async for key, items in iter_sections(tmdb_client):
+            if settings.suggest_enabled:
+                get_suggest_index().add_items(items)
+            posters = [adapt_poster(item, tmdb_client) for item in items if item.get("id")]
+            availability.annotate(posters)
+            yield SECTION_KEYS.index(key), key, posters
+
+    # 响应头先于数据发出，无法按内容生成 ETag，也无法得知分区是否因 TMDB 故障而为空；
+    # 声明 no-cache，避免故障期间的空海报墙被浏览器或 CDN 缓存（TMDB 数据仍有服务端缓存）。
+    # 设置了 Cache-Control 的响应也不会被 HTTP 缓存中间件缓冲，保持流式发出
+    headers = {"Cache-Control": "no-cache"}
+    body = stream_template(
+        stream_env.get_template("home.html"),
+        {"request": request, "sections": sections(), "page_title": "TMDB 海报墙"},
     )
+    return StreamingResponse(body, media_type="text/html; charset=utf-8", headers=headers)
 
 
 @app.get("/search", response_class=HTMLResponse)
 async def search(request: Request, q: Optional[str] = "") -> HTMLResponse:
     posters: List[Dict] = []
+    degraded = False
     if q:
         try:
             results = await tmdb_client.search_multi(q)
         except httpx.HTTPError:
             results = []
+            degraded = True
         posters = [
             adapt_poster(item, tmdb_client)
             for item in results
             if item.get("id") and (item.get("media_type") in ("movie", "tv"))
         ]
-    return templates.TemplateResponse(
+        availability.annotate(posters)
+        if settings.suggest_enabled and posters:
+            index = get_suggest_index()
+            index.add_items(results)
+            index.add_query(q)
+    response = templates.TemplateResponse(
         request,
         "search.html",
         {
@@ -203,32 +299,57 @@ async def search(request: Request, q: Optional[str] = "") -> HTMLResponse:
             "page_title": f"搜索：{q}" if q else "搜索",
         },
     )
+    if degraded:
+        response.headers["Cache-Control"] = "no-store"
+    return response
+
+
+@app.get("/api/suggest")
+async def suggest(
+    q: str = Query("", max_length=100), limit: int = Query(10, ge=1, le=20)
+) -> Dict:
+    """
+    标题联想：从内存前缀索引返回匹配的条目与热门搜索词
+
+    索引由首页分区、搜索结果与详情页见过的条目增量构建；本地没有匹配的条目、且前缀通过回源准入
+    （最短长度、负缓存、回源额度）时才请求 TMDB 搜索，并把结果收录进索引。TMDB 不可用时返回空列表。
+    """
+    if not settings.suggest_enabled:
+        raise HTTPException(status_code=404, detail="Suggest disabled")
+    index = get_suggest_index()
+    items, queries = index.search(q, limit)
+    source = "local"
+    key = normalize_key(q)
+    if not items and key and await get_tmdb_fallback_gate().admit(key):
+        try:
+            results = await tmdb_client.search_multi(q.strip())
+        except httpx.HTTPError:
+            results = None
+        if results:
+            index.add_items(results)
+            items, queries = index.search(q, limit)
+        if results is not None and not items:
+            get_tmdb_fallback_gate().miss(key)
+        source = "tmdb"
+    if not items and not queries:
+        metrics.SUGGEST_EMPTY.inc()
+    elif source == "tmdb":
+        metrics.SUGGEST_TMDB.inc()
+    else:
+        metrics.SUGGEST_LOCAL.inc()
+    return {"query": q, "items": items, "queries": queries, "source": source}
 
 
 @app.get("/person/{person_id}", response_class=HTMLResponse)
 async def person_detail(request: Request, person_id: int) -> HTMLResponse:
-    try:
-        data = await tmdb_client.person(person_id)
-        if not data.get("biography") or not data.get("profile_path"):
-            try:
-                data_en = await tmdb_client.person(person_id, language_override="en-US")
-                data["biography"] = data.get("biography") or data_en.get("biography")
-                data["profile_path"] = data.get("profile_path") or data_en.get("profile_path")
-                data["combined_credits"] = data.get("combined_credits") or data_en.get("combined_credits")
-            except httpx.HTTPError:
-                pass
-    except httpx.HTTPStatusError as exc:
-        raise HTTPException(status_code=exc.response.status_code, detail="TMDB error") from exc
-    except httpx.HTTPError as exc:
-        raise HTTPException(status_code=502, detail="TMDB unavailable") from exc
-
-    combined = data.get("combined_credits") or {}
-    credits_cast = combined.get("cast") or []
-    credits_crew = combined.get("crew") or []
-    credits = credits_cast + credits_crew
-    if not credits and combined:
-        credits = credits_cast or credits_crew
+    data = await _load_person(person_id)
+    credits = _combined_credits(data)
     person_data = adapt_person(data, tmdb_client, credits)
+    availability.annotate(person_data["top_credits"])
+    # 全部作品只渲染首屏，其余由页面按游标请求 /person/{id}/credits
+    rows = await person_credits.cached_rows(person_id, tmdb_client.language, credits)
+    first_page, next_cursor = person_credits.paginate(rows, None, person_credits.FIRST_SCREEN_CREDITS)
+    person_data.update(all_credits=first_page, credits_total=len(rows), credits_cursor=next_cursor)
     return templates.TemplateResponse(
         request,
         "person.html",
@@ -239,6 +360,31 @@ async def person_detail(request: Request, person_id: int) -> HTMLResponse:
     )
 
 
+@app.get("/person/{person_id}/credits")
+async def person_credit_page(
+    person_id: int,
+    cursor: Optional[str] = None,
+    limit: int = Query(person_credits.FIRST_SCREEN_CREDITS, ge=1, le=100),
+) -> Dict:
+    """
+    人物全部作品的一页（年份倒序）
+
+    排好序的作品列表按人物缓存，翻页不再访问 TMDB。
+
+    Raises:
+        HTTPException: 游标不合法时 400；TMDB 错误同人物页
+    """
+    rows = await person_credits.cached_rows(person_id, tmdb_client.language)
+    if rows is None:
+        data = await _load_person(person_id)
+        rows = await person_credits.cached_rows(person_id, tmdb_client.language, _combined_credits(data))
+    try:
+        items, next_cursor = person_credits.paginate(rows, cursor, limit)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from exc
+    return {"items": items, "next_cursor": next_cursor, "total": len(rows)}
+
+
 @app.get("/{media_type}/{item_id}", response_class=HTMLResponse)
 async def detail(request: Request, media_type: str, item_id: int) -> HTMLResponse:
     if media_type not in ("movie", "tv"):
@@ -267,10 +413,21 @@ async def detail(request: Request, media_type: str, item_id: int) -> HTMLRespons
     except httpx.HTTPError as exc:
         raise HTTPException(status_code=502, detail="TMDB unavailable") from exc
 
+    if settings.suggest_enabled:
+        index = get_suggest_index()
+        index.add_item(data, media_type)
+        index.add_items((data.get("recommendations") or {}).get("results") or [], media_type)
+
+    if settings.prefetch_enabled:
+        # 用户通常接着请求夸克搜索接口，复用已取到的详情在后台预热
+        get_prefetcher().schedule(get_search_service(), media_type, item_id, data)
+
     detail_data = adapt_detail(data, tmdb_client)
     rec_posters = [
         adapt_poster(rec, tmdb_client) for rec in detail_data.get("recommendations", []) if rec.get("id")
     ][:12]
+    availability.annotate(rec_posters)
+    detail_data["availability"] = availability.get(media_type, item_id)
     video_previews = rec_posters[:2]
     return templates.TemplateResponse(
         request,
@@ -0,0 +1,345 @@
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# 默认耗时分桶（秒），覆盖从微秒级打分到秒级上游调用
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+_registry: List["_Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Sequence[Tuple[str, str]]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        _registry.append(self)
+
+    @abstractmethod
+    def _new_child(self):
+        pass
+
+    def labels(self, *values: str, **kwargs: str):
+        """
+        返回带标签的子指标；热路径上应在模块加载时取好子指标并复用
+
+        Args:
+            values / kwargs: 按 labelnames 顺序或名称给出的标签值
+        """
+        if kwargs:
+            values = tuple(str(kwargs[name]) for name in self.labelnames)
+        else:
+            values = tuple(str(v) for v in values)
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = self._new_child()
+        return child
+
+    @abstractmethod
+    def _samples(self) -> Iterable[Tuple[str, Sequence[Tuple[str, str]], float]]:
+        pass
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, labels, value in self._samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines)
+
+    def _labelled(self) -> Iterable[Tuple[List[Tuple[str, str]], object]]:
+        for values, child in sorted(self._children.items()):
+            yield list(zip(self.labelnames, values)), child
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0
+
+    def inc(self, amount: int = 1) -> None:
+        self.value += amount
+
+
+class Counter(_Metric):
+    """单调递增计数器"""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        if not self.labelnames:
+            self._children[()] = _CounterChild()
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: int = 1) -> None:
+        self._children[()].inc(amount)
+
+    def _samples(self):
+        for labels, child in self._labelled():
+            yield "", labels, child.value
+
+
+class _GaugeChild:
+    __slots__ = ("value", "func")
+
+    def __init__(self) -> None:
+        self.value = 0.0
+        self.func: Optional[Callable[[], float]] = None
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self.value -= amount
+
+    def set_function(self, func: Callable[[], float]) -> None:
+        """抓取时才调用 func 取值，热路径零开销"""
+        self.func = func
+
+    def get(self) -> float:
+        return self.func() if self.func is not None else self.value
+
+
+class Gauge(_Metric):
+    """可增可减的瞬时值"""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        if not self.labelnames:
+            self._children[()] = _GaugeChild()
+
+    def _new_child(self) -> _GaugeChild:
+        return _GaugeChild()
+
+    def set(self, value: float) -> None:
+        self._children[()].set(value)
+
+    def inc(self, amount: float = 1) -> None:
+        self._children[()].inc(amount)
+
+    def dec(self, amount: float = 1) -> None:
+        self._children[()].dec(amount)
+
+    def set_function(self, func: Callable[[], float]) -> None:
+        self._children[()].set_function(func)
+
+    def _samples(self):
+        for labels, child in self._labelled():
+            yield "", labels, child.get()
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: Tuple[float, ...]) -> None:
+        self.bounds = bounds
+        # 最后一个桶对应 +Inf
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class Histogram(_Metric):
+    """
+    分桶直方图。observe 只做一次二分查找和两次加法（约 0.2µs），
+    累计分布在抓取时计算。
+    """
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+        if not self.labelnames:
+            self._children[()] = _HistogramChild(self.buckets)
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._children[()].observe(value)
+
+    def _samples(self):
+        for labels, child in self._labelled():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), child.counts):
+                cumulative += count
+                yield "_bucket", [*labels, ("le", _format_value(bound))], cumulative
+            yield "_sum", labels, child.sum
+            yield "_count", labels, cumulative
+
+
+def render_metrics() -> str:
+    """按 Prometheus 文本格式输出所有已注册指标"""
+    return "\n".join(metric.render() for metric in _registry) + "\n"
+
+
+# ---- 应用指标 ----
+
+STAGE_SECONDS = Histogram(
+    "qsm_stage_seconds",
+    "Latency of search pipeline stages in seconds",
+    labelnames=("stage",),
+)
+TMDB_FETCH = STAGE_SECONDS.labels(stage="tmdb_fetch")
+QUARK_FETCH = STAGE_SECONDS.labels(stage="quark_fetch")
+PARSE = STAGE_SECONDS.labels(stage="parse")
+SCORING = STAGE_SECONDS.labels(stage="scoring")
+DTO_BUILD = STAGE_SECONDS.labels(stage="dto_build")
+SERIALIZE = STAGE_SECONDS.labels(stage="serialize")
+CACHE_GET = STAGE_SECONDS.labels(stage="cache_get")
+CACHE_SET = STAGE_SECONDS.labels(stage="cache_set")
+
+CACHE_REQUESTS = Counter("qsm_cache_requests_total", "Cache lookups by result", labelnames=("result",))
+CACHE_HITS = CACHE_REQUESTS.labels(result="hit")
+CACHE_MISSES = CACHE_REQUESTS.labels(result="miss")
+SEARCH_COALESCED = Counter(
+    "qsm_search_coalesced_total", "Quark searches that joined an in-flight search for the same cache key"
+)
+
+UPSTREAM_ERRORS = Counter("qsm_upstream_errors_total", "Failed upstream calls", labelnames=("upstream",))
+UPSTREAM_RETRIES = Counter(
+    "qsm_upstream_retries_total", "Upstream retries and hedged requests", labelnames=("upstream",)
+)
+TMDB_ERRORS = UPSTREAM_ERRORS.labels(upstream="tmdb")
+QUARK_ERRORS = UPSTREAM_ERRORS.labels(upstream="quark")
+TMDB_RETRIES = UPSTREAM_RETRIES.labels(upstream="tmdb")
+QUARK_RETRIES = UPSTREAM_RETRIES.labels(upstream="quark")
+
+HTTP_INFLIGHT = Gauge("qsm_http_requests_in_flight", "HTTP requests currently being served")
+UPSTREAM_ACTIVE = Gauge("qsm_upstream_active", "Upstream scheduler slots in use", labelnames=("upstream",))
+UPSTREAM_QUEUED = Gauge("qsm_upstream_queued", "Upstream calls waiting for a scheduler slot", labelnames=("upstream",))
+UPSTREAM_CAPACITY = Gauge("qsm_upstream_capacity", "Upstream scheduler concurrency limit", labelnames=("upstream",))
+UPSTREAM_CIRCUIT = Gauge(
+    "qsm_upstream_circuit_open", "Circuit breaker state (0 closed, 0.5 half open, 1 open)", labelnames=("upstream",)
+)
+ADMISSION_REQUESTS = Counter(
+    "qsm_admission_requests_total", "Rate-limited API requests by admission result", labelnames=("result",)
+)
+ADMISSION_ALLOWED = ADMISSION_REQUESTS.labels(result="allowed")
+ADMISSION_LIMITED = ADMISSION_REQUESTS.labels(result="limited")
+ADMISSION_TOKENS = Counter(
+    "qsm_admission_tokens_charged_total", "Tokens charged to API clients by request kind", labelnames=("kind",)
+)
+ADMISSION_HIT_TOKENS = ADMISSION_TOKENS.labels(kind="hit")
+ADMISSION_MISS_TOKENS = ADMISSION_TOKENS.labels(kind="miss")
+ADMISSION_BUCKETS = Gauge("qsm_admission_buckets", "Client token buckets held in process memory")
+
+HTTP_NOT_MODIFIED = Counter(
+    "qsm_http_not_modified_total",
+    "304 responses (shortcut: answered from stored ETag, revalidated: rendered then matched)",
+    labelnames=("mode",),
+)
+HTTP_NOT_MODIFIED_SHORTCUT = HTTP_NOT_MODIFIED.labels(mode="shortcut")
+HTTP_NOT_MODIFIED_REVALIDATED = HTTP_NOT_MODIFIED.labels(mode="revalidated")
+HTTP_VALIDATORS = Gauge("qsm_http_validators", "ETags held for 304 shortcuts")
+
+FRAGMENT_REQUESTS = Counter(
+    "qsm_fragment_cache_requests_total", "Rendered template fragment lookups by result", labelnames=("result",)
+)
+FRAGMENT_HITS = FRAGMENT_REQUESTS.labels(result="hit")
+FRAGMENT_MISSES = FRAGMENT_REQUESTS.labels(result="miss")
+FRAGMENT_ENTRIES = Gauge("qsm_fragment_cache_entries", "Rendered template fragments held in memory")
+
+IMAGE_REQUESTS = Counter(
+    "qsm_image_proxy_requests_total",
+    "Image proxy lookups (hit: disk cache, miss: fetched upstream, coalesced: joined an in-flight fetch)",
+    labelnames=("result",),
+)
+IMAGE_HITS = IMAGE_REQUESTS.labels(result="hit")
+IMAGE_MISSES = IMAGE_REQUESTS.labels(result="miss")
+IMAGE_COALESCED = IMAGE_REQUESTS.labels(result="coalesced")
+IMAGE_CACHE_BYTES = Gauge("qsm_image_cache_bytes", "Bytes held in the on-disk image cache")
+
+SUGGEST_LOOKUPS = Counter(
+    "qsm_suggest_lookups_total",
+    "Title suggestion lookups (local: answered from the prefix index, tmdb: fell back to search, empty: no hits)",
+    labelnames=("source",),
+)
+SUGGEST_LOCAL = SUGGEST_LOOKUPS.labels(source="local")
+SUGGEST_TMDB = SUGGEST_LOOKUPS.labels(source="tmdb")
+SUGGEST_EMPTY = SUGGEST_LOOKUPS.labels(source="empty")
+SUGGEST_TMDB_SKIPPED = Counter(
+    "qsm_suggest_tmdb_skipped_total",
+    "Suggestion lookups that had no local match but did not fall back to TMDB "
+    "(short: prefix too short, negative: prefix recently had no hits, budget: fallback rate limit)",
+    labelnames=("reason",),
+)
+SUGGEST_SKIPPED_SHORT = SUGGEST_TMDB_SKIPPED.labels(reason="short")
+SUGGEST_SKIPPED_NEGATIVE = SUGGEST_TMDB_SKIPPED.labels(reason="negative")
+SUGGEST_SKIPPED_BUDGET = SUGGEST_TMDB_SKIPPED.labels(reason="budget")
+SUGGEST_ENTRIES = Gauge("qsm_suggest_index_entries", "Titles and popular queries held in the suggestion index")
+
+BACKGROUND_TASKS = Gauge("qsm_background_tasks", "Background tasks currently running")
+
+
+def bind_pool_gauges() -> None:
+    """把调度器槽位、熔断器状态与后台任务数注册为抓取时计算的 gauge"""
+    from app import background
+    from app.circuit_breaker import CLOSED, OPEN, get_breaker
+    from app.scheduler import get_scheduler
+
+    for name in ("quark", "tmdb"):
+        scheduler = get_scheduler(name)
+        UPSTREAM_ACTIVE.labels(upstream=name).set_function(lambda s=scheduler: s.active)
+        UPSTREAM_QUEUED.labels(upstream=name).set_function(lambda s=scheduler: s.queued())
+        UPSTREAM_CAPACITY.labels(upstream=name).set_function(lambda s=scheduler: s.concurrency)
+        breaker = get_breaker(name)
+        UPSTREAM_CIRCUIT.labels(upstream=name).set_function(
+            lambda b=breaker: 0.0 if b.state == CLOSED else (1.0 if b.state == OPEN else 0.5)
+        )
+    BACKGROUND_TASKS.set_function(lambda: len(background._tasks))
+
+
+class InFlightMiddleware:
+    """统计正在处理的 HTTP 请求数（纯 ASGI 中间件，不包装响应）"""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        HTTP_INFLIGHT.inc()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            HTTP_INFLIGHT.dec()
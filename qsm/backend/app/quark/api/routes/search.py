@@ -1,16 +1,42 @@
-from fastapi import APIRouter, Query
+import logging
+import time
+
+from fastapi import APIRouter, Header, Query, Response
+from fastapi.responses import StreamingResponse
 from typing import Optional
 
-from app.quark.services.search_service import SearchService
+from app.deadline import deadline_scope, request_timeout
+from app.quark.schemas.projection import Projection, dumps, json_response
+from app.quark.schemas.search import BatchSearchRequest, BatchSearchResponse, SearchResponse
+from app.quark.services.search_service import get_search_service
 
 router = APIRouter(prefix="/quark", tags=["quark"])
+logger = logging.getLogger(__name__)
+
+
+FIELDS_DESCRIPTION = "只返回资源的这些字段（逗号分隔，如 name,link,overall_score,resolution）"
+COMPACT_DESCRIPTION = "资源以数组形式返回，字段顺序见响应中的 fields 表头"
+
+
+def _no_store_incomplete(response: Response, result: SearchResponse) -> None:
+    """
+    失败或超时返回的部分结果不允许浏览器或 CDN 缓存，HTTP 缓存中间件也不会为其生成 ETag
+    （上游故障时的空结果若被缓存，恢复后仍会在整个缓存期内返回空结果）
+    """
+    if result.partial or not result.success:
+        response.headers["Cache-Control"] = "no-store"
 
 
 @router.get("/search/tmdb/{tmdb_id}", summary="通过TMDB ID搜索夸克资源")
 async def search_by_tmdb_id(
+    response: Response,
     tmdb_id: int,
     media_type: str = Query("movie", description="媒体类型，可选值：movie, tv"),
-    max_results: int = Query(20, description="最大结果数量", ge=1, le=100)
+    max_results: int = Query(20, description="最大结果数量", ge=1, le=100),
+    timeout: Optional[float] = Query(None, description="请求时限（秒），超时返回部分结果", gt=0),
+    x_request_timeout: Optional[str] = Header(None, description="请求时限（秒），timeout 参数优先"),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    compact: bool = Query(False, description=COMPACT_DESCRIPTION),
 ):
     """
     通过TMDB ID搜索夸克资源
@@ -19,24 +45,33 @@ async def search_by_tmdb_id(
         tmdb_id: TMDB ID
         media_type: 媒体类型（movie或tv）
         max_results: 最大结果数量
+        timeout: 请求时限（秒），缺省时取 X-Request-Timeout 头或 REQUEST_TIMEOUT
         
     Returns:
-        搜索结果
-    """
-    import logging
-    logger = logging.getLogger(__name__)
-    logger.info(f"API called: tmdb_id={tmdb_id}, media_type={media_type}, max_results={max_results}")
-    service = SearchService()
-    result = await service.search_by_tmdb_id(tmdb_id, max_results, media_type)
-    logger.info(f"API returned: total={result.total}, resources={len(result.resources)}")
+        搜索结果；截止时间到达时 partial=true
+    """
+    logger.debug("search_by_tmdb_id: tmdb_id=%s, media_type=%s, max_results=%s", tmdb_id, media_type, max_results)
+    projection = Projection.from_query(fields, compact)
+    service = get_search_service()
+    with deadline_scope(request_timeout(timeout, x_request_timeout)):
+        result = await service.search_by_tmdb_id(tmdb_id, max_results, media_type)
+    logger.debug("search_by_tmdb_id: total=%d, resources=%d", result.total, len(result.resources))
+    _no_store_incomplete(response, result)
+    if projection:
+        return json_response(projection.search_response(result), response)
     return result
 
 
 @router.get("/search/title", summary="通过标题搜索夸克资源")
 async def search_by_title(
+    response: Response,
     title: str = Query(..., description="搜索标题"),
     year: Optional[int] = Query(None, description="年份"),
-    max_results: int = Query(20, description="最大结果数量", ge=1, le=100)
+    max_results: int = Query(20, description="最大结果数量", ge=1, le=100),
+    timeout: Optional[float] = Query(None, description="请求时限（秒），超时返回部分结果", gt=0),
+    x_request_timeout: Optional[str] = Header(None, description="请求时限（秒），timeout 参数优先"),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    compact: bool = Query(False, description=COMPACT_DESCRIPTION),
 ):
     """
     通过标题搜索夸克资源
@@ -45,9 +80,74 @@ async def search_by_title(
         title: 搜索标题
         year: 年份（可选）
         max_results: 最大结果数量
+        timeout: 请求时限（秒），缺省时取 X-Request-Timeout 头或 REQUEST_TIMEOUT
+        
+    Returns:
+        搜索结果；截止时间到达时 partial=true
+    """
+    projection = Projection.from_query(fields, compact)
+    service = get_search_service()
+    with deadline_scope(request_timeout(timeout, x_request_timeout)):
+        result = await service.search_by_title(title, year, max_results)
+    _no_store_incomplete(response, result)
+    if projection:
+        return json_response(projection.search_response(result), response)
+    return result
+
+
+@router.post("/search/batch", summary="批量通过TMDB ID搜索夸克资源")
+async def search_batch(
+    request: BatchSearchRequest,
+    timeout: Optional[float] = Query(None, description="请求时限（秒），超时返回部分结果", gt=0),
+    x_request_timeout: Optional[str] = Header(None, description="请求时限（秒），timeout 参数优先"),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    compact: bool = Query(False, description=COMPACT_DESCRIPTION),
+):
+    """
+    批量通过TMDB ID搜索夸克资源
+    
+    Args:
+        request: 条目列表（tmdb_id, media_type）、每条最大结果数量、是否流式返回
+        timeout: 整批请求的时限（秒），缺省时取 X-Request-Timeout 头或 REQUEST_TIMEOUT
+        fields: 只返回资源的这些字段
+        compact: 资源以数组形式返回
         
     Returns:
-        搜索结果
+        按请求顺序排列的结果；stream=true 时按完成顺序逐行返回 NDJSON
     """
-    service = SearchService()
-    return await service.search_by_title(title, year, max_results)
\ No newline at end of file
+    projection = Projection.from_query(fields, compact)
+    service = get_search_service()
+    seconds = request_timeout(timeout, x_request_timeout)
+    if request.stream:
+        async def ndjson():
+            # 流式响应在路由返回后才迭代，截止时间需在生成器内设置
+            with deadline_scope(seconds):
+                async for result in service.search_batch(request.items, request.max_results):
+                    if projection:
+                        yield dumps(projection.batch_result(result)) + "\n"
+                    else:
+                        yield result.model_dump_json() + "\n"
+        
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+    
+    start = time.time()
+    with deadline_scope(seconds):
+        results = [result async for result in service.search_batch(request.items, request.max_results)]
+    order = {}
+    for i, item in enumerate(request.items):
+        order.setdefault((item.tmdb_id, item.media_type), i)
+    results.sort(key=lambda r: order[(r.tmdb_id, r.media_type)])
+    query_time = round(time.time() - start, 3)
+    if projection:
+        return json_response({
+            "results": [projection.batch_result(r) for r in results],
+            "total": len(results),
+            "cached": sum(1 for r in results if r.cached),
+            "query_time": query_time,
+        })
+    return BatchSearchResponse(
+        results=results,
+        total=len(results),
+        cached=sum(1 for r in results if r.cached),
+        query_time=query_time,
+    )
@@ -1,8 +1,9 @@
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 import json
 import time
 from abc import ABC, abstractmethod
 
+from app import metrics
 from app.config import get_settings
 
 
@@ -11,6 +12,9 @@ class CacheBackend(ABC):
     async def get(self, key: str) -> Optional[Any]:
         pass
 
+    async def get_many(self, keys: List[str]) -> List[Optional[Any]]:
+        return [await self.get(key) for key in keys]
+
     @abstractmethod
     async def set(self, key: str, value: Any, ttl: int) -> None:
         pass
@@ -23,6 +27,9 @@ class CacheBackend(ABC):
     async def clear(self) -> None:
         pass
 
+    async def ping(self) -> bool:
+        return True
+
 
 class MemoryCache(CacheBackend):
     def __init__(self):
@@ -66,6 +73,15 @@ class RedisCache(CacheBackend):
         except Exception:
             return None
 
+    async def get_many(self, keys: List[str]) -> List[Optional[Any]]:
+        if not keys:
+            return []
+        try:
+            values = await self._redis.mget(keys)
+            return [json.loads(v) if v else None for v in values]
+        except Exception:
+            return [None] * len(keys)
+
     async def set(self, key: str, value: Any, ttl: int) -> None:
         try:
             await self._redis.setex(key, ttl, json.dumps(value))
@@ -84,6 +100,12 @@ class RedisCache(CacheBackend):
         except Exception:
             pass
 
+    async def ping(self) -> bool:
+        try:
+            return bool(await self._redis.ping())
+        except Exception:
+            return False
+
 
 class CacheManager:
     def __init__(self):
@@ -104,12 +126,29 @@ class CacheManager:
     async def get(self, key: str) -> Optional[Any]:
         if not self.enabled or not self._backend:
             return None
-        return await self._backend.get(key)
+        start = time.perf_counter()
+        value = await self._backend.get(key)
+        metrics.CACHE_GET.observe(time.perf_counter() - start)
+        (metrics.CACHE_MISSES if value is None else metrics.CACHE_HITS).inc()
+        return value
+
+    async def get_many(self, keys: List[str]) -> List[Optional[Any]]:
+        if not self.enabled or not self._backend:
+            return [None] * len(keys)
+        start = time.perf_counter()
+        values = await self._backend.get_many(keys)
+        metrics.CACHE_GET.observe(time.perf_counter() - start)
+        hits = sum(1 for v in values if v is not None)
+        metrics.CACHE_HITS.inc(hits)
+        metrics.CACHE_MISSES.inc(len(values) - hits)
+        return values
 
     async def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
         if not self.enabled or not self._backend:
             return
+        start = time.perf_counter()
         await self._backend.set(key, value, ttl or self.ttl)
+        metrics.CACHE_SET.observe(time.perf_counter() - start)
 
     async def delete(self, key: str) -> None:
         if not self.enabled or not self._backend:
@@ -121,6 +160,18 @@ class CacheManager:
             return
         await self._backend.clear()
 
+    @property
+    def backend_name(self) -> str:
+        if not self.enabled or not self._backend:
+            return "disabled"
+        return "redis" if isinstance(self._backend, RedisCache) else "memory"
+
+    async def ping(self) -> bool:
+        """缓存后端是否可用（内存缓存与关闭缓存时恒为 True）"""
+        if not self.enabled or not self._backend:
+            return True
+        return await self._backend.ping()
+
 
 _cache_manager: Optional[CacheManager] = None
 
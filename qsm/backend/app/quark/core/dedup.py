@@ -0,0 +1,176 @@
+import re
+import unicodedata
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Collection, Dict, List, Optional, Tuple
+
+from app.quark.core.enhanced_scoring import bigram_codes, normalize_text, parse_size_to_gb
+from app.quark.core.quark_client import QuarkResource
+
+_MASK64 = (1 << 64) - 1
+_PUNCT_RE = re.compile(r"[\W_]+")
+_DIGITS_RE = re.compile(r"\d+")
+_CN_ORDINAL_RE = re.compile(r"第([零〇一二两三四五六七八九十百]+)[集话話期季部]")
+_CN_DIGITS = {"零": 0, "〇": 0, "一": 1, "二": 2, "两": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9}
+# 64 位指纹按 16 位分 4 段：海明距离 <= 3 的两个指纹至少有一段完全相同
+_BANDS = 4
+_BAND_BITS = 64 // _BANDS
+
+
+def _mix64(x: int) -> int:
+    """splitmix64，把 bigram 编码打散成均匀的 64 位哈希"""
+    x = (x + 0x9E3779B97F4A7C15) & _MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return x ^ (x >> 31)
+
+
+@lru_cache(maxsize=65536)
+def _bit_lanes(code: int) -> int:
+    """把 64 位哈希的每一位展开到独立字节，求和即得到逐位计数"""
+    h = _mix64(code)
+    return int.from_bytes(bytes((h >> bit) & 1 for bit in range(64)), "little")
+
+
+@lru_cache(maxsize=256)
+def _majority_table(n: int) -> bytes:
+    return bytes(0x31 if 2 * v > n else 0x30 for v in range(256))
+
+
+def simhash(codes: Collection[int]) -> int:
+    """基于 bigram 编码集合计算 64 位 SimHash（每位按多数票取值）"""
+    n = len(codes)
+    if n < 256:
+        # 每个字节是一个计数通道，n < 256 时不会进位溢出
+        counts = sum(map(_bit_lanes, codes)).to_bytes(64, "little")
+        return int(counts.translate(_majority_table(n))[::-1], 2)
+    ones = [0] * 64
+    for code in codes:
+        h = _mix64(code)
+        for bit in range(64):
+            ones[bit] += (h >> bit) & 1
+    return sum(1 << bit for bit in range(64) if 2 * ones[bit] > n)
+
+
+def dedup_key(name: str) -> str:
+    """去重用的名称归一化：在 normalize_text 基础上去掉标点与分隔符"""
+    return _PUNCT_RE.sub("", normalize_text(name))
+
+
+def _cn_number(text: str) -> int:
+    """三、十二、一百零五 之类的中文数字（到百位）"""
+    total, digit = 0, 0
+    for ch in text:
+        if ch == "百":
+            total += (digit or 1) * 100
+            digit = 0
+        elif ch == "十":
+            total += (digit or 1) * 10
+            digit = 0
+        else:
+            digit = _CN_DIGITS[ch]
+    return total + digit
+
+
+def numeric_tokens(name: str) -> Tuple[int, ...]:
+    """
+    名称中的全部数字（季、集、年份、分辨率、部数等），第三集这类中文序数折算为数字
+
+    只差一个集数的两个长名称 SimHash 往往只差几位，数字不同的资源不能合并。
+    """
+    n = unicodedata.normalize("NFKC", name or "")
+    numbers = [_cn_number(m) for m in _CN_ORDINAL_RE.findall(n)]
+    numbers.extend(int(d) for d in _DIGITS_RE.findall(n))
+    return tuple(sorted(numbers))
+
+
+def _sizes_agree(a: Optional[float], b: Optional[float], tolerance: float) -> bool:
+    if a is None or b is None:
+        return a is None and b is None
+    return abs(a - b) <= tolerance * max(a, b)
+
+
+def _prior(resource: QuarkResource) -> tuple:
+    """打分前选代表的先验：浏览量高、更新时间新、体积已知者优先"""
+    return (resource.views or 0, resource.updatetime or "", bool(resource.size))
+
+
+@dataclass(slots=True)
+class ResourceCluster:
+    """近似重复资源簇，representative 参与打分，alternates 为其余分享"""
+    representative: QuarkResource
+    alternates: List[QuarkResource] = field(default_factory=list)
+    fingerprint: int = 0
+    size_gb: Optional[float] = None
+    numbers: Tuple[int, ...] = ()
+
+    @property
+    def members(self) -> List[QuarkResource]:
+        return [self.representative, *self.alternates]
+
+
+def cluster_resources(
+    resources: List[QuarkResource],
+    max_distance: int = 3,
+    size_tolerance: float = 0.05,
+) -> List[ResourceCluster]:
+    """
+    按链接精确去重，并按名称 SimHash + 体积一致性合并近似重复资源
+
+    近似合并还要求名称中的数字完全一致（不同集、不同年份不合并）；
+    归一化后名称为空的资源只按链接去重。
+
+    Args:
+        resources: 原始资源列表（保持上游顺序）
+        max_distance: SimHash 最大海明距离（分 4 段检索，超过 3 时可能漏检）
+        size_tolerance: 体积相对误差容忍度
+
+    Returns:
+        资源簇列表，顺序与各簇首次出现的位置一致
+    """
+    clusters: List[ResourceCluster] = []
+    by_link: Dict[str, ResourceCluster] = {}
+    bands: List[Dict[int, List[ResourceCluster]]] = [{} for _ in range(_BANDS)]
+    band_mask = (1 << _BAND_BITS) - 1
+
+    for resource in resources:
+        cluster = by_link.get(resource.link)
+        if cluster is not None:
+            cluster.alternates.append(resource)
+            continue
+
+        key = dedup_key(resource.name)
+        fingerprint = simhash(bigram_codes(key))
+        size_gb = parse_size_to_gb(resource.size)
+        numbers = numeric_tokens(resource.name)
+        for i in range(_BANDS if key else 0):
+            for candidate in bands[i].get((fingerprint >> (i * _BAND_BITS)) & band_mask, ()):
+                if (
+                    bin(candidate.fingerprint ^ fingerprint).count("1") <= max_distance
+                    and candidate.numbers == numbers
+                    and _sizes_agree(candidate.size_gb, size_gb, size_tolerance)
+                ):
+                    cluster = candidate
+                    break
+            if cluster is not None:
+                break
+
+        if cluster is None:
+            cluster = ResourceCluster(
+                representative=resource, fingerprint=fingerprint, size_gb=size_gb, numbers=numbers
+            )
+            clusters.append(cluster)
+            # 空名称不进入 SimHash 分段表，不会与其他资源近似合并
+            for i in range(_BANDS if key else 0):
+                bands[i].setdefault((fingerprint >> (i * _BAND_BITS)) & band_mask, []).append(cluster)
+        else:
+            cluster.alternates.append(resource)
+        by_link[resource.link] = cluster
+
+    for cluster in clusters:
+        if cluster.alternates:
+            members = cluster.members
+            best = max(members, key=_prior)
+            cluster.representative = best
+            cluster.alternates = [r for r in members if r is not best]
+    return clusters
@@ -1,6 +1,11 @@
 import re, math, unicodedata
+from dataclasses import dataclass
 from datetime import datetime, timezone
-from typing import Optional, Dict, Any
+from functools import lru_cache
+from typing import TYPE_CHECKING, FrozenSet, NamedTuple, Optional, Dict, Any, Tuple
+
+if TYPE_CHECKING:
+    from app.quark.core.quark_client import QuarkResource
 
 VIDEO_NEG = [
     "解说文案","文案","讲解稿","台词","脚本","宣传文案","攻略","补丁","修改器",
@@ -92,6 +97,62 @@ def text_similarity(query: str, name: str) -> float:
 
     return max(j, tok_hit * 0.9)
 
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_SINGLE_CHAR_FLAG = 1 << 42
+
+def bigram_codes(s: str) -> FrozenSet[int]:
+    """把 normalize_text 的结果编码成整数 bigram 集合（与 text_similarity 中的 bigrams 一一对应）"""
+    if len(s) < 2:
+        return frozenset((_SINGLE_CHAR_FLAG | ord(s),)) if s else frozenset()
+    o = list(map(ord, s))
+    return frozenset([(a << 21) | b for a, b in zip(o, o[1:])])
+
+class NameFeatures(NamedTuple):
+    """资源名称的文本特征，按名称缓存，跨查询复用"""
+    normalized: str
+    bigrams: FrozenSet[int]
+    tokens: FrozenSet[str]
+
+@lru_cache(maxsize=8192)
+def name_features(name: str) -> NameFeatures:
+    nn = normalize_text(name)
+    tokens = frozenset(_TOKEN_RE.findall(unicodedata.normalize("NFKC", name or "").lower()))
+    return NameFeatures(nn, bigram_codes(nn), tokens)
+
+class QueryMatcher:
+    """
+    每次搜索构建一次的查询签名，避免对每个候选重复归一化与切分查询词。
+    similarity() 的结果与 text_similarity(query, name) 完全一致。
+    """
+
+    __slots__ = ("query", "normalized", "bigrams", "tokens")
+
+    def __init__(self, query: str):
+        self.query = query
+        self.normalized = normalize_text(query)
+        self.bigrams = bigram_codes(self.normalized)
+        # 保留重复 token，与 text_similarity 的命中率计算口径一致
+        self.tokens = _TOKEN_RE.findall(unicodedata.normalize("NFKC", query).lower()) if self.normalized else []
+
+    def similarity(self, features: NameFeatures) -> float:
+        qn, nn = self.normalized, features.normalized
+        if not qn or not nn: return 0.0
+        if qn in nn: return 1.0
+
+        nbg = features.bigrams
+        inter = len(self.bigrams & nbg)
+        uni = len(self.bigrams) + len(nbg) - inter
+        j = inter / uni if uni else 0.0
+
+        qtok = self.tokens
+        if qtok:
+            ntok = features.tokens
+            tok_hit = sum(1 for t in qtok if t in ntok) / len(qtok)
+        else:
+            tok_hit = 0.0
+
+        return max(j, tok_hit * 0.9)
+
 def intent_score(name: str, size_gb, tags) -> float:
     n = unicodedata.normalize("NFKC", name or "")
     nl = n.lower()
@@ -208,9 +269,35 @@ def freshness_score(updatetime: str) -> float:
     except:
         return 0.5
 
-def score_item(query: str, item: dict) -> Optional[Dict[str, Any]]:
-    name = item.get("name", "")
-    size_gb = parse_size_to_gb(item.get("size", ""))
+@dataclass(slots=True)
+class ScoreBreakdown:
+    """score_item 的打分明细，字段与 ResourceDto 中的解释字段同名"""
+    score: float
+    Conf: float
+    Qual: float
+    alpha: float
+    tags: Tuple[str, ...]  # 已排序
+    size_gb: Optional[float]
+    C_text: float
+    C_intent: float
+    C_plaus: float
+    P: float
+    R: float
+
+def score_item(query: str, item: "QuarkResource", matcher: Optional[QueryMatcher] = None) -> Optional[ScoreBreakdown]:
+    """
+    对单个资源打分
+
+    Args:
+        query: 搜索关键词
+        item: 资源（读取 name / size / views / updatetime）
+        matcher: 同一次搜索共用的查询签名
+
+    Returns:
+        打分明细；文档、安装包等非视频资源返回 None
+    """
+    name = item.name or ""
+    size_gb = parse_size_to_gb(item.size or "")
     tags = extract_tags(name)
     nl = unicodedata.normalize("NFKC", name).lower()
 
@@ -219,7 +306,10 @@ def score_item(query: str, item: dict) -> Optional[Dict[str, Any]]:
     if any(ext in nl for ext in ARCHIVE_EXT) and (size_gb is None or size_gb < 0.7): return None
     if size_gb is not None and size_gb < 0.5 and ({"4k","bdmv","remux","bluray","dv","hdr"} & tags): return None
 
-    c_text = text_similarity(query, name)
+    if matcher is not None:
+        c_text = matcher.similarity(name_features(name))
+    else:
+        c_text = text_similarity(query, name)
     c_int = intent_score(name, size_gb, tags)
     c_plaus = plausibility_score(name, size_gb, tags)
 
@@ -230,8 +320,8 @@ def score_item(query: str, item: dict) -> Optional[Dict[str, Any]]:
 
     qual = quality_score(tags, name, size_gb)
 
-    P = popularity_score(item.get("views", 0))
-    R = freshness_score(item.get("updatetime"))
+    P = popularity_score(item.views or 0)
+    R = freshness_score(item.updatetime)
 
     zxd_high = (c_text >= 0.8 and c_int >= 0.8 and c_plaus >= 0.8)
     plaus_low = (c_plaus < 0.4)
@@ -243,16 +333,4 @@ def score_item(query: str, item: dict) -> Optional[Dict[str, Any]]:
     if conf < 0.08:
         score = conf
 
-    return {
-        "score": score,
-        "Conf": conf,
-        "Qual": qual,
-        "alpha": a,
-        "tags": sorted(tags),
-        "size_gb": size_gb,
-        "C_text": c_text,
-        "C_intent": c_int,
-        "C_plaus": c_plaus,
-        "P": P,
-        "R": R
-    }
+    return ScoreBreakdown(score, conf, qual, a, tuple(sorted(tags)), size_gb, c_text, c_int, c_plaus, P, R)
@@ -1,5 +1,6 @@
-from typing import Optional, Any
+from typing import Any, Dict, Optional
 
+from app.deadline import DeadlineExceeded
 from app.tmdb import TmdbClient
 
 
@@ -29,36 +30,55 @@ class MediaFetcher:
         Returns:
             MediaInfo对象或None
         """
-        from app.quark.core.models import MediaInfo
-        
         try:
             data = await self.tmdb.details(media_type, tmdb_id)
             
             if not data:
                 return None
             
-            # 提取年份
-            release_date = data.get("release_date") or data.get("first_air_date")
-            year = int(release_date[:4]) if release_date else None
-            
-            # 构建MediaInfo对象
-            return MediaInfo(
-                tmdb_id=tmdb_id,
-                title=data.get("title") or data.get("name"),
-                original_title=data.get("original_title") or data.get("original_name"),
-                year=year,
-                rating=data.get("vote_average"),
-                overview=data.get("overview"),
-                poster_path=data.get("poster_path"),
-                backdrop_path=data.get("backdrop_path"),
-                media_type=media_type,
-                genres=[genre["name"] for genre in data.get("genres", [])],
-                release_date=release_date,
-                first_air_date=data.get("first_air_date"),
-            )
+            return self.from_details(data, tmdb_id, media_type)
+        except DeadlineExceeded:
+            raise
         except Exception:
             return None
     
+    def from_details(self, data: Dict[str, Any], tmdb_id: int, media_type: str) -> Optional[Any]:
+        """
+        由已获取的TMDB详情构建媒体信息，避免重复请求TMDB
+        
+        Args:
+            data: TMDB details 响应
+            tmdb_id: TMDB ID
+            media_type: 媒体类型（movie或tv）
+            
+        Returns:
+            MediaInfo对象或None
+        """
+        from app.quark.core.models import MediaInfo
+        
+        if not data:
+            return None
+        
+        # 提取年份
+        release_date = data.get("release_date") or data.get("first_air_date")
+        year = int(release_date[:4]) if release_date else None
+        
+        # 构建MediaInfo对象
+        return MediaInfo(
+            tmdb_id=tmdb_id,
+            title=data.get("title") or data.get("name"),
+            original_title=data.get("original_title") or data.get("original_name"),
+            year=year,
+            rating=data.get("vote_average"),
+            overview=data.get("overview"),
+            poster_path=data.get("poster_path"),
+            backdrop_path=data.get("backdrop_path"),
+            media_type=media_type,
+            genres=[genre["name"] for genre in data.get("genres", [])],
+            release_date=release_date,
+            first_air_date=data.get("first_air_date"),
+        )
+    
     async def search_by_title(self, title: str, year: Optional[int] = None) -> Optional[Any]:
         """
         通过标题搜索媒体信息
@@ -84,5 +104,7 @@ class MediaFetcher:
                 return await self.fetch_by_tmdb_id(first_result["id"], "tv")
             
             return None
+        except DeadlineExceeded:
+            raise
         except Exception:
             return None
\ No newline at end of file
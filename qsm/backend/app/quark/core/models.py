@@ -2,7 +2,7 @@ from dataclasses import dataclass, field
 from typing import Dict, Any, Optional
 
 
-@dataclass
+@dataclass(slots=True)
 class MediaInfo:
     """媒体信息数据类"""
     tmdb_id: int
@@ -19,7 +19,7 @@ class MediaInfo:
     first_air_date: Optional[str] = None
 
 
-@dataclass
+@dataclass(slots=True)
 class QualityInfo:
     """画质信息数据类"""
     level: str
@@ -67,7 +67,7 @@ class QualityInfo:
         return min(score, 100.0)
 
 
-@dataclass
+@dataclass(slots=True)
 class MatchDetails:
     """匹配详情数据类"""
     title_match: bool = False
@@ -100,7 +100,7 @@ class MatchDetails:
         return min(confidence, 1.0)
 
 
-@dataclass
+@dataclass(slots=True)
 class MatchResult:
     """匹配结果数据类"""
     resource: Any  # QuarkResource
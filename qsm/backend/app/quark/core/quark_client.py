@@ -1,21 +1,26 @@
 import asyncio
 import re
-import time
 import logging
-from dataclasses import dataclass, asdict
-from typing import List, Dict, Optional, Set
+import time
+from dataclasses import dataclass
+from typing import List, Dict, Optional
 
 import aiohttp
 
+from app import metrics
+from app.admission import note_quark_call
+from app.circuit_breaker import get_breaker
 from app.config import get_settings
+from app.deadline import DeadlineExceeded, within_deadline
+from app.quark.core.rate_limiter import RateLimiter, get_rate_limiter
+from app.scheduler import UpstreamRejected, get_scheduler
 
 settings = get_settings()
 
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
 
 
-@dataclass
+@dataclass(slots=True)
 class QuarkResource:
     id: int
     name: str
@@ -27,7 +32,8 @@ class QuarkResource:
     views: int = 0
 
     def to_dict(self) -> Dict:
-        return asdict(self)
+        # 字段都是不可变标量，浅拷贝即可，不走 asdict 的递归深拷贝
+        return {name: getattr(self, name) for name in self.__slots__}
 
 
 class AsyncQuarkAPIClient:
@@ -53,8 +59,11 @@ class AsyncQuarkAPIClient:
         self.retry_delay = retry_delay
         self.rate_limit = rate_limit
         self.timeout = timeout
-        self.last_request_time = 0.0
-        self.seen_ids: Set[int] = set()
+        # 默认限速下所有客户端实例共享同一个限速器，自定义限速则单独计时
+        if rate_limit == settings.quark_search_rate_limit:
+            self._limiter = get_rate_limiter()
+        else:
+            self._limiter = RateLimiter(rate_limit)
 
         self.headers = {
             "User-Agent": "Mozilla/5.0",
@@ -63,15 +72,43 @@ class AsyncQuarkAPIClient:
         }
 
     async def _rate_limit_wait(self):
-        now = time.time()
-        delta = now - self.last_request_time
-        if delta < self.rate_limit:
-            await asyncio.sleep(self.rate_limit - delta)
-        self.last_request_time = time.time()
+        await self._limiter.acquire()
 
     async def _post(self, url: str, data: Optional[Dict] = None) -> Optional[Dict]:
-        await self._rate_limit_wait()
+        # 熔断器打开时直接抛出 CircuitOpenError，不占用排队和限速额度
+        breaker = get_breaker("quark")
+        breaker.check()
+        note_quark_call()
+        # 排队、限速等待和重试都计入请求截止时间，到期抛出 DeadlineExceeded
+        start = time.perf_counter()
+        try:
+            resp = await within_deadline(self._scheduled_post(url, data))
+        except (DeadlineExceeded, UpstreamRejected):
+            # 截止时间与本地调度丢弃都不是上游故障
+            raise
+        except Exception:
+            metrics.QUARK_ERRORS.inc()
+            breaker.record_failure()
+            raise
+        finally:
+            metrics.QUARK_FETCH.observe(time.perf_counter() - start)
+        if resp is None:
+            metrics.QUARK_ERRORS.inc()
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return resp
+
+    async def _scheduled_post(self, url: str, data: Optional[Dict] = None) -> Optional[Dict]:
+        # 按调用方优先级排队（交互请求优先），再经过限速器
+        async with get_scheduler("quark").slot():
+            await self._rate_limit_wait()
+            return await self._post_with_retries(url, data)
+
+    async def _post_with_retries(self, url: str, data: Optional[Dict] = None) -> Optional[Dict]:
         for attempt in range(self.max_retries):
+            if attempt:
+                metrics.QUARK_RETRIES.inc()
             try:
                 timeout = aiohttp.ClientTimeout(total=self.timeout)
                 async with aiohttp.ClientSession(timeout=timeout) as session:
@@ -81,14 +118,14 @@ class AsyncQuarkAPIClient:
                         elif resp.status != 200:
                             try:
                                 error_data = await resp.json()
-                                logger.warning(f"夸克搜索 API HTTP {resp.status}: {error_data}")
+                                logger.warning("夸克搜索 API HTTP %s: %s", resp.status, error_data)
                             except:
                                 text = await resp.text()
-                                logger.warning(f"夸克搜索 API HTTP {resp.status}: {text[:200]}")
+                                logger.warning("夸克搜索 API HTTP %s: %s", resp.status, text[:200])
                         if attempt < self.max_retries - 1:
                             await asyncio.sleep(self.retry_delay * (attempt + 1))
             except Exception as e:
-                logger.warning(f"夸克搜索请求异常 (尝试 {attempt + 1}/{self.max_retries}): {e}")
+                logger.warning("夸克搜索请求异常 (尝试 %d/%d): %s", attempt + 1, self.max_retries, e)
                 if attempt < self.max_retries - 1:
                     await asyncio.sleep(self.retry_delay * (attempt + 1))
         return None
@@ -119,18 +156,12 @@ class AsyncQuarkAPIClient:
                 views=raw.get("views", 0) or 0,
             )
         except Exception as e:
-            logger.warning(f"资源解析失败: {e}, raw_id={raw.get('id')}, link={link[:50] if 'link' in locals() else 'N/A'}")
+            # 单条解析失败只记 debug，search_resources 会汇总为一条日志
+            logger.debug("资源解析失败: %s, raw_id=%s", e, raw.get("id"))
             return None
 
-    async def search_resources(
-        self,
-        keyword: str,
-        page: int = 1,
-        page_size: int = 100,
-        deduplicate: bool = True,
-    ) -> List[QuarkResource]:
-        url = f"{self.base_url}/search"
-        payload = {
+    def _search_payload(self, keyword: str, page: int, page_size: int) -> Dict:
+        return {
             "keyword": keyword,
             "categoryid": 0,
             "filetypeid": 0,
@@ -141,20 +172,38 @@ class AsyncQuarkAPIClient:
             "order": "desc",
             "offset": (page - 1) * page_size,
         }
+
+    async def ping(self, keyword: str) -> bool:
+        """健康探测：请求一条搜索结果，上游返回 code=200 即视为可用"""
+        resp = await self._post(f"{self.base_url}/search", self._search_payload(keyword, 1, 1))
+        return bool(resp) and resp.get("code") == 200
+
+    async def search_resources(
+        self,
+        keyword: str,
+        page: int = 1,
+        page_size: int = 100,
+        deduplicate: bool = True,
+    ) -> List[QuarkResource]:
+        url = f"{self.base_url}/search"
+        payload = self._search_payload(keyword, page, page_size)
         resp = await self._post(url, payload)
         if not resp:
-            logger.warning(f"夸克搜索 API 调用失败: 未收到响应 (关键词: {keyword})")
+            logger.warning("夸克搜索 API 调用失败: 未收到响应 (关键词: %s)", keyword)
             return []
         if resp.get("code") != 200:
-            logger.warning(f"夸克搜索 API 错误: code={resp.get('code')}, message={resp.get('message', '未知错误')}, 关键词: {keyword}")
+            logger.warning(
+                "夸克搜索 API 错误: code=%s, message=%s, 关键词: %s", resp.get("code"), resp.get("message", "未知错误"), keyword
+            )
             return []
         data = resp.get("data", {})
         raw_list = data.get("list", []) if isinstance(data, dict) else data
         if not raw_list:
-            logger.info(f"夸克搜索 API 返回空列表 (关键词: {keyword})")
+            logger.info("夸克搜索 API 返回空列表 (关键词: %s)", keyword)
             return []
         
-        logger.info(f"夸克搜索找到 {len(raw_list)} 个原始资源 (关键词: {keyword})")
+        logger.debug("夸克搜索找到 %d 个原始资源 (关键词: %s)", len(raw_list), keyword)
+        start = time.perf_counter()
         resources: List[QuarkResource] = []
         parsed_count = 0
         for r in raw_list:
@@ -162,11 +211,12 @@ class AsyncQuarkAPIClient:
             if parsed:
                 resources.append(parsed)
                 parsed_count += 1
+        metrics.PARSE.observe(time.perf_counter() - start)
         
         if parsed_count == 0 and len(raw_list) > 0:
-            logger.warning(f"所有 {len(raw_list)} 个资源解析失败 (关键词: {keyword})")
+            logger.warning("所有 %d 个资源解析失败 (关键词: %s)", len(raw_list), keyword)
         elif parsed_count < len(raw_list):
-            logger.info(f"解析成功: {parsed_count}/{len(raw_list)} (关键词: {keyword})")
+            logger.info("解析成功: %d/%d (关键词: %s)", parsed_count, len(raw_list), keyword)
         if deduplicate:
             unique: Dict[int, QuarkResource] = {}
             for r in resources:
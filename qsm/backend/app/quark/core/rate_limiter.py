@@ -0,0 +1,77 @@
+import asyncio
+import time
+from typing import Any, Optional, Union
+
+from app.config import get_settings
+from app.shared_state import RESERVE_SLOT_SCRIPT, RedisGuard, get_shared_redis
+
+
+class RateLimiter:
+    """
+    进程内共享的上游限速器：相邻两次请求至少间隔 interval 秒。
+
+    按预约时间槽分配，并发调用方各自等待到自己的时间槽，不需要加锁。
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._next_slot = 0.0
+
+    async def acquire(self) -> None:
+        now = time.monotonic()
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class DistributedRateLimiter:
+    """
+    多个 worker / 容器共享的上游限速器，算法与 RateLimiter 相同，时间槽保存在 Redis 中。
+
+    预约在 Lua 脚本内原子完成并使用 Redis 服务器时间；Redis 不可用时退回进程内 RateLimiter，
+    此时每个进程各自按 interval 限速。
+    """
+
+    def __init__(self, interval: float, client: Any, key: str = "qsm:upstream:quark", retry_interval: float = 5.0):
+        self.interval = interval
+        self.key = key
+        self.guard = RedisGuard("上游限速", retry_interval)
+        self.fallback = RateLimiter(interval)
+        self._script = client.register_script(RESERVE_SLOT_SCRIPT)
+
+    @property
+    def degraded(self) -> bool:
+        """当前是否在使用进程内退路"""
+        return not self.guard.usable
+
+    async def acquire(self) -> None:
+        if self.guard.usable:
+            try:
+                wait = float(await self._script(keys=[self.key], args=[self.interval]))
+            except Exception as e:
+                self.guard.failed(e)
+            else:
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                return
+        await self.fallback.acquire()
+
+
+_rate_limiter: Optional[Union[RateLimiter, DistributedRateLimiter]] = None
+
+
+def get_rate_limiter() -> Union[RateLimiter, DistributedRateLimiter]:
+    global _rate_limiter
+    if _rate_limiter is None:
+        settings = get_settings()
+        client = get_shared_redis()
+        if client is not None:
+            _rate_limiter = DistributedRateLimiter(
+                settings.quark_search_rate_limit,
+                client,
+                retry_interval=settings.shared_state_retry_interval,
+            )
+        else:
+            _rate_limiter = RateLimiter(settings.quark_search_rate_limit)
+    return _rate_limiter
@@ -0,0 +1,182 @@
+import asyncio
+import logging
+import math
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional
+
+from app.background import spawn
+from app.config import get_settings
+from app.quark.core.enhanced_scoring import bigram_codes, name_features, normalize_text, parse_size_to_gb
+from app.quark.core.quark_client import QuarkResource
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS resources (
+    rid INTEGER PRIMARY KEY AUTOINCREMENT,
+    link TEXT NOT NULL UNIQUE,
+    id INTEGER NOT NULL DEFAULT 0,
+    name TEXT NOT NULL,
+    size TEXT NOT NULL DEFAULT '',
+    updatetime TEXT NOT NULL DEFAULT '',
+    categoryid INTEGER NOT NULL DEFAULT 0,
+    uploaderid TEXT NOT NULL DEFAULT '',
+    views INTEGER NOT NULL DEFAULT 0,
+    normalized TEXT NOT NULL,
+    tokens TEXT NOT NULL DEFAULT '',
+    size_gb REAL,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS grams (
+    code INTEGER NOT NULL,
+    rid INTEGER NOT NULL,
+    PRIMARY KEY (code, rid)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS grams_rid ON grams (rid);
+CREATE TABLE IF NOT EXISTS queries (
+    keyword TEXT PRIMARY KEY,
+    refreshed_at REAL NOT NULL
+);
+"""
+
+
+class ResourceIndex:
+    """
+    本地资源倒排索引（SQLite + 整数 bigram 编码），保存所有见过的夸克资源。
+
+    bigram 编码与 QueryMatcher 一致，检索时按命中 bigram 数排序，
+    命中比例低于 min_overlap 的资源不返回。
+    """
+
+    def __init__(self, path: str, min_overlap: float = 0.6):
+        self.path = path
+        self.min_overlap = min_overlap
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def ingest(self, resources: List[QuarkResource], keyword: Optional[str] = None) -> int:
+        """写入/刷新资源及其特征，返回写入条数"""
+        now = time.time()
+        with self._lock, self._conn:
+            for r in resources:
+                features = name_features(r.name)
+                previous = self._conn.execute(
+                    "SELECT normalized FROM resources WHERE link = ?", (r.link,)
+                ).fetchone()
+                cur = self._conn.execute(
+                    """
+                    INSERT INTO resources (link, id, name, size, updatetime, categoryid, uploaderid, views,
+                                           normalized, tokens, size_gb, first_seen, last_seen)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(link) DO UPDATE SET
+                        id=excluded.id, name=excluded.name, size=excluded.size, updatetime=excluded.updatetime,
+                        categoryid=excluded.categoryid, uploaderid=excluded.uploaderid, views=excluded.views,
+                        normalized=excluded.normalized, tokens=excluded.tokens, size_gb=excluded.size_gb,
+                        last_seen=excluded.last_seen
+                    RETURNING rid
+                    """,
+                    (
+                        r.link, r.id, r.name, r.size, r.updatetime, r.categoryid, r.uploaderid, r.views,
+                        features.normalized, " ".join(sorted(features.tokens)), parse_size_to_gb(r.size),
+                        now, now,
+                    ),
+                )
+                rid = cur.fetchone()[0]
+                if previous is not None:
+                    if previous[0] == features.normalized:
+                        continue
+                    # 名称变化：清掉旧名称的 bigram，否则仍能按旧标题检索到
+                    self._conn.execute("DELETE FROM grams WHERE rid = ?", (rid,))
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO grams (code, rid) VALUES (?, ?)",
+                    [(code, rid) for code in features.bigrams],
+                )
+            if keyword:
+                self._conn.execute(
+                    "INSERT INTO queries (keyword, refreshed_at) VALUES (?, ?) "
+                    "ON CONFLICT(keyword) DO UPDATE SET refreshed_at=excluded.refreshed_at",
+                    (normalize_text(keyword), now),
+                )
+        return len(resources)
+
+    def search(self, keyword: str, limit: int = 100) -> List[QuarkResource]:
+        """按 bigram 重合度检索本地资源"""
+        codes = bigram_codes(normalize_text(keyword))
+        if not codes:
+            return []
+        need = max(1, math.ceil(len(codes) * self.min_overlap))
+        placeholders = ",".join("?" * len(codes))
+        with self._lock:
+            rows = self._conn.execute(
+                f"""
+                SELECT r.id, r.name, r.link, r.size, r.updatetime, r.categoryid, r.uploaderid, r.views
+                FROM (
+                    SELECT rid, COUNT(*) AS hits FROM grams
+                    WHERE code IN ({placeholders})
+                    GROUP BY rid HAVING hits >= ?
+                ) g JOIN resources r ON r.rid = g.rid
+                ORDER BY g.hits DESC, r.last_seen DESC
+                LIMIT ?
+                """,
+                (*codes, need, limit),
+            ).fetchall()
+        return [
+            QuarkResource(
+                id=row[0], name=row[1], link=row[2], size=row[3], updatetime=row[4],
+                categoryid=row[5], uploaderid=row[6], views=row[7],
+            )
+            for row in rows
+        ]
+
+    def refreshed_at(self, keyword: str) -> Optional[float]:
+        """查询词最近一次从上游刷新的时间"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT refreshed_at FROM queries WHERE keyword = ?", (normalize_text(keyword),)
+            ).fetchone()
+        return row[0] if row else None
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM resources").fetchone()[0]
+
+    async def aingest(self, resources: List[QuarkResource], keyword: Optional[str] = None) -> int:
+        return await asyncio.to_thread(self.ingest, resources, keyword)
+
+    async def asearch(self, keyword: str, limit: int = 100) -> List[QuarkResource]:
+        return await asyncio.to_thread(self.search, keyword, limit)
+
+
+_resource_index: Optional[ResourceIndex] = None
+
+
+def get_resource_index() -> Optional[ResourceIndex]:
+    global _resource_index
+    settings = get_settings()
+    if not settings.resource_index_enabled:
+        return None
+    if _resource_index is None:
+        try:
+            _resource_index = ResourceIndex(settings.resource_index_path, settings.resource_index_min_overlap)
+        except sqlite3.Error as e:
+            logger.warning("本地资源索引不可用: %s", e)
+            return None
+    return _resource_index
+
+
+def ingest_in_background(index: ResourceIndex, resources: List[QuarkResource], keyword: str) -> None:
+    """异步写入索引，不阻塞当前请求"""
+    spawn(index.aingest(resources, keyword), name=f"resource-index-ingest:{keyword}")
@@ -0,0 +1,82 @@
+import json
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import HTTPException
+from fastapi.responses import Response
+
+from app.quark.schemas.search import BatchSearchResult, ResourceDto, SearchResponse
+
+RESOURCE_FIELDS: Tuple[str, ...] = tuple(ResourceDto.model_fields)
+
+
+class Projection:
+    """
+    资源列表的字段投影
+
+    只读取请求的字段直接组装输出，不先完整序列化 ResourceDto 再删除字段。
+    compact 模式下资源以数组形式输出，字段顺序由同级的 fields 表头给出。
+    """
+
+    def __init__(self, fields: Tuple[str, ...] = RESOURCE_FIELDS, compact: bool = False):
+        self.fields = fields
+        self.compact = compact
+
+    @classmethod
+    def from_query(cls, fields: Optional[str], compact: bool) -> Optional["Projection"]:
+        """
+        解析查询参数；两者都未指定时返回 None（按完整模型输出）
+
+        Raises:
+            HTTPException: fields 中包含未知字段时 400
+        """
+        if not fields and not compact:
+            return None
+        if not fields:
+            return cls(compact=compact)
+        names = tuple(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+        unknown = [f for f in names if f not in ResourceDto.model_fields]
+        if unknown or not names:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown fields: {', '.join(unknown) or '(empty)'}; available: {', '.join(RESOURCE_FIELDS)}",
+            )
+        return cls(names, compact)
+
+    def search_response(self, result: SearchResponse) -> Dict[str, Any]:
+        fields = self.fields
+        if self.compact:
+            resources = [[getattr(r, f) for f in fields] for r in result.resources]
+        else:
+            resources = [{f: getattr(r, f) for f in fields} for r in result.resources]
+        payload = {
+            "success": result.success,
+            "message": result.message,
+            "media": result.media.model_dump() if result.media else None,
+            "resources": resources,
+            "total": result.total,
+            "query_time": result.query_time,
+            "partial": result.partial,
+        }
+        if self.compact:
+            payload["fields"] = list(fields)
+        return payload
+
+    def batch_result(self, item: BatchSearchResult) -> Dict[str, Any]:
+        return {
+            "tmdb_id": item.tmdb_id,
+            "media_type": item.media_type,
+            "cached": item.cached,
+            "result": self.search_response(item.result),
+        }
+
+
+def dumps(payload: Any) -> str:
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+
+
+def json_response(payload: Any, response: Optional[Response] = None) -> Response:
+    """投影后的结果直接编码为 JSON 响应，保留路由中已设置的响应头（如 Cache-Control）"""
+    headers = dict(response.headers) if response is not None else None
+    if headers:
+        headers.pop("content-length", None)
+    return Response(dumps(payload).encode("utf-8"), media_type="application/json", headers=headers)
@@ -39,6 +39,7 @@ class ResourceDto(BaseModel):
     C_plaus: Optional[float] = None
     P: Optional[float] = None
     R: Optional[float] = None
+    alternates: Optional[List[str]] = None
 
 
 class SearchResponse(BaseModel):
@@ -50,4 +51,42 @@ class SearchResponse(BaseModel):
     media: Optional[MediaDto] = None
     resources: List[ResourceDto]
     total: int
-    query_time: Optional[float] = None
\ No newline at end of file
+    query_time: Optional[float] = None
+    partial: bool = False
+
+
+class BatchSearchItem(BaseModel):
+    """
+    批量搜索条目
+    """
+    tmdb_id: int
+    media_type: str = "movie"
+
+
+class BatchSearchRequest(BaseModel):
+    """
+    批量搜索请求
+    """
+    items: List[BatchSearchItem] = Field(..., min_length=1, max_length=50)
+    max_results: int = Field(20, ge=1, le=100)
+    stream: bool = False
+
+
+class BatchSearchResult(BaseModel):
+    """
+    批量搜索中单个条目的结果
+    """
+    tmdb_id: int
+    media_type: str
+    cached: bool
+    result: SearchResponse
+
+
+class BatchSearchResponse(BaseModel):
+    """
+    批量搜索响应DTO
+    """
+    results: List[BatchSearchResult]
+    total: int
+    cached: int
+    query_time: Optional[float] = None
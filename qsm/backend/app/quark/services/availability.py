@@ -0,0 +1,114 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.config import get_settings
+from app.scheduler import UpstreamRejected
+
+logger = logging.getLogger(__name__)
+
+
+def _media_type_of(item: Dict[str, Any]) -> str:
+    return item.get("media_type") or ("movie" if "title" in item else "tv")
+
+
+class AvailabilityStore:
+    """
+    TMDB 条目到最佳夸克资源摘要的物化表。
+
+    由后台任务和每次实际完成的搜索写入，页面渲染时只做字典查找，不触发搜索。
+    """
+
+    def __init__(self) -> None:
+        self._table: Dict[Tuple[str, int], Dict[str, Any]] = {}
+        self.last_refresh: Optional[float] = None
+
+    def get(self, media_type: str, tmdb_id: Any) -> Optional[Dict[str, Any]]:
+        try:
+            return self._table.get((media_type, int(tmdb_id)))
+        except (TypeError, ValueError):
+            return None
+
+    def record(self, media_type: str, tmdb_id: int, result: Any) -> None:
+        """根据一次搜索结果更新条目的最佳资源摘要"""
+        resources = getattr(result, "resources", None) or []
+        if not getattr(result, "success", False):
+            return
+        key = (media_type, int(tmdb_id))
+        if not resources:
+            self._table.pop(key, None)
+            return
+        best = next((r for r in resources if r.is_best), resources[0])
+        self._table[key] = {
+            "score": round(best.overall_score, 3),
+            "resolution": best.resolution,
+            "size_gb": best.size_gb,
+            "link": best.link,
+            "name": best.name,
+            "count": len(resources),
+            "updated_at": time.time(),
+        }
+
+    def annotate(self, posters: Iterable[Dict[str, Any]]) -> None:
+        """为 adapt_poster 产出的海报附加 availability 字段"""
+        for poster in posters:
+            poster["availability"] = self.get(poster.get("media_type"), poster.get("id"))
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+
+_store = AvailabilityStore()
+
+
+def get_availability_store() -> AvailabilityStore:
+    return _store
+
+
+def rank_section_items(sections: Dict[str, List[Dict[str, Any]]], limit: int) -> List[Tuple[str, int]]:
+    """合并首页各分区条目并按热度排序去重"""
+    items: Dict[Tuple[str, int], float] = {}
+    for value in sections.values():
+        for item in value:
+            media_type = _media_type_of(item)
+            if media_type not in ("movie", "tv") or not item.get("id"):
+                continue
+            key = (media_type, int(item["id"]))
+            items[key] = max(items.get(key, 0.0), float(item.get("popularity") or 0.0))
+    ranked = sorted(items, key=items.get, reverse=True)
+    return ranked[:limit]
+
+
+async def refresh_availability(tmdb_client: Any, search_service: Any) -> int:
+    """刷新一轮热门/趋势条目的最佳资源摘要，返回刷新条数"""
+    from app.tmdb import gather_sections
+
+    settings = get_settings()
+    sections = await gather_sections(tmdb_client)
+    refreshed = 0
+    for media_type, tmdb_id in rank_section_items(sections, settings.availability_max_items):
+        # search_by_tmdb_id 优先读缓存，并在实际搜索完成时写入本表
+        try:
+            result = await search_service.search_by_tmdb_id(tmdb_id, settings.quark_search_max_results, media_type)
+        except UpstreamRejected:
+            # 交互请求繁忙时调度器丢弃后台搜索，本轮跳过该条目
+            continue
+        _store.record(media_type, tmdb_id, result)
+        refreshed += 1
+    _store.last_refresh = time.time()
+    return refreshed
+
+
+async def run_availability_refresher(tmdb_client: Any, search_service: Any) -> None:
+    """后台周期任务：按 AVAILABILITY_REFRESH_INTERVAL 刷新物化表"""
+    settings = get_settings()
+    while True:
+        try:
+            count = await refresh_availability(tmdb_client, search_service)
+            logger.info("资源可用性已刷新: %d 个条目", count)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("资源可用性刷新失败: %s", e)
+        await asyncio.sleep(settings.availability_refresh_interval)
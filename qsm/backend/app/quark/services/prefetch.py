@@ -0,0 +1,81 @@
+import logging
+import time
+from typing import Any, Dict, Optional, Set, Tuple
+
+from app.background import spawn
+from app.config import get_settings
+from app.quark.core.cache import generate_cache_key, get_cache
+from app.scheduler import Priority
+
+logger = logging.getLogger(__name__)
+
+
+class Prefetcher:
+    """
+    详情页的夸克搜索预取：用户打开详情页后通常紧接着请求搜索接口，
+    提前在后台完成搜索，使后续请求命中缓存。
+
+    同一条目在途时不重复调度；同时在途数量和每分钟调度次数都有上限，超出直接放弃。
+    """
+
+    def __init__(self, max_inflight: int, budget_per_minute: int):
+        self.max_inflight = max_inflight
+        self.budget_per_minute = budget_per_minute
+        self._inflight: Set[Tuple[str, int]] = set()
+        self._window_start = 0.0
+        self._window_used = 0
+        self.scheduled = 0
+        self.dropped = 0
+
+    def _take_budget(self) -> bool:
+        now = time.monotonic()
+        if now - self._window_start >= 60:
+            self._window_start = now
+            self._window_used = 0
+        if self._window_used >= self.budget_per_minute:
+            return False
+        self._window_used += 1
+        return True
+
+    def schedule(self, search_service: Any, media_type: str, tmdb_id: int, details: Optional[Dict[str, Any]] = None) -> bool:
+        """调度一次预取，返回是否实际调度"""
+        key = (media_type, tmdb_id)
+        if key in self._inflight:
+            return False
+        if len(self._inflight) >= self.max_inflight or not self._take_budget():
+            self.dropped += 1
+            return False
+        self._inflight.add(key)
+        self.scheduled += 1
+        spawn(
+            self._run(search_service, key, details),
+            name=f"prefetch:{media_type}:{tmdb_id}",
+            priority=Priority.PREFETCH,
+        )
+        return True
+
+    async def _run(self, search_service: Any, key: Tuple[str, int], details: Optional[Dict[str, Any]]) -> None:
+        media_type, tmdb_id = key
+        try:
+            cache_key = generate_cache_key("quark:search:tmdb", tmdb_id=tmdb_id, media_type=media_type)
+            if await get_cache().get(cache_key):
+                return
+            settings = get_settings()
+            await search_service.search_by_tmdb_id(
+                tmdb_id, settings.quark_search_max_results, media_type, details=details
+            )
+        except Exception as e:
+            logger.warning("预取失败 %s/%s: %s", media_type, tmdb_id, e)
+        finally:
+            self._inflight.discard(key)
+
+
+_prefetcher: Optional[Prefetcher] = None
+
+
+def get_prefetcher() -> Prefetcher:
+    global _prefetcher
+    if _prefetcher is None:
+        settings = get_settings()
+        _prefetcher = Prefetcher(settings.prefetch_max_inflight, settings.prefetch_budget_per_minute)
+    return _prefetcher
@@ -1,14 +1,30 @@
+import asyncio
+import contextvars
+import logging
 import time
-from typing import List, Optional, Any
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set, Tuple
 
+from app import metrics
+from app.background import spawn
+from app.circuit_breaker import CircuitOpenError
 from app.config import get_settings
+from app.deadline import DeadlineExceeded, _deadline, expired, within_deadline
 from app.quark.core.media_fetcher import MediaFetcher
 from app.quark.core.models import MatchResult, MediaInfo
-from app.quark.core.quark_client import AsyncQuarkAPIClient
+from app.quark.core.quark_client import AsyncQuarkAPIClient, QuarkResource
 from app.quark.core.cache import get_cache, generate_cache_key
-from app.quark.core.enhanced_scoring import score_item
+from app.quark.core.dedup import cluster_resources
+from app.quark.core.enhanced_scoring import QueryMatcher, ScoreBreakdown, score_item
+from app.quark.core.resource_index import ResourceIndex, get_resource_index, ingest_in_background
+from app.quark.services.availability import get_availability_store
+from app.scheduler import Priority, UpstreamRejected, current_priority
+from app.tracing import record_span, span
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# 正在后台刷新的查询词，避免同一关键词重复刷新
+_refreshing: Set[str] = set()
 
 
 class SearchService:
@@ -19,8 +35,15 @@ class SearchService:
     def __init__(self):
         self.media_fetcher = MediaFetcher()
         self.quark_client = AsyncQuarkAPIClient()
+        # 正在回源的搜索（缓存键 -> (任务, 调度优先级)），同一键的并发未命中只搜索一次
+        self._inflight: Dict[str, Tuple[asyncio.Task, Priority]] = {}
+
+    async def close(self) -> None:
+        await self.media_fetcher.tmdb.close()
 
-    async def search_by_tmdb_id(self, tmdb_id: int, max_results: int, media_type: str = "movie") -> Any:
+    async def search_by_tmdb_id(
+        self, tmdb_id: int, max_results: int, media_type: str = "movie", details: Optional[Dict[str, Any]] = None
+    ) -> Any:
         """
         通过TMDB ID搜索夸克资源
         
@@ -28,14 +51,12 @@ class SearchService:
             tmdb_id: TMDB ID
             max_results: 最大结果数量
             media_type: 媒体类型
+            details: 调用方已获取的TMDB详情（可选），提供时不再请求TMDB
             
         Returns:
             搜索结果对象
         """
-        import logging
-        logging.basicConfig(level=logging.INFO)
-        logger = logging.getLogger(__name__)
-        logger.info(f"search_by_tmdb_id called: tmdb_id={tmdb_id}, max_results={max_results}, media_type={media_type}")
+        logger.debug("search_by_tmdb_id: tmdb_id=%s, max_results=%s, media_type=%s", tmdb_id, max_results, media_type)
         
         from app.quark.schemas.search import SearchResponse, MediaDto, ResourceDto
         
@@ -43,31 +64,148 @@ class SearchService:
         cache_key = generate_cache_key("quark:search:tmdb", tmdb_id=tmdb_id, media_type=media_type)
         
         # 检查缓存
-        cached_result = await cache.get(cache_key)
+        with span("cache"):
+            cached_result = await cache.get(cache_key)
         if cached_result:
-            logger.info(f"Returning cached result: {len(cached_result.get('resources', []))} resources")
+            logger.debug("search_by_tmdb_id: cache hit, %d resources", len(cached_result.get("resources", [])))
             return SearchResponse(**cached_result)
         
+        return await self._single_flight(
+            cache_key, lambda: self._search_tmdb(tmdb_id, max_results, media_type, details, cache_key)
+        )
+
+    async def _search_tmdb(
+        self, tmdb_id: int, max_results: int, media_type: str, details: Optional[Dict[str, Any]], cache_key: str
+    ) -> Any:
+        """search_by_tmdb_id 缓存未命中时的回源搜索，结果写入 cache_key"""
+        from app.quark.schemas.search import SearchResponse
+        
+        cache = get_cache()
         try:
             # 获取媒体信息
-            media_info = await self.media_fetcher.fetch_by_tmdb_id(tmdb_id, media_type)
-            if not media_info:
-                # 尝试切换媒体类型
-                other_type = "tv" if media_type == "movie" else "movie"
-                media_info = await self.media_fetcher.fetch_by_tmdb_id(tmdb_id, other_type)
+            with span("media"):
+                if details:
+                    media_info = self.media_fetcher.from_details(details, tmdb_id, media_type)
+                else:
+                    media_info = await self.media_fetcher.fetch_by_tmdb_id(tmdb_id, media_type)
+                if not media_info:
+                    # 尝试切换媒体类型
+                    other_type = "tv" if media_type == "movie" else "movie"
+                    media_info = await self.media_fetcher.fetch_by_tmdb_id(tmdb_id, other_type)
             
             if not media_info:
                 return SearchResponse(success=False, message="媒体不存在", resources=[], total=0)
             
             result = await self._search_common(media_info, media_info.title, max_results)
             
-            # 存入缓存
-            await cache.set(cache_key, result.model_dump())
+            # 存入缓存（超时的部分结果不缓存）
+            if not result.partial:
+                serialize_start = time.perf_counter()
+                payload = result.model_dump()
+                metrics.SERIALIZE.observe(time.perf_counter() - serialize_start)
+                await cache.set(cache_key, payload)
+                get_availability_store().record(media_info.media_type, tmdb_id, result)
             
             return result
+        except DeadlineExceeded:
+            return SearchResponse(
+                success=False, partial=True, message="请求超时：未能获取媒体信息", resources=[], total=0
+            )
+        except UpstreamRejected:
+            # 调度器丢弃了非交互请求：交给预取、预热等调用方按各自方式跳过，不作为搜索失败缓存或展示
+            raise
         except Exception as e:
             return SearchResponse(success=False, message=f"搜索失败: {str(e)}", resources=[], total=0)
 
+    async def _single_flight(self, cache_key: str, search: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        合并同一缓存键的并发回源：第一个调用方启动搜索任务，其余调用方等待同一结果
+
+        详情页在后台预取时，页面脚本几乎同时请求同一搜索接口，两者只执行一次完整的 TMDB + 夸克流程。
+        搜索任务不继承任何调用方的截止时间，单个调用方超时或断开都不会取消它；每个调用方只按自己的
+        截止时间等待，超时返回部分结果，完整结果仍会写入缓存。
+        搜索任务按发起方的调度优先级运行；进行中的搜索优先级低于新调用方时（如预取中的条目被页面请求），
+        按新调用方的优先级另起一次，交互请求不会排在预取之后，也不会因预取被丢弃而失败。
+        """
+        from app.quark.schemas.search import SearchResponse
+        
+        priority = current_priority()
+        entry = self._inflight.get(cache_key)
+        if entry is not None and entry[1] <= priority:
+            metrics.SEARCH_COALESCED.inc()
+        else:
+            context = contextvars.copy_context()
+            context.run(_deadline.set, None)
+            task = asyncio.create_task(search(), name=f"search:{cache_key}", context=context)
+            entry = (task, priority)
+            self._inflight[cache_key] = entry
+            task.add_done_callback(lambda _: self._finish(cache_key, entry))
+        try:
+            return await within_deadline(asyncio.shield(entry[0]))
+        except DeadlineExceeded:
+            return SearchResponse(
+                success=False, partial=True, message="请求超时：搜索仍在进行，完成后写入缓存", resources=[], total=0
+            )
+
+    def _finish(self, cache_key: str, entry: Tuple[asyncio.Task, Priority]) -> None:
+        if self._inflight.get(cache_key) is entry:
+            del self._inflight[cache_key]
+        task = entry[0]
+        if not task.cancelled() and task.exception() is not None:
+            # 所有调用方都已超时离开时仍取走异常，避免 "exception was never retrieved"
+            logger.debug("search %s failed: %r", cache_key, task.exception())
+
+    async def search_batch(self, items: List[Any], max_results: int) -> AsyncIterator[Any]:
+        """
+        批量通过TMDB ID搜索夸克资源
+        
+        先一次性批量读取缓存，未命中的条目按并发上限回源（仍经过共享限速器），
+        结果按完成顺序逐个产出；重复条目只搜索一次。
+        
+        Args:
+            items: BatchSearchItem 列表
+            max_results: 每个条目的最大结果数量
+            
+        Returns:
+            逐个产出 BatchSearchResult
+        """
+        from app.quark.schemas.search import BatchSearchResult, SearchResponse
+        
+        unique = list({(item.tmdb_id, item.media_type): item for item in items}.values())
+        cache = get_cache()
+        keys = [
+            generate_cache_key("quark:search:tmdb", tmdb_id=item.tmdb_id, media_type=item.media_type)
+            for item in unique
+        ]
+        cached_values = await cache.get_many(keys)
+        
+        misses = []
+        for item, value in zip(unique, cached_values):
+            if value:
+                yield BatchSearchResult(
+                    tmdb_id=item.tmdb_id, media_type=item.media_type, cached=True, result=SearchResponse(**value)
+                )
+            else:
+                misses.append(item)
+        if not misses:
+            return
+        
+        semaphore = asyncio.Semaphore(settings.quark_search_batch_concurrency)
+        
+        async def run(item: Any) -> Any:
+            async with semaphore:
+                result = await self.search_by_tmdb_id(item.tmdb_id, max_results, item.media_type)
+            return BatchSearchResult(tmdb_id=item.tmdb_id, media_type=item.media_type, cached=False, result=result)
+        
+        tasks = [asyncio.ensure_future(run(item)) for item in misses]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # 客户端断开流式响应时取消尚未完成的搜索
+            for task in tasks:
+                task.cancel()
+
     async def search_by_title(self, title: str, year: Optional[int], max_results: int) -> Any:
         """
         通过标题搜索夸克资源
@@ -86,13 +224,22 @@ class SearchService:
         cache_key = generate_cache_key("quark:search:title", title=title, year=year)
         
         # 检查缓存
-        cached_result = await cache.get(cache_key)
+        with span("cache"):
+            cached_result = await cache.get(cache_key)
         if cached_result:
             return SearchResponse(**cached_result)
         
+        return await self._single_flight(cache_key, lambda: self._search_title(title, year, max_results, cache_key))
+
+    async def _search_title(self, title: str, year: Optional[int], max_results: int, cache_key: str) -> Any:
+        """search_by_title 缓存未命中时的回源搜索，结果写入 cache_key"""
+        from app.quark.schemas.search import SearchResponse
+        
+        cache = get_cache()
         try:
             # 搜索媒体信息
-            media_info = await self.media_fetcher.search_by_title(title, year)
+            with span("media"):
+                media_info = await self.media_fetcher.search_by_title(title, year)
             
             # 如果TMDB搜索失败，尝试直接搜索夸克资源
             if not media_info:
@@ -100,13 +247,74 @@ class SearchService:
             else:
                 result = await self._search_common(media_info, title, max_results)
             
-            # 存入缓存
-            await cache.set(cache_key, result.model_dump())
+            # 存入缓存（超时的部分结果不缓存）
+            if not result.partial:
+                serialize_start = time.perf_counter()
+                payload = result.model_dump()
+                metrics.SERIALIZE.observe(time.perf_counter() - serialize_start)
+                await cache.set(cache_key, payload)
             
             return result
+        except DeadlineExceeded:
+            return SearchResponse(
+                success=False, partial=True, message="请求超时：未能获取媒体信息", resources=[], total=0
+            )
+        except UpstreamRejected:
+            # 调度器丢弃了非交互请求：交给预取、预热等调用方按各自方式跳过，不作为搜索失败缓存或展示
+            raise
         except Exception as e:
             return SearchResponse(success=False, message=f"搜索失败: {str(e)}", resources=[], total=0)
     
+    async def _fetch_resources(self, keyword: str, page_size: int) -> List[QuarkResource]:
+        """
+        获取夸克资源，按 QUARK_SEARCH_MODE 决定是否优先使用本地索引
+        
+        Args:
+            keyword: 搜索关键词
+            page_size: 获取数量
+            
+        Returns:
+            资源列表
+        """
+        index = get_resource_index()
+        mode = settings.quark_search_mode
+        local: List[QuarkResource] = []
+        if index is not None and mode in ("offline_first", "local"):
+            local = await index.asearch(keyword, page_size)
+            if mode == "local":
+                return local
+            if len(local) >= settings.resource_index_min_hits:
+                refreshed_at = await asyncio.to_thread(index.refreshed_at, keyword)
+                if refreshed_at is None or time.time() - refreshed_at > settings.resource_index_refresh_ttl:
+                    self._refresh_in_background(index, keyword, page_size)
+                return local
+
+        try:
+            resources = await self.quark_client.search_resources(keyword, page_size=page_size)
+        except CircuitOpenError:
+            # 上游熔断期间退回本地索引已有的结果
+            if local:
+                return local
+            raise
+        if index is not None and resources:
+            ingest_in_background(index, resources, keyword)
+        return resources
+
+    def _refresh_in_background(self, index: ResourceIndex, keyword: str, page_size: int) -> None:
+        if keyword in _refreshing:
+            return
+        _refreshing.add(keyword)
+
+        async def _refresh() -> None:
+            try:
+                resources = await self.quark_client.search_resources(keyword, page_size=page_size)
+                if resources:
+                    await index.aingest(resources, keyword)
+            finally:
+                _refreshing.discard(keyword)
+
+        spawn(_refresh(), name=f"resource-index-refresh:{keyword}")
+
     async def _search_direct(self, keyword: str, max_results: int) -> Any:
         """
         直接搜索夸克资源，不进行TMDB匹配
@@ -123,7 +331,11 @@ class SearchService:
         start = time.time()
         
         # 搜索夸克资源
-        resources = await self.quark_client.search_resources(keyword, page_size=max_results or settings.quark_search_max_results)
+        try:
+            with span("quark", keyword):
+                resources = await self._fetch_resources(keyword, max_results or settings.quark_search_max_results)
+        except DeadlineExceeded:
+            return self._timeout_response(None, start)
         
         if not resources:
             return SearchResponse(
@@ -135,6 +347,8 @@ class SearchService:
                 message="未找到相关资源"
             )
         
+        resources, _ = self._dedup(resources)
+        
         # 评估资源质量
         results: List[ResourceDto] = []
         for resource in resources:
@@ -186,17 +400,19 @@ class SearchService:
         Returns:
             搜索结果对象
         """
-        import logging
-        logger = logging.getLogger(__name__)
-        logger.info(f"_search_common called: keyword={keyword}, max_results={max_results}")
+        logger.debug("_search_common: keyword=%s, max_results=%s", keyword, max_results)
         
         from app.quark.schemas.search import SearchResponse, MediaDto, ResourceDto
         
         start = time.time()
         
         # 搜索夸克资源
-        resources = await self.quark_client.search_resources(keyword, page_size=max_results or settings.quark_search_max_results)
-        logger.info(f"Quark client returned: {len(resources)} resources")
+        try:
+            with span("quark", keyword):
+                resources = await self._fetch_resources(keyword, max_results or settings.quark_search_max_results)
+        except DeadlineExceeded:
+            return self._timeout_response(self._to_media_dto(media_info), start)
+        logger.debug("_search_common: quark returned %d resources", len(resources))
         if not resources:
             return SearchResponse(
                 success=True, 
@@ -206,66 +422,107 @@ class SearchService:
                 query_time=round(time.time()-start, 3)
             )
         
+        # 打分前合并重复资源
+        with span("dedup"):
+            resources, alternates = self._dedup(resources)
+        
         # 使用新的打分系统
+        scoring_start = time.perf_counter()
+        matcher = QueryMatcher(keyword)
         scored_resources = []
+        partial = False
         for resource in resources:
-            item_dict = {
-                "name": resource.name,
-                "link": resource.link,
-                "size": resource.size,
-                "updatetime": resource.updatetime,
-                "categoryid": resource.categoryid,
-                "uploaderid": resource.uploaderid,
-                "views": resource.views,
-                "search_keyword": keyword
-            }
-            
-            score_breakdown = score_item(keyword, item_dict)
+            # 截止时间已到则只返回已打分的部分
+            if expired():
+                partial = True
+                break
+            score_breakdown = score_item(keyword, resource, matcher=matcher)
             if score_breakdown is not None:
                 scored_resources.append((resource, score_breakdown))
         
         # 按最终得分排序
-        scored_resources.sort(key=lambda x: x[1]["score"], reverse=True)
+        scored_resources.sort(key=lambda x: x[1].score, reverse=True)
         
-        # 标记最佳结果
-        if scored_resources:
-            scored_resources[0] = (scored_resources[0][0], scored_resources[0][1])
+        metrics.SCORING.observe(time.perf_counter() - scoring_start)
+        record_span("score", scoring_start)
         
         # 转换为DTO
+        dto_start = time.perf_counter()
         resource_dtos = []
-        for resource, breakdown in scored_resources:
+        for rank, (resource, breakdown) in enumerate(scored_resources):
             resource_dtos.append(
                 ResourceDto(
                     name=resource.name,
                     link=resource.link,
-                    overall_score=breakdown["score"],
+                    overall_score=breakdown.score,
                     quality_level=self._determine_quality_level(breakdown),
                     resolution=self._determine_resolution(breakdown),
                     codec=self._determine_codec(breakdown),
-                    is_best=(scored_resources[0][1] == breakdown),
-                    Conf=breakdown["Conf"],
-                    Qual=breakdown["Qual"],
-                    alpha=breakdown["alpha"],
-                    tags=breakdown["tags"],
-                    size_gb=breakdown["size_gb"],
-                    C_text=breakdown["C_text"],
-                    C_intent=breakdown["C_intent"],
-                    C_plaus=breakdown["C_plaus"],
-                    P=breakdown["P"],
-                    R=breakdown["R"],
+                    is_best=(rank == 0),
+                    Conf=breakdown.Conf,
+                    Qual=breakdown.Qual,
+                    alpha=breakdown.alpha,
+                    tags=list(breakdown.tags),
+                    size_gb=breakdown.size_gb,
+                    C_text=breakdown.C_text,
+                    C_intent=breakdown.C_intent,
+                    C_plaus=breakdown.C_plaus,
+                    P=breakdown.P,
+                    R=breakdown.R,
+                    alternates=alternates.get(resource.link) if settings.quark_search_dedup_alternates else None,
                 )
             )
         
+        metrics.DTO_BUILD.observe(time.perf_counter() - dto_start)
+        record_span("dto", dto_start)
+        
         return SearchResponse(
             success=True,
             media=self._to_media_dto(media_info),
             resources=resource_dtos,
             total=len(resource_dtos),
-            query_time=round(time.time()-start, 3)
+            query_time=round(time.time()-start, 3),
+            partial=partial,
+            message="请求超时，仅返回部分结果" if partial else None,
+        )
+
+    def _timeout_response(self, media: Any, start: float) -> Any:
+        """夸克资源搜索在截止时间内未完成时的部分结果（只含媒体信息）"""
+        from app.quark.schemas.search import SearchResponse
+        
+        return SearchResponse(
+            success=True,
+            media=media,
+            resources=[],
+            total=0,
+            query_time=round(time.time()-start, 3),
+            partial=True,
+            message="请求超时：夸克资源搜索未完成",
         )
     
-    def _determine_quality_level(self, breakdown: dict) -> str:
-        tags = breakdown.get("tags", [])
+    def _dedup(self, resources: List[QuarkResource]) -> Tuple[List[QuarkResource], Dict[str, List[str]]]:
+        """
+        合并同链接与近似重复的资源
+        
+        Returns:
+            (代表资源列表, 代表链接 -> 其余分享链接)
+        """
+        if not settings.quark_search_dedup_enabled:
+            return resources, {}
+        clusters = cluster_resources(
+            resources,
+            max_distance=settings.quark_search_dedup_max_distance,
+            size_tolerance=settings.quark_search_dedup_size_tolerance,
+        )
+        alternates: Dict[str, List[str]] = {}
+        for cluster in clusters:
+            links = [r.link for r in cluster.alternates if r.link != cluster.representative.link]
+            if links:
+                alternates[cluster.representative.link] = list(dict.fromkeys(links))
+        return [c.representative for c in clusters], alternates
+
+    def _determine_quality_level(self, breakdown: ScoreBreakdown) -> str:
+        tags = breakdown.tags
         if "bdmv" in tags or "remux" in tags:
             return "极高"
         elif "4k" in tags:
@@ -277,8 +534,8 @@ class SearchService:
         else:
             return "低"
     
-    def _determine_resolution(self, breakdown: dict) -> str:
-        tags = breakdown.get("tags", [])
+    def _determine_resolution(self, breakdown: ScoreBreakdown) -> str:
+        tags = breakdown.tags
         if "4k" in tags:
             return "4K"
         elif "1080p" in tags:
@@ -288,8 +545,8 @@ class SearchService:
         else:
             return "未知"
     
-    def _determine_codec(self, breakdown: dict) -> str:
-        tags = breakdown.get("tags", [])
+    def _determine_codec(self, breakdown: ScoreBreakdown) -> str:
+        tags = breakdown.tags
         if "bdmv" in tags or "remux" in tags or "bluray" in tags:
             return "H.265/H.264"
         else:
@@ -311,4 +568,21 @@ class SearchService:
             poster_path=media.poster_path or "",
             backdrop_path=media.backdrop_path or "",
             media_type=media.media_type,
-        )
\ No newline at end of file
+        )
+
+
+_search_service: Optional[SearchService] = None
+
+
+def get_search_service() -> SearchService:
+    global _search_service
+    if _search_service is None:
+        _search_service = SearchService()
+    return _search_service
+
+
+async def close_search_service() -> None:
+    global _search_service
+    if _search_service is not None:
+        await _search_service.close()
+        _search_service = None
@@ -0,0 +1,76 @@
+import asyncio
+import logging
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Optional
+
+from app.config import get_settings
+from app.quark.services.availability import rank_section_items
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class WarmupProgress:
+    """预热进度，供日志与就绪检查使用"""
+    running: bool = False
+    total: int = 0
+    done: int = 0
+    failed: int = 0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+_progress = WarmupProgress()
+
+
+def get_warmup_progress() -> WarmupProgress:
+    return _progress
+
+
+async def warm_up(tmdb_client: Any, search_service: Any) -> WarmupProgress:
+    """
+    重启后预热缓存：按热度取首页各分区条目，依次写入 TMDB 详情缓存和夸克搜索缓存。
+
+    每个条目之间间隔 WARMUP_INTERVAL 秒，夸克请求仍经过共享限速器；
+    作为后台任务运行，不阻塞服务就绪。
+    """
+    from app.suggest import get_suggest_index
+    from app.tmdb import gather_sections
+
+    settings = get_settings()
+    _progress.running = True
+    _progress.started_at = time.time()
+    try:
+        sections = await gather_sections(tmdb_client)
+        if settings.suggest_enabled:
+            # 预热取到的分区条目同时收录进标题联想索引，重启后联想不必等首页访问
+            index = get_suggest_index()
+            for items in sections.values():
+                index.add_items(items)
+        items = rank_section_items(sections, settings.warmup_max_items)
+        _progress.total = len(items)
+        logger.info("开始预热缓存: %d 个条目", len(items))
+        for media_type, tmdb_id in items:
+            try:
+                details = await tmdb_client.details(media_type, tmdb_id)
+                await search_service.search_by_tmdb_id(
+                    tmdb_id, settings.quark_search_max_results, media_type, details=details
+                )
+                _progress.done += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                _progress.failed += 1
+                logger.warning("预热失败 %s/%s: %s", media_type, tmdb_id, e)
+            if (_progress.done + _progress.failed) % 10 == 0:
+                logger.info("预热进度: %d/%d（失败 %d）", _progress.done + _progress.failed, _progress.total, _progress.failed)
+            await asyncio.sleep(settings.warmup_interval)
+        logger.info("预热完成: %d/%d（失败 %d）", _progress.done, _progress.total, _progress.failed)
+    finally:
+        _progress.running = False
+        _progress.finished_at = time.time()
+    return _progress
@@ -0,0 +1,187 @@
+import asyncio
+import contextvars
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from enum import IntEnum
+from typing import AsyncIterator, Deque, Dict, Iterator, Optional
+
+from .config import get_settings
+
+
+class Priority(IntEnum):
+    """上游调用的优先级，数值越小越优先"""
+    INTERACTIVE = 0
+    PREFETCH = 1
+    BACKGROUND = 2
+
+
+_current_priority: contextvars.ContextVar[Priority] = contextvars.ContextVar(
+    "upstream_priority", default=Priority.INTERACTIVE
+)
+
+
+def current_priority() -> Priority:
+    return _current_priority.get()
+
+
+@contextmanager
+def priority_scope(priority: Priority) -> Iterator[None]:
+    """在当前上下文内以指定优先级发起上游调用"""
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+class UpstreamRejected(Exception):
+    """调度器在压力下丢弃了非交互请求"""
+
+
+DEFAULT_WEIGHTS = {Priority.INTERACTIVE: 8, Priority.PREFETCH: 2, Priority.BACKGROUND: 1}
+DEFAULT_MAX_QUEUE = {Priority.INTERACTIVE: 0, Priority.PREFETCH: 16, Priority.BACKGROUND: 32}
+
+
+class UpstreamScheduler:
+    """
+    上游调用的优先级调度器。
+
+    - 并发上限 concurrency，其中 reserved 个槽位只留给交互请求；
+    - 排队的请求按加权公平队列出队（各优先级的虚拟时间按 1/weight 递增）；
+    - 交互请求需要排队时，丢弃排队中的后台请求；交互排队数达到并发上限时，预取也一并丢弃；
+    - 非交互队列超过 max_queue 时新请求直接被拒绝。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        concurrency: int,
+        reserved: int = 1,
+        weights: Optional[Dict[Priority, int]] = None,
+        max_queue: Optional[Dict[Priority, int]] = None,
+    ):
+        self.name = name
+        self.concurrency = max(1, concurrency)
+        self.reserved = min(max(0, reserved), self.concurrency - 1)
+        self.weights = dict(weights or DEFAULT_WEIGHTS)
+        self.max_queue = dict(max_queue or DEFAULT_MAX_QUEUE)
+        self._queues: Dict[Priority, Deque[asyncio.Future]] = {p: deque() for p in Priority}
+        self._vtime: Dict[Priority, float] = {p: 0.0 for p in Priority}
+        self._clock = 0.0
+        self.active = 0
+        self.active_background = 0
+        self.completed: Dict[Priority, int] = {p: 0 for p in Priority}
+        self.dropped: Dict[Priority, int] = {p: 0 for p in Priority}
+
+    def queued(self, priority: Optional[Priority] = None) -> int:
+        if priority is not None:
+            return len(self._queues[priority])
+        return sum(len(q) for q in self._queues.values())
+
+    def _can_start(self, priority: Priority) -> bool:
+        if self.active >= self.concurrency:
+            return False
+        if priority is Priority.INTERACTIVE:
+            return True
+        return self.active_background < self.concurrency - self.reserved
+
+    def _start(self, priority: Priority) -> None:
+        self.active += 1
+        if priority is not Priority.INTERACTIVE:
+            self.active_background += 1
+
+    def _shed(self, priority: Priority) -> None:
+        queue = self._queues[priority]
+        while queue:
+            fut = queue.popleft()
+            if not fut.done():
+                fut.set_exception(UpstreamRejected(f"{self.name}: {priority.name.lower()} request shed"))
+                self.dropped[priority] += 1
+
+    def _dispatch(self) -> None:
+        while self.active < self.concurrency:
+            candidates = [
+                p for p in Priority
+                if self._queues[p] and self._can_start(p)
+            ]
+            if not candidates:
+                return
+            priority = min(candidates, key=lambda p: (self._vtime[p], p))
+            fut = self._queues[priority].popleft()
+            if fut.done():
+                continue
+            self._clock = self._vtime[priority]
+            self._vtime[priority] += 1.0 / self.weights[priority]
+            self._start(priority)
+            fut.set_result(priority)
+
+    async def acquire(self, priority: Optional[Priority] = None) -> Priority:
+        priority = current_priority() if priority is None else priority
+        ahead = any(self._queues[p] for p in Priority if p <= priority)
+        if not ahead and self._can_start(priority):
+            self._start(priority)
+            return priority
+
+        if priority is Priority.INTERACTIVE:
+            self._shed(Priority.BACKGROUND)
+            if self.queued(Priority.INTERACTIVE) + 1 >= self.concurrency:
+                self._shed(Priority.PREFETCH)
+        else:
+            limit = self.max_queue.get(priority, 0)
+            if len(self._queues[priority]) >= limit:
+                self.dropped[priority] += 1
+                raise UpstreamRejected(f"{self.name}: {priority.name.lower()} queue full")
+
+        if not self._queues[priority]:
+            # 新进入排队的类别不能积攒空闲期间的额度
+            self._vtime[priority] = max(self._vtime[priority], self._clock)
+        fut: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._queues[priority].append(fut)
+        try:
+            return await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled() and fut.exception() is None:
+                # 已分到槽位但调用方被取消，归还槽位
+                self.release(priority)
+            else:
+                try:
+                    self._queues[priority].remove(fut)
+                except ValueError:
+                    pass
+            raise
+
+    def release(self, priority: Priority) -> None:
+        self.active -= 1
+        if priority is not Priority.INTERACTIVE:
+            self.active_background -= 1
+        self.completed[priority] += 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, priority: Optional[Priority] = None) -> AsyncIterator[Priority]:
+        granted = await self.acquire(priority)
+        try:
+            yield granted
+        finally:
+            self.release(granted)
+
+
+_schedulers: Dict[str, UpstreamScheduler] = {}
+
+
+def get_scheduler(name: str) -> UpstreamScheduler:
+    """按上游名称（quark / tmdb）获取进程内共享的调度器"""
+    scheduler = _schedulers.get(name)
+    if scheduler is None:
+        settings = get_settings()
+        if name == "quark":
+            concurrency = settings.quark_scheduler_concurrency
+        else:
+            concurrency = settings.tmdb_scheduler_concurrency
+        scheduler = UpstreamScheduler(name, concurrency, reserved=settings.scheduler_reserved_interactive)
+        _schedulers[name] = scheduler
+    return scheduler
+
+
+def all_schedulers() -> Dict[str, UpstreamScheduler]:
+    return dict(_schedulers)
@@ -0,0 +1,169 @@
+import logging
+import time
+from typing import Any, Optional, Tuple
+
+from .config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# 预约下一个上游时间槽（与进程内 RateLimiter 相同的算法），返回需要等待的秒数
+RESERVE_SLOT_SCRIPT = """
+local interval = tonumber(ARGV[1])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local next_slot = tonumber(redis.call('GET', KEYS[1]) or '0')
+local slot = math.max(now, next_slot)
+local ttl = math.ceil((slot + interval - now) * 1000) + 1000
+redis.call('SET', KEYS[1], tostring(slot + interval), 'PX', ttl)
+return tostring(slot - now)
+"""
+
+# 记录一次失败：失败计数达到阈值（或 trip=1，半开试探失败）时设置熔断标记；
+# 返回熔断剩余秒数，未熔断为 0
+BREAKER_FAILURE_SCRIPT = """
+local threshold = tonumber(ARGV[1])
+local reset_ms = tonumber(ARGV[2])
+local trip = tonumber(ARGV[3])
+local open_ttl = redis.call('PTTL', KEYS[2])
+if open_ttl > 0 then
+    return tostring(open_ttl / 1000)
+end
+local failures = redis.call('INCR', KEYS[1])
+redis.call('PEXPIRE', KEYS[1], reset_ms * 2)
+if failures >= threshold or trip == 1 then
+    redis.call('SET', KEYS[2], '1', 'PX', reset_ms)
+    redis.call('DEL', KEYS[1])
+    return tostring(reset_ms / 1000)
+end
+return '0'
+"""
+
+# 读取熔断剩余秒数与当前失败计数
+BREAKER_STATE_SCRIPT = """
+local open_ttl = redis.call('PTTL', KEYS[2])
+local failures = tonumber(redis.call('GET', KEYS[1]) or '0')
+if open_ttl < 0 then
+    open_ttl = 0
+end
+return {tostring(open_ttl / 1000), tostring(failures)}
+"""
+
+# 调用成功：清除失败计数与熔断标记
+BREAKER_SUCCESS_SCRIPT = """
+redis.call('DEL', KEYS[1], KEYS[2])
+return '0'
+"""
+
+
+def _text(value: Any) -> str:
+    return value.decode() if isinstance(value, bytes) else str(value)
+
+
+class RedisGuard:
+    """Redis 调用失败后在 retry_interval 秒内直接走进程内退路，避免每次调用都等连接超时"""
+
+    def __init__(self, what: str, retry_interval: float):
+        self.what = what
+        self.retry_interval = retry_interval
+        self._down_until = 0.0
+
+    @property
+    def usable(self) -> bool:
+        return time.monotonic() >= self._down_until
+
+    def failed(self, exc: Exception) -> None:
+        self._down_until = time.monotonic() + self.retry_interval
+        logger.warning("Redis %s 不可用，%.0f 秒内使用进程内状态: %s", self.what, self.retry_interval, exc)
+
+
+def connect_redis(redis_url: str) -> Any:
+    """
+    创建 redis.asyncio 客户端，连接与读写使用 SHARED_STATE_REDIS_TIMEOUT 秒的短超时
+
+    Redis 不可达（如丢包不回应）时调用在超时后失败，由 RedisGuard 切换到进程内退路，
+    而不是等待系统 TCP 超时。
+
+    Raises:
+        ImportError: 未安装 redis
+    """
+    import redis.asyncio as redis
+
+    timeout = get_settings().shared_state_redis_timeout
+    return redis.from_url(redis_url, socket_connect_timeout=timeout, socket_timeout=timeout)
+
+
+_shared_redis: Any = None
+
+
+def get_shared_redis() -> Any:
+    """SHARED_STATE_BACKEND=redis 时返回共享的 redis.asyncio 客户端，否则返回 None"""
+    global _shared_redis
+    settings = get_settings()
+    if settings.shared_state_backend != "redis":
+        return None
+    if _shared_redis is None:
+        try:
+            _shared_redis = connect_redis(settings.redis_url)
+        except ImportError:
+            logger.warning("未安装 redis，跨进程共享状态不可用")
+            return None
+    return _shared_redis
+
+
+class RedisBreakerState:
+    """
+    熔断器的跨进程状态：失败计数与熔断截止时间存放在 Redis 中。
+
+    各进程的熔断器仍在本地判断是否放行，只在失败/恢复时上报，并按间隔拉取其他进程打开的熔断。
+    """
+
+    def __init__(self, client: Any, prefix: str = "qsm:breaker:", retry_interval: float = 5.0):
+        self.prefix = prefix
+        self.guard = RedisGuard("熔断状态", retry_interval)
+        self._failure = client.register_script(BREAKER_FAILURE_SCRIPT)
+        self._state = client.register_script(BREAKER_STATE_SCRIPT)
+        self._success = client.register_script(BREAKER_SUCCESS_SCRIPT)
+
+    def _keys(self, name: str) -> list:
+        return [f"{self.prefix}{name}:failures", f"{self.prefix}{name}:open"]
+
+    async def report_failure(
+        self, name: str, threshold: int, reset_timeout: float, trip: bool = False
+    ) -> Optional[float]:
+        """
+        Args:
+            trip: 不论失败计数直接打开熔断（半开试探失败时）
+
+        Returns:
+            全局熔断剩余秒数（0 表示未熔断）；Redis 不可用时为 None
+        """
+        if not self.guard.usable:
+            return None
+        try:
+            result = await self._failure(keys=self._keys(name), args=[threshold, int(reset_timeout * 1000), 1 if trip else 0])
+        except Exception as e:
+            self.guard.failed(e)
+            return None
+        return float(_text(result))
+
+    async def report_success(self, name: str) -> None:
+        if not self.guard.usable:
+            return
+        try:
+            await self._success(keys=self._keys(name), args=[])
+        except Exception as e:
+            self.guard.failed(e)
+
+    async def fetch(self, name: str) -> Optional[Tuple[float, int]]:
+        """
+        Returns:
+            (全局熔断剩余秒数, 失败计数)；Redis 不可用时为 None
+        """
+        if not self.guard.usable:
+            return None
+        try:
+            remaining, failures = await self._state(keys=self._keys(name), args=[])
+        except Exception as e:
+            self.guard.failed(e)
+            return None
+        return float(_text(remaining)), int(float(_text(failures)))
@@ -0,0 +1,39 @@
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict
+
+import jinja2
+from markupsafe import Markup
+
+# 模板中 {{ stream_flush }} 输出的标记：之前的内容立即发送给客户端，标记本身不输出。
+# 非流式渲染时该变量未定义，输出为空。
+STREAM_FLUSH = Markup("<!--stream-flush-->")
+
+
+def create_stream_environment(directory: Path, **globals_: Any) -> jinja2.Environment:
+    """与 Jinja2Templates 使用同一模板目录与转义规则的异步环境，用于流式渲染"""
+    env = jinja2.Environment(
+        loader=jinja2.FileSystemLoader(str(directory)),
+        autoescape=True,
+        enable_async=True,
+    )
+    env.globals.update(globals_)
+    return env
+
+
+async def stream_template(template: jinja2.Template, context: Dict[str, Any]) -> AsyncIterator[bytes]:
+    """
+    异步渲染模板并按 {{ stream_flush }} 分段输出
+
+    模板可以直接迭代上下文中的异步迭代器（如按完成顺序到达的首页分区），
+    每到一个 flush 标记就把已渲染的内容作为一个响应块发出，避免逐个小片段写出。
+    """
+    buffer = []
+    async for chunk in template.generate_async({**context, "stream_flush": STREAM_FLUSH}):
+        if chunk == STREAM_FLUSH:
+            if buffer:
+                yield "".join(buffer).encode("utf-8")
+                buffer.clear()
+            continue
+        buffer.append(chunk)
+    if buffer:
+        yield "".join(buffer).encode("utf-8")
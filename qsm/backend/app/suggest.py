@@ -0,0 +1,265 @@
+import heapq
+import re
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from . import metrics
+from .config import get_settings
+from .token_bucket import MemoryTokenBuckets
+
+try:
+    from pypinyin import lazy_pinyin
+except ImportError:
+    lazy_pinyin = None
+
+_WORD_RE = re.compile(r"\w+")
+_CJK_RE = re.compile(r"[㐀-鿿]")
+_LINK_RE = re.compile(r"://|www\.|@|\.(?:com|net|org|cn|io|me|cc|xyz|top)\b", re.IGNORECASE)
+# 除整个标题外，最多再为后面几个单词建立前缀（"dark" 也能联想到 "The Dark Knight"）
+MAX_WORD_STARTS = 4
+# 收录为热门搜索词的最大长度（字符）；更长的多为粘贴的链接或整段文字
+MAX_QUERY_LENGTH = 40
+
+Owner = Tuple[str, Any]
+
+
+def normalize_key(text: str) -> str:
+    """NFKC 归一化、转小写并去掉空白与标点，用作前缀匹配的键"""
+    return "".join(_WORD_RE.findall(unicodedata.normalize("NFKC", text or "").lower()))
+
+
+def title_keys(title: str) -> List[str]:
+    """
+    标题的全部索引键：完整标题、后续单词起始的后缀，
+    安装 pypinyin 时中文标题另加全拼与首字母
+    """
+    words = _WORD_RE.findall(unicodedata.normalize("NFKC", title or "").lower())
+    keys = ["".join(words[i:]) for i in range(min(len(words), MAX_WORD_STARTS + 1))]
+    if lazy_pinyin is not None and _CJK_RE.search(title or ""):
+        syllables = [normalize_key(s) for s in lazy_pinyin(title)]
+        keys.append("".join(syllables))
+        keys.append("".join(s[0] for s in syllables if s))
+    return [k for k in dict.fromkeys(keys) if k]
+
+
+@dataclass(slots=True)
+class Suggestion:
+    """索引中的一条：TMDB 条目（movie / tv）或热门搜索词（query）"""
+
+    kind: str
+    id: Any
+    title: str
+    year: str
+    weight: float
+    texts: Tuple[str, ...]
+    keys: Tuple[str, ...]
+
+    def to_dict(self) -> Dict[str, Any]:
+        if self.kind == "query":
+            return {"query": self.title, "count": int(self.weight)}
+        return {"id": self.id, "media_type": self.kind, "title": self.title, "year": self.year}
+
+
+class SuggestIndex:
+    """
+    标题联想的内存前缀索引
+
+    所有索引键与所属条目以 (键, 条目) 元组保存在一个有序列表中，查询时二分定位前缀起点后顺序扫描，
+    最多检查 max_scan 个键；新条目用 insort 增量插入。条目数超过 max_entries 时淘汰最久未更新的。
+    热门搜索词来自用户输入，被搜索至少 query_min_count 次后才出现在联想结果中。
+    """
+
+    def __init__(self, max_entries: int = 50_000, max_scan: int = 500, query_min_count: int = 1):
+        self.max_entries = max_entries
+        self.max_scan = max_scan
+        self.query_min_count = query_min_count
+        self._keys: List[Tuple[str, Owner]] = []
+        self._entries: "OrderedDict[Owner, Suggestion]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _put(self, owner: Owner, title: str, texts: Tuple[str, ...], year: str, weight: float) -> None:
+        entry = self._entries.get(owner)
+        if entry is not None and entry.texts == texts:
+            # 标题未变时不重新计算索引键（详情页、首页会反复提交同一条目）
+            entry.weight = max(entry.weight, weight)
+            entry.year = entry.year or year
+            self._entries.move_to_end(owner)
+            return
+        if entry is not None:
+            self._remove(owner)
+        keys = tuple(dict.fromkeys(k for text in texts for k in title_keys(text)))
+        self._entries[owner] = Suggestion(owner[0], owner[1], title, year, weight, texts, keys)
+        for key in keys:
+            insort(self._keys, (key, owner))
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, owner: Owner) -> None:
+        entry = self._entries.pop(owner)
+        for key in entry.keys:
+            i = bisect_left(self._keys, (key, owner))
+            if i < len(self._keys) and self._keys[i] == (key, owner):
+                del self._keys[i]
+
+    def add_item(self, item: Dict[str, Any], media_type: Optional[str] = None) -> None:
+        """
+        收录一个 TMDB 条目（分区、搜索结果或详情）
+
+        Args:
+            item: TMDB 返回的条目
+            media_type: 条目本身不带 media_type 时（如详情接口）由调用方指定
+        """
+        kind = item.get("media_type") or media_type or ("movie" if "title" in item else "tv")
+        title = item.get("title") or item.get("name")
+        if kind not in ("movie", "tv") or not item.get("id") or not title:
+            return
+        original = item.get("original_title") or item.get("original_name") or ""
+        texts = (title, original) if original and original != title else (title,)
+        date_field = item.get("release_date") or item.get("first_air_date") or ""
+        self._put((kind, item["id"]), title, texts, date_field[:4], float(item.get("popularity") or 0))
+
+    def add_items(self, items: Iterable[Dict[str, Any]], media_type: Optional[str] = None) -> None:
+        for item in items:
+            self.add_item(item, media_type)
+
+    def add_query(self, query: str) -> None:
+        """
+        记录一次有结果的搜索，按次数作为热门搜索词的权重
+
+        过长或像链接、邮箱的输入不收录。
+        """
+        query = " ".join((query or "").split())
+        key = normalize_key(query)
+        if not key or len(query) > MAX_QUERY_LENGTH or _LINK_RE.search(query):
+            return
+        owner = ("query", key)
+        entry = self._entries.get(owner)
+        self._put(owner, query, (query,), "", (entry.weight if entry else 0) + 1)
+
+    def search(self, prefix: str, limit: int = 10) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        前缀查询
+
+        Returns:
+            (条目, 热门搜索词)，各自按权重降序，最多 limit 个
+        """
+        key = normalize_key(prefix)
+        if not key:
+            return [], []
+        owners = {}
+        i = bisect_left(self._keys, (key,))
+        end = min(len(self._keys), i + self.max_scan)
+        while i < end and self._keys[i][0].startswith(key):
+            owners[self._keys[i][1]] = None
+            i += 1
+        items, queries = [], []
+        for owner in owners:
+            entry = self._entries[owner]
+            if owner[0] != "query":
+                items.append(entry)
+            elif entry.weight >= self.query_min_count:
+                queries.append(entry)
+
+        def top(entries: List[Suggestion]) -> List[Dict[str, Any]]:
+            return [e.to_dict() for e in heapq.nlargest(limit, entries, key=lambda e: e.weight)]
+
+        return top(items), top(queries)
+
+
+class TmdbFallbackGate:
+    """
+    本地无匹配时回源 TMDB 搜索的准入控制
+
+    - 归一化后短于 min_length 的前缀不回源（单个字母几乎总能匹配到无关结果）；
+    - 回源后仍无匹配的前缀记入负缓存 negative_ttl 秒，期间该前缀及以它开头的更长输入都不再回源；
+    - 回源次数受全进程共用的令牌桶限制（每秒 rate 次，突发 burst 次），超出时只返回本地结果。
+    """
+
+    BUCKET_KEY = "suggest:tmdb"
+
+    def __init__(
+        self,
+        min_length: int = 2,
+        negative_ttl: float = 300.0,
+        rate: float = 2.0,
+        burst: float = 10.0,
+        max_entries: int = 10_000,
+    ):
+        self.min_length = min_length
+        self.negative_ttl = negative_ttl
+        self.rate = rate
+        self.burst = burst
+        self.max_entries = max_entries
+        self._misses: "OrderedDict[str, float]" = OrderedDict()
+        self._buckets = MemoryTokenBuckets(max_keys=1)
+
+    def _negative(self, key: str) -> bool:
+        now = time.monotonic()
+        for end in range(self.min_length, len(key) + 1):
+            expires = self._misses.get(key[:end])
+            if expires is None:
+                continue
+            if now < expires:
+                return True
+            del self._misses[key[:end]]
+        return False
+
+    async def admit(self, key: str) -> bool:
+        """
+        判断该前缀是否可以回源 TMDB，可以时扣减一次回源额度
+
+        Args:
+            key: normalize_key 归一化后的前缀
+        """
+        if len(key) < self.min_length:
+            metrics.SUGGEST_SKIPPED_SHORT.inc()
+            return False
+        if self._negative(key):
+            metrics.SUGGEST_SKIPPED_NEGATIVE.inc()
+            return False
+        if await self._buckets.take(self.BUCKET_KEY, 1, self.rate, self.burst) > 0:
+            metrics.SUGGEST_SKIPPED_BUDGET.inc()
+            return False
+        return True
+
+    def miss(self, key: str) -> None:
+        """记录回源后仍无匹配的前缀"""
+        self._misses[key] = time.monotonic() + self.negative_ttl
+        self._misses.move_to_end(key)
+        while len(self._misses) > self.max_entries:
+            self._misses.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._misses)
+
+
+_index: Optional[SuggestIndex] = None
+_gate: Optional[TmdbFallbackGate] = None
+
+
+def get_suggest_index() -> SuggestIndex:
+    global _index
+    if _index is None:
+        settings = get_settings()
+        _index = SuggestIndex(settings.suggest_max_entries, query_min_count=settings.suggest_query_min_count)
+        metrics.SUGGEST_ENTRIES.set_function(lambda: len(_index))
+    return _index
+
+
+def get_tmdb_fallback_gate() -> TmdbFallbackGate:
+    global _gate
+    if _gate is None:
+        settings = get_settings()
+        _gate = TmdbFallbackGate(
+            settings.suggest_tmdb_min_length,
+            settings.suggest_negative_ttl,
+            settings.suggest_tmdb_rate,
+            settings.suggest_tmdb_burst,
+        )
+    return _gate
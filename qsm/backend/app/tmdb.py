@@ -1,11 +1,19 @@
 from __future__ import annotations
 
 import asyncio
-from typing import Any, Dict, List, Optional
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
 import httpx
 
+from . import metrics
+from .circuit_breaker import get_breaker
 from .config import get_settings
+from .deadline import DeadlineExceeded, within_deadline
+from .hedging import HedgeBudget, LatencyStats, LatencyTracker, endpoint_key
+from .quark.core.cache import generate_cache_key, get_cache
+from .scheduler import UpstreamRejected, get_scheduler
+from .tracing import span
 
 DEFAULT_POSTER_SIZE = "w500"
 DEFAULT_BACKDROP_SIZE = "w780"
@@ -25,6 +33,15 @@ GENRE_TONE = {
 }
 
 
+class TmdbUnavailable(httpx.TransportError):
+    """TMDB 熔断器打开时快速失败，沿用调用方对 httpx.HTTPError 的处理"""
+
+
+def _upstream_failure(resp: httpx.Response) -> bool:
+    """上游故障类响应（与熔断器口径一致）：5xx 与 429"""
+    return resp.status_code >= 500 or resp.status_code == 429
+
+
 class TmdbClient:
     def __init__(
         self,
@@ -42,8 +59,17 @@ class TmdbClient:
         self._client = httpx.AsyncClient(
             base_url=self.api_base,
             headers={"Accept": "application/json"},
-            timeout=10.0,
+            timeout=settings.tmdb_timeout,
+        )
+        self.latency = LatencyTracker(
+            min_timeout=settings.tmdb_timeout_min,
+            max_timeout=settings.tmdb_timeout,
+            multiplier=settings.tmdb_timeout_p95_multiplier,
+            min_hedge_delay=settings.tmdb_hedge_min_delay,
         )
+        self.hedging = settings.tmdb_hedge_enabled
+        self.hedge_budget = HedgeBudget(settings.tmdb_hedge_budget_ratio)
+        self.breaker = get_breaker("tmdb")
 
     async def close(self) -> None:
         await self._client.aclose()
@@ -52,10 +78,83 @@ class TmdbClient:
         params = params or {}
         params.setdefault("api_key", self.api_key)
         params.setdefault("language", self.language)
-        resp = await self._client.get(path, params=params)
-        resp.raise_for_status()
+        if not self.breaker.allow():
+            raise TmdbUnavailable(f"TMDB circuit open, retry in {self.breaker.retry_after():.0f}s")
+        endpoint = endpoint_key(path)
+        stats = self.latency.stats(endpoint)
+        start = time.perf_counter()
+        try:
+            with span("tmdb", endpoint):
+                # 请求设置了截止时间时，到期即取消排队中或进行中的调用（含对冲请求）
+                resp = await within_deadline(self._hedged_get(path, params, stats))
+                resp.raise_for_status()
+        except (DeadlineExceeded, UpstreamRejected):
+            # 截止时间与本地调度丢弃都不是上游故障
+            raise
+        except httpx.HTTPStatusError as exc:
+            metrics.TMDB_ERRORS.inc()
+            # 404 等客户端错误说明上游可用，只有 5xx / 429 计入熔断
+            if _upstream_failure(exc.response):
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            raise
+        except Exception:
+            metrics.TMDB_ERRORS.inc()
+            self.breaker.record_failure()
+            raise
+        finally:
+            metrics.TMDB_FETCH.observe(time.perf_counter() - start)
+        self.breaker.record_success()
         return resp.json()
 
+    async def _fetch(self, path: str, params: Dict[str, Any], stats: LatencyStats, timeout: float) -> httpx.Response:
+        async with get_scheduler("tmdb").slot():
+            start = time.perf_counter()
+            try:
+                resp = await self._client.get(path, params=params, timeout=timeout)
+            except httpx.TimeoutException:
+                stats.record(timeout)
+                raise
+            stats.record(time.perf_counter() - start)
+        return resp
+
+    async def _hedged_get(self, path: str, params: Dict[str, Any], stats: LatencyStats) -> httpx.Response:
+        """
+        超时取端点滚动 p95 的倍数；主请求超过 p95 仍未返回时，
+        在对冲预算允许且调度器无排队的情况下再发一次，取先成功的结果。
+        """
+        timeout = self.latency.timeout_for(stats)
+        hedge_delay = self.latency.hedge_delay_for(stats) if self.hedging else None
+        self.hedge_budget.on_request()
+        if hedge_delay is None:
+            return await self._fetch(path, params, stats, timeout)
+
+        primary = asyncio.ensure_future(self._fetch(path, params, stats, timeout))
+        pending = {primary}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=hedge_delay)
+            if done or get_scheduler("tmdb").queued() or not self.hedge_budget.try_spend():
+                return await primary
+            pending.add(asyncio.ensure_future(self._fetch(path, params, stats, timeout)))
+            metrics.TMDB_RETRIES.inc()
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    # 5xx / 429 与异常一样视为失败，继续等另一个请求，避免快速失败的响应抢先取消可能成功的请求
+                    if task.exception() is None and not _upstream_failure(task.result()):
+                        return task.result()
+            # 两次都失败时返回主请求的结果（错误响应或异常）
+            return primary.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def ping(self) -> bool:
+        """健康探测：请求体积很小的 /configuration，失败时抛出 httpx.HTTPError"""
+        await self._get("/configuration")
+        return True
+
     async def trending(self, media_type: str = "all", window: str = "week") -> List[Dict[str, Any]]:
         data = await self._get(f"/trending/{media_type}/{window}")
         return data.get("results", [])
@@ -102,7 +201,17 @@ class TmdbClient:
         }
         if language_override:
             params["language"] = language_override
-        return await self._get(f"/{media_type}/{item_id}", params=params)
+        cache = get_cache()
+        cache_key = generate_cache_key(
+            "tmdb:details", media_type=media_type, item_id=item_id, language=language_override or self.language
+        )
+        cached = await cache.get(cache_key)
+        if cached:
+            # 调用方会改写返回值（如补充英文视频），返回浅拷贝以免污染缓存
+            return dict(cached)
+        data = await self._get(f"/{media_type}/{item_id}", params=params)
+        await cache.set(cache_key, data, get_settings().tmdb_cache_ttl)
+        return dict(data)
 
     async def person(
         self, person_id: int, language_override: Optional[str] = None
@@ -160,16 +269,43 @@ def adapt_poster(item: Dict[str, Any], client: TmdbClient) -> Dict[str, Any]:
     }
 
 
-async def gather_sections(client: TmdbClient) -> Dict[str, List[Dict[str, Any]]]:
-    trending, popular, top_rated, now_playing = await asyncio.gather(
-        client.trending("all", "week"),
-        client.movies("popular"),
-        client.movies("top_rated"),
-        client.movies("now_playing"),
-    )
+SECTION_KEYS = ("trending", "popular", "top_rated", "now_playing")
+
+
+def _section_calls(client: TmdbClient) -> Dict[str, Any]:
     return {
-        "trending": trending,
-        "popular": popular,
-        "top_rated": top_rated,
-        "now_playing": now_playing,
+        "trending": client.trending("all", "week"),
+        "popular": client.movies("popular"),
+        "top_rated": client.movies("top_rated"),
+        "now_playing": client.movies("now_playing"),
     }
+
+
+async def iter_sections(client: TmdbClient) -> AsyncIterator[Tuple[str, List[Dict[str, Any]]]]:
+    """
+    并发请求首页各分区，按完成顺序逐个返回
+
+    Returns:
+        (分区名, 条目列表) 的异步迭代器；单个分区请求失败时该分区为空列表，不影响其他分区
+    """
+
+    async def fetch(key: str, call: Any) -> Tuple[str, List[Dict[str, Any]]]:
+        try:
+            return key, await call
+        except httpx.HTTPError:
+            return key, []
+
+    tasks = [asyncio.ensure_future(fetch(key, call)) for key, call in _section_calls(client).items()]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # 客户端断开时流式响应提前结束，未完成的分区请求一并取消
+        for task in tasks:
+            task.cancel()
+
+
+async def gather_sections(client: TmdbClient) -> Dict[str, List[Dict[str, Any]]]:
+    calls = _section_calls(client)
+    results = await asyncio.gather(*calls.values())
+    return dict(zip(calls, results))
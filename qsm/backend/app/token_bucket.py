@@ -0,0 +1,127 @@
+import time
+from typing import Dict, List, Optional
+
+from .shared_state import RedisGuard, connect_redis
+
+# 令牌桶脚本：按 Redis 服务器时间补充令牌，force=1 时强制扣减（允许透支到 -burst）。
+# 返回需要等待的秒数（字符串，避免 Lua 数字转整数回复时被截断），0 表示已扣减。
+_TAKE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local force = tonumber(ARGV[4])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1])
+local ts = tonumber(state[2])
+if tokens == nil or ts == nil then
+    tokens = burst
+    ts = now
+end
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if force == 1 then
+    tokens = math.max(-burst, tokens - cost)
+elseif tokens >= cost then
+    tokens = tokens - cost
+else
+    wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil((burst * 2) / rate) + 1)
+return tostring(wait)
+"""
+
+
+class MemoryTokenBuckets:
+    """进程内令牌桶集合，按 key 独立计量"""
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        # key -> [令牌数, 上次更新时间]
+        self._buckets: Dict[str, List[float]] = {}
+
+    def _refill(self, key: str, rate: float, burst: float, now: float) -> List[float]:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_keys:
+                self._prune(now, rate, burst)
+            bucket = self._buckets[key] = [burst, now]
+        else:
+            bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+        return bucket
+
+    def _prune(self, now: float, rate: float, burst: float) -> None:
+        # 已经补满的桶与不存在等价，可以直接丢弃
+        full_after = burst * 2 / rate if rate > 0 else float("inf")
+        stale = [key for key, (_, ts) in self._buckets.items() if now - ts >= full_after]
+        for key in stale:
+            del self._buckets[key]
+
+    async def take(self, key: str, cost: float, rate: float, burst: float) -> float:
+        """
+        尝试扣减 cost 个令牌
+
+        Returns:
+            0 表示已扣减；否则为令牌足够前需要等待的秒数（本次不扣减）
+        """
+        bucket = self._refill(key, rate, burst, time.monotonic())
+        if bucket[0] >= cost:
+            bucket[0] -= cost
+            return 0.0
+        return (cost - bucket[0]) / rate if rate > 0 else float("inf")
+
+    async def charge(self, key: str, cost: float, rate: float, burst: float) -> None:
+        """事后强制扣减（最多透支到 -burst），用于请求结束后才知道的额外成本"""
+        bucket = self._refill(key, rate, burst, time.monotonic())
+        bucket[0] = max(-burst, bucket[0] - cost)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class RedisTokenBuckets:
+    """
+    基于 Redis 的令牌桶，多个 worker / 容器共享同一组桶。
+
+    扣减在 Lua 脚本内原子完成并使用 Redis 服务器时间；Redis 不可用时退回进程内令牌桶，
+    并在 retry_interval 秒后再尝试 Redis。
+    """
+
+    def __init__(self, redis_url: str, prefix: str = "qsm:bucket:", retry_interval: float = 5.0, client=None):
+        if client is None:
+            client = connect_redis(redis_url)
+        self._redis = client
+        self._script = client.register_script(_TAKE_SCRIPT)
+        self.prefix = prefix
+        self.guard = RedisGuard("令牌桶", retry_interval)
+        self.fallback = MemoryTokenBuckets()
+
+    @property
+    def degraded(self) -> bool:
+        """当前是否在使用进程内退路"""
+        return not self.guard.usable
+
+    async def _run(self, key: str, cost: float, rate: float, burst: float, force: bool) -> Optional[float]:
+        if self.degraded:
+            return None
+        try:
+            result = await self._script(keys=[self.prefix + key], args=[rate, burst, cost, 1 if force else 0])
+        except Exception as e:
+            self.guard.failed(e)
+            return None
+        if isinstance(result, bytes):
+            result = result.decode()
+        return float(result)
+
+    async def take(self, key: str, cost: float, rate: float, burst: float) -> float:
+        wait = await self._run(key, cost, rate, burst, force=False)
+        if wait is None:
+            return await self.fallback.take(key, cost, rate, burst)
+        return wait
+
+    async def charge(self, key: str, cost: float, rate: float, burst: float) -> None:
+        if await self._run(key, cost, rate, burst, force=True) is None:
+            await self.fallback.charge(key, cost, rate, burst)
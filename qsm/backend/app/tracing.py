@@ -0,0 +1,215 @@
+import contextvars
+import json
+import logging
+import time
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs
+
+from .config import get_settings
+from .logging_config import queued
+
+# 当前请求的追踪记录与当前父 span 下标；未在请求内（如后台任务）时为 None
+_trace: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar("request_trace", default=None)
+_parent: contextvars.ContextVar[int] = contextvars.ContextVar("trace_parent", default=-1)
+
+_slow_logger: Optional[logging.Logger] = None
+
+
+class Trace:
+    """单个请求内记录的 span 列表（按开始顺序），父子关系用下标表示"""
+
+    __slots__ = ("start", "spans")
+
+    def __init__(self) -> None:
+        self.start = time.perf_counter()
+        # [name, detail, start, duration, parent]
+        self.spans: List[list] = []
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+    def totals(self) -> Dict[str, float]:
+        """按名称汇总顶层耗时（嵌套在同名 span 内的不重复计算）"""
+        totals: Dict[str, float] = {}
+        for name, _, _, duration, parent in self.spans:
+            if parent >= 0 and self.spans[parent][0] == name:
+                continue
+            totals[name] = totals.get(name, 0.0) + duration
+        return totals
+
+    def server_timing(self) -> str:
+        parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.totals().items()]
+        parts.append(f"total;dur={self.elapsed() * 1000:.1f}")
+        return ", ".join(parts)
+
+    def tree(self) -> List[Dict[str, Any]]:
+        """span 树，时间单位为毫秒、相对请求开始"""
+        nodes = []
+        roots: List[Dict[str, Any]] = []
+        for name, detail, start, duration, parent in self.spans:
+            node: Dict[str, Any] = {
+                "name": name,
+                "start_ms": round((start - self.start) * 1000, 2),
+                "duration_ms": round(duration * 1000, 2),
+            }
+            if detail:
+                node["detail"] = detail
+            nodes.append(node)
+            if parent >= 0:
+                nodes[parent].setdefault("children", []).append(node)
+            else:
+                roots.append(node)
+        return roots
+
+
+class _Span:
+    __slots__ = ("name", "detail", "_trace", "_index", "_token")
+
+    def __init__(self, name: str, detail: Optional[str] = None):
+        self.name = name
+        self.detail = detail
+        self._trace: Optional[Trace] = None
+
+    def __enter__(self) -> "_Span":
+        trace = _trace.get()
+        if trace is not None:
+            self._trace = trace
+            self._index = len(trace.spans)
+            trace.spans.append([self.name, self.detail, time.perf_counter(), 0.0, _parent.get()])
+            self._token = _parent.set(self._index)
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        trace = self._trace
+        if trace is not None:
+            record = trace.spans[self._index]
+            record[3] = time.perf_counter() - record[2]
+            _parent.reset(self._token)
+
+
+def span(name: str, detail: Optional[str] = None) -> _Span:
+    """
+    记录一个阶段的耗时，用法: with span("quark", keyword): ...
+
+    不在请求内时不做任何记录；并发子任务继承创建时的父 span。
+    """
+    return _Span(name, detail)
+
+
+def record_span(name: str, start: float, detail: Optional[str] = None) -> None:
+    """记录一个已结束的阶段（start 为 time.perf_counter() 取得的开始时间）"""
+    trace = _trace.get()
+    if trace is not None:
+        trace.spans.append([name, detail, start, time.perf_counter() - start, _parent.get()])
+
+
+def _get_slow_logger() -> logging.Logger:
+    global _slow_logger
+    if _slow_logger is None:
+        settings = get_settings()
+        path = Path(settings.slow_log_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        handler = RotatingFileHandler(
+            path, maxBytes=settings.slow_log_max_bytes, backupCount=settings.slow_log_backup_count, encoding="utf-8"
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger = logging.getLogger("qsm.slowlog")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        # 写文件在后台线程进行，不阻塞事件循环
+        logger.addHandler(queued(handler))
+        _slow_logger = logger
+    return _slow_logger
+
+
+def _log_slow_request(scope: Dict[str, Any], status: int, trace: Trace, elapsed: float) -> None:
+    record = {
+        "ts": time.time(),
+        "method": scope.get("method"),
+        "path": scope.get("path"),
+        "query": scope.get("query_string", b"").decode("latin-1"),
+        "status": status,
+        "duration_ms": round(elapsed * 1000, 1),
+        "spans": trace.tree(),
+    }
+    _get_slow_logger().info(json.dumps(record, ensure_ascii=False))
+
+
+def _profile_requested(scope: Dict[str, Any]) -> bool:
+    query = scope.get("query_string", b"")
+    if b"profile" not in query:
+        return False
+    values = parse_qs(query.decode("latin-1")).get("profile", [])
+    return bool(values) and values[-1] in ("1", "true")
+
+
+class TracingMiddleware:
+    """
+    为每个请求建立追踪记录：响应头附加 Server-Timing；
+    PROFILE_ENABLED 时 ?profile=1 把 span 树附加到 JSON 响应的 profile 字段；
+    超过 SLOW_LOG_THRESHOLD 的请求写入滚动慢日志。
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+        settings = get_settings()
+        self.profile_enabled = settings.profile_enabled
+        self.slow_threshold = settings.slow_log_threshold
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace()
+        token = _trace.set(trace)
+        profile = self.profile_enabled and _profile_requested(scope)
+        status = 0
+        start_message: Optional[Dict[str, Any]] = None
+        body_parts: List[bytes] = []
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            nonlocal status, start_message
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if profile:
+                    # 等响应体完整后再决定是否改写，先暂存响应头
+                    start_message = message
+                    return
+                message["headers"] = [*message.get("headers", []), (b"server-timing", trace.server_timing().encode())]
+            elif message["type"] == "http.response.body" and start_message is not None:
+                body_parts.append(message.get("body", b""))
+                if message.get("more_body"):
+                    return
+                await self._send_profiled(send, start_message, b"".join(body_parts), trace)
+                return
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _trace.reset(token)
+            elapsed = trace.elapsed()
+            if self.slow_threshold > 0 and elapsed >= self.slow_threshold:
+                try:
+                    _log_slow_request(scope, status, trace, elapsed)
+                except OSError:
+                    pass
+
+    async def _send_profiled(self, send, start_message: Dict[str, Any], body: bytes, trace: Trace) -> None:
+        headers = [(k, v) for k, v in start_message.get("headers", []) if k.lower() != b"content-length"]
+        content_type = next((v for k, v in headers if k.lower() == b"content-type"), b"")
+        if content_type.startswith(b"application/json"):
+            try:
+                payload = json.loads(body)
+            except ValueError:
+                payload = None
+            if isinstance(payload, dict):
+                payload["profile"] = {"total_ms": round(trace.elapsed() * 1000, 2), "spans": trace.tree()}
+                body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        headers.append((b"content-length", str(len(body)).encode()))
+        headers.append((b"server-timing", trace.server_timing().encode()))
+        await send({**start_message, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,46 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("TMDB_API_KEY", "test")
+
+from app.quark.core.dedup import cluster_resources, numeric_tokens
+from app.quark.core.quark_client import QuarkResource
+
+
+def resource(i, name, size="1.2GB"):
+    return QuarkResource(id=i, name=name, link=f"https://pan.quark.cn/s/{i}", size=size, updatetime="")
+
+
+def test_mirrors_merge():
+    """同一资源的不同分享（只差标点与分隔符）合并为一簇"""
+    clusters = cluster_resources([
+        resource(1, "流浪地球2.2023.2160p.WEB-DL.H265.国语中字"),
+        resource(2, "流浪地球2 2023 2160p WEB-DL H265 国语中字"),
+    ])
+    assert len(clusters) == 1
+    assert len(clusters[0].alternates) == 1
+
+
+def test_episodes_stay_separate():
+    """只差集数的同体积剧集不能合并"""
+    names = [f"繁花.Blossoms.Shanghai.S01E{n:02d}.2023.2160p.WEB-DL.H265.DDP5.1.国语中字" for n in range(1, 11)]
+    names += [f"三体 第{n}集 4K 60帧 高码率 国语中字 2023 腾讯视频版" for n in range(1, 11)]
+    names += [f"狂飙 第{cn}集 1080P 国语中字" for cn in ("三", "四", "十二", "二十")]
+    clusters = cluster_resources([resource(i, name) for i, name in enumerate(names)])
+    assert len(clusters) == len(names)
+
+
+def test_empty_names_do_not_merge():
+    """归一化后为空的名称只按链接去重"""
+    resources = [resource(i, name, size="") for i, name in enumerate(["", "...", "【】", "- _ -"])]
+    resources.append(resource(0, "", size=""))
+    clusters = cluster_resources(resources)
+    assert len(clusters) == 4
+    assert [len(c.alternates) for c in clusters] == [1, 0, 0, 0]
+
+
+def test_numeric_tokens():
+    assert numeric_tokens("繁花 S01E03 2023") == numeric_tokens("繁花.s01e3.2023")
+    assert numeric_tokens("狂飙 第十二集") == (12,)
+    assert numeric_tokens("某剧 第一百零五话") == (105,)
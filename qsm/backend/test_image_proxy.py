@@ -0,0 +1,67 @@
+import asyncio
+import os
+import sys
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.image_proxy import ImageNotFound, ImageProxy
+
+SIZES = frozenset({"w500", "w780"})
+
+
+def make_proxy(tmp_path, max_bytes=1024 * 1024):
+    """上游替换为本地 MockTransport，记录每个路径被请求的次数"""
+    calls = {}
+
+    async def handler(request):
+        name = request.url.path.split("/t/p/", 1)[1]
+        calls[name] = calls.get(name, 0) + 1
+        await asyncio.sleep(0.02)
+        if name.endswith("missing.jpg"):
+            return httpx.Response(404)
+        return httpx.Response(200, content=name.encode() * 100, headers={"content-type": "image/jpeg"})
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    proxy = ImageProxy("http://images.test/t/p/", tmp_path, max_bytes, SIZES, client=client)
+    return proxy, calls
+
+
+def test_concurrent_misses_fetch_once(tmp_path):
+    """同一张图片的并发未命中只请求上游一次，之后从磁盘返回"""
+    proxy, calls = make_proxy(tmp_path)
+
+    async def scenario():
+        paths = await asyncio.gather(*(proxy.get("w500", "poster.jpg") for _ in range(10)))
+        again = await proxy.get("w500", "poster.jpg")
+        return paths, again
+
+    paths, again = asyncio.run(scenario())
+    assert calls == {"w500/poster.jpg": 1}
+    assert len(set(paths)) == 1 and again == paths[0]
+    assert paths[0].read_bytes() == b"w500/poster.jpg" * 100
+
+
+def test_lru_evicts_oldest_and_rejects_bad_paths(tmp_path):
+    """超过容量时删除最久未使用的文件；非法尺寸、路径与上游 404 均为 ImageNotFound"""
+    proxy, calls = make_proxy(tmp_path, max_bytes=2500)
+
+    async def scenario():
+        first = await proxy.get("w500", "a.jpg")
+        await proxy.get("w500", "b.jpg")
+        await proxy.get("w500", "a.jpg")
+        await proxy.get("w500", "c.jpg")
+        errors = 0
+        for size, path in [("w9999", "a.jpg"), ("w500", "..%2Fetc.jpg"), ("w500", "missing.jpg")]:
+            try:
+                await proxy.get(size, path)
+            except ImageNotFound:
+                errors += 1
+        return first, errors
+
+    first, errors = asyncio.run(scenario())
+    assert first.exists()
+    assert not (tmp_path / "w500" / "b.jpg").exists()
+    assert proxy.cache.total_bytes <= 2500
+    assert errors == 3
@@ -0,0 +1,122 @@
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("TMDB_API_KEY", "test")
+
+from app.deadline import deadline_scope
+from app.quark.schemas.search import SearchResponse
+from app.quark.services.search_service import SearchService
+from app.scheduler import Priority, UpstreamRejected, UpstreamScheduler, priority_scope
+
+
+def make_service(delay=0.05, scheduler=None):
+    """回源搜索替换为计数的慢速替身，不访问 TMDB 与夸克；给定 scheduler 时按当前优先级占用其槽位"""
+    service = SearchService()
+    calls = []
+
+    async def fake_search(tmdb_id, max_results, media_type, details, cache_key):
+        calls.append((media_type, tmdb_id))
+        if scheduler is None:
+            await asyncio.sleep(delay)
+        else:
+            async with scheduler.slot():
+                await asyncio.sleep(delay)
+        return SearchResponse(success=True, resources=[], total=0, message=f"{media_type}/{tmdb_id}")
+
+    service._search_tmdb = fake_search
+    return service, calls
+
+
+def test_concurrent_searches_share_one_upstream_run():
+    """预取与页面脚本同时请求同一条目时只回源一次，不同条目互不合并"""
+    service, calls = make_service()
+
+    async def scenario():
+        return await asyncio.gather(
+            *(service.search_by_tmdb_id(9001, 20, "movie") for _ in range(5)),
+            service.search_by_tmdb_id(9002, 20, "movie"),
+        )
+
+    results = asyncio.run(scenario())
+    assert calls == [("movie", 9001), ("movie", 9002)]
+    assert [r.message for r in results] == ["movie/9001"] * 5 + ["movie/9002"]
+    assert not service._inflight
+
+
+def test_follower_deadline_does_not_cancel_shared_search():
+    """后加入的调用方按自己的截止时间返回部分结果，发起方仍拿到完整结果"""
+    service, calls = make_service(delay=0.2)
+
+    async def follower():
+        await asyncio.sleep(0.01)
+        with deadline_scope(0.05):
+            return await service.search_by_tmdb_id(9003, 20, "tv")
+
+    async def scenario():
+        return await asyncio.gather(service.search_by_tmdb_id(9003, 20, "tv"), follower())
+
+    leader, late = asyncio.run(scenario())
+    assert calls == [("tv", 9003)]
+    assert leader.success and not leader.partial
+    assert late.partial and not late.success
+
+
+def test_leader_deadline_does_not_shorten_followers():
+    """发起方的短截止时间只影响它自己，后加入的调用方拿到完整结果"""
+    service, calls = make_service(delay=0.2)
+
+    async def leader():
+        with deadline_scope(0.05):
+            return await service.search_by_tmdb_id(9004, 20, "movie")
+
+    async def follower():
+        await asyncio.sleep(0.01)
+        return await service.search_by_tmdb_id(9004, 20, "movie")
+
+    async def scenario():
+        return await asyncio.gather(leader(), follower())
+
+    early, late = asyncio.run(scenario())
+    assert calls == [("movie", 9004)]
+    assert early.partial and not early.success
+    assert late.success and not late.partial
+
+
+def test_interactive_caller_is_not_held_behind_prefetch():
+    """
+    预取中的条目被页面请求时，页面请求按交互优先级另起搜索：
+    交互压力下预取被丢弃，页面请求仍然成功
+    """
+    scheduler = UpstreamScheduler("quark", concurrency=2, reserved=1)
+    service, calls = make_service(delay=0.05, scheduler=scheduler)
+
+    async def busy(release):
+        async with scheduler.slot(Priority.INTERACTIVE):
+            await release.wait()
+
+    async def prefetch():
+        with priority_scope(Priority.PREFETCH):
+            return await service.search_by_tmdb_id(9005, 20, "movie")
+
+    async def scenario():
+        release = asyncio.Event()
+        blockers = [asyncio.ensure_future(busy(release)) for _ in range(2)]
+        await asyncio.sleep(0)
+        prefetched = asyncio.ensure_future(prefetch())
+        await asyncio.sleep(0.01)
+        interactive = asyncio.ensure_future(service.search_by_tmdb_id(9005, 20, "movie"))
+        await asyncio.sleep(0.01)
+        # 更多交互请求排队，调度器丢弃排队中的预取
+        blockers.append(asyncio.ensure_future(busy(release)))
+        await asyncio.sleep(0.01)
+        release.set()
+        await asyncio.gather(*blockers)
+        return await asyncio.gather(prefetched, interactive, return_exceptions=True)
+
+    prefetched, interactive = asyncio.run(scenario())
+    assert calls == [("movie", 9005), ("movie", 9005)]
+    assert isinstance(prefetched, UpstreamRejected)
+    assert interactive.success and interactive.message == "movie/9005"
+    assert not service._inflight
@@ -0,0 +1,209 @@
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("TMDB_API_KEY", "test")
+
+from app.circuit_breaker import CLOSED, OPEN, CircuitBreaker
+from app.quark.core.rate_limiter import DistributedRateLimiter
+from app.shared_state import (
+    BREAKER_FAILURE_SCRIPT,
+    BREAKER_STATE_SCRIPT,
+    BREAKER_SUCCESS_SCRIPT,
+    RESERVE_SLOT_SCRIPT,
+    RedisBreakerState,
+)
+from app.token_bucket import RedisTokenBuckets
+
+
+class FakeRedis:
+    """
+    测试用 Redis 替身：register_script 按脚本内容返回等价的 Python 实现。
+
+    单线程事件循环内每次脚本调用不会被打断，与 Redis 执行 Lua 脚本一样是原子的；
+    多个 worker 共享同一个实例即模拟共享同一个 Redis。
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.expires = {}
+        self.down = False
+        self.calls = 0
+
+    def _get(self, key):
+        if key in self.expires and time.time() >= self.expires[key]:
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return self.data.get(key)
+
+    def _set(self, key, value, px=None):
+        self.data[key] = value
+        if px is None:
+            self.expires.pop(key, None)
+        else:
+            self.expires[key] = time.time() + px / 1000
+
+    def _pttl(self, key):
+        if self._get(key) is None:
+            return -2
+        if key not in self.expires:
+            return -1
+        return int((self.expires[key] - time.time()) * 1000)
+
+    def _delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+
+    def _reserve(self, keys, args):
+        interval = float(args[0])
+        now = time.time()
+        slot = max(now, float(self._get(keys[0]) or 0))
+        self._set(keys[0], str(slot + interval), px=(slot + interval - now) * 1000 + 1000)
+        return str(slot - now).encode()
+
+    def _breaker_failure(self, keys, args):
+        threshold, reset_ms, trip = int(args[0]), int(args[1]), int(args[2])
+        open_ttl = self._pttl(keys[1])
+        if open_ttl > 0:
+            return str(open_ttl / 1000).encode()
+        failures = int(self._get(keys[0]) or 0) + 1
+        self._set(keys[0], str(failures), px=reset_ms * 2)
+        if failures >= threshold or trip == 1:
+            self._set(keys[1], "1", px=reset_ms)
+            self._delete(keys[0])
+            return str(reset_ms / 1000).encode()
+        return b"0"
+
+    def _breaker_state(self, keys, args):
+        open_ttl = max(0, self._pttl(keys[1]))
+        return [str(open_ttl / 1000).encode(), str(self._get(keys[0]) or 0).encode()]
+
+    def _breaker_success(self, keys, args):
+        self._delete(*keys)
+        return b"0"
+
+    def register_script(self, source):
+        handler = {
+            RESERVE_SLOT_SCRIPT: self._reserve,
+            BREAKER_FAILURE_SCRIPT: self._breaker_failure,
+            BREAKER_STATE_SCRIPT: self._breaker_state,
+            BREAKER_SUCCESS_SCRIPT: self._breaker_success,
+        }[source]
+
+        async def script(keys, args):
+            if self.down:
+                raise ConnectionError("redis unavailable")
+            self.calls += 1
+            return handler(keys, args)
+
+        return script
+
+
+def _min_window(stamps, calls):
+    """任意连续 calls 次获取之间的最短跨度；每次获取不早于预约的时间槽，唤醒延迟只会让跨度变长"""
+    return min(b - a for a, b in zip(stamps, stamps[calls:]))
+
+
+async def _run_workers(limiters, calls_per_worker):
+    stamps = []
+
+    async def worker(limiter):
+        for _ in range(calls_per_worker):
+            await limiter.acquire()
+            stamps.append(time.monotonic())
+
+    await asyncio.gather(*(worker(limiter) for limiter in limiters))
+    return sorted(stamps)
+
+
+def test_distributed_limiter_global_rate():
+    """4 个 worker 各自的限速器共享同一个 Redis，合计速率不超过单个 interval 的限制"""
+    interval = 0.02
+    redis = FakeRedis()
+    limiters = [DistributedRateLimiter(interval, redis) for _ in range(4)]
+
+    stamps = asyncio.run(_run_workers(limiters, 10))
+
+    assert len(stamps) == 40
+    assert _min_window(stamps, 10) >= interval * 9
+    assert stamps[-1] - stamps[0] >= interval * 39 * 0.95
+    assert redis.calls == 40
+
+
+def test_distributed_limiter_falls_back_when_redis_down():
+    """Redis 不可用时退回进程内限速，单个 worker 仍保持 interval 间隔"""
+    interval = 0.02
+    redis = FakeRedis()
+    redis.down = True
+    limiter = DistributedRateLimiter(interval, redis, retry_interval=60)
+
+    stamps = asyncio.run(_run_workers([limiter], 10))
+
+    assert limiter.degraded
+    assert redis.calls == 0
+    assert _min_window(stamps, 5) >= interval * 4
+
+
+def test_unresponsive_redis_falls_back_within_timeout():
+    """
+    Redis 接受连接但从不回应（等同丢包）时，真实 redis 客户端在短超时后失败，
+    首个调用约 1 秒内退回进程内令牌桶，而不是挂起到系统 TCP 超时
+    """
+
+    async def scenario():
+        async def silent(reader, writer):
+            await reader.read()
+            writer.close()
+
+        server = await asyncio.start_server(silent, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        buckets = RedisTokenBuckets(f"redis://127.0.0.1:{port}/0", retry_interval=60)
+        start = time.monotonic()
+        wait = await buckets.take("client", 1, rate=1, burst=5)
+        elapsed = time.monotonic() - start
+        await buckets._redis.aclose()
+        server.close()
+        await server.wait_closed()
+        return wait, elapsed, buckets.degraded
+
+    wait, elapsed, degraded = asyncio.run(scenario())
+    assert wait == 0
+    assert degraded
+    assert elapsed < 1.0
+
+
+def test_shared_breaker_opens_across_workers():
+    """一个 worker 累计的失败打开熔断后，其他 worker 同步后也拒绝调用"""
+    redis = FakeRedis()
+
+    async def scenario():
+        a = CircuitBreaker("quark", failure_threshold=3, reset_timeout=30, shared=RedisBreakerState(redis))
+        b = CircuitBreaker("quark", failure_threshold=3, reset_timeout=30, shared=RedisBreakerState(redis),
+                           sync_interval=0)
+        for _ in range(3):
+            assert a.allow()
+            a.record_failure()
+        await asyncio.sleep(0)
+        assert a.state == OPEN
+
+        b.allow()
+        await asyncio.sleep(0)
+        assert b.state == OPEN
+        assert not b.allow()
+        assert 0 < b.retry_after() <= 30
+
+        # Redis 故障不影响本地熔断判断
+        redis.down = True
+        c = CircuitBreaker("quark", failure_threshold=1, reset_timeout=30, shared=RedisBreakerState(redis),
+                           sync_interval=0)
+        c.allow()
+        await asyncio.sleep(0)
+        assert c.state == CLOSED
+        c.record_failure()
+        await asyncio.sleep(0)
+        assert c.state == OPEN
+
+    asyncio.run(scenario())
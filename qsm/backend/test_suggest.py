@@ -0,0 +1,32 @@
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("TMDB_API_KEY", "test")
+
+from app.suggest import SuggestIndex, TmdbFallbackGate
+
+
+def test_popular_queries_need_repeats_and_plain_text():
+    """热门搜索词达到次数阈值后才展示，链接与过长输入不收录"""
+    index = SuggestIndex(query_min_count=3)
+    for query in ["Matrix", "matrix ", "https://example.com/matrix", "matrix " + "x" * 60]:
+        index.add_query(query)
+    assert index.search("mat") == ([], [])
+    index.add_query("Matrix")
+    assert index.search("mat")[1] == [{"query": "Matrix", "count": 3}]
+    assert len(index) == 1
+
+
+def test_tmdb_fallback_gate():
+    """过短前缀、负缓存中的前缀及其延伸、超出回源额度时都不回源"""
+    gate = TmdbFallbackGate(min_length=2, negative_ttl=60, rate=0.001, burst=2)
+
+    async def scenario():
+        results = [await gate.admit("a"), await gate.admit("zz")]
+        gate.miss("zz")
+        results += [await gate.admit("zz"), await gate.admit("zzq"), await gate.admit("ab"), await gate.admit("abc")]
+        return results
+
+    assert asyncio.run(scenario()) == [False, True, False, False, True, False]
@@ -0,0 +1,103 @@
+"""
+日志开销基准：对比旧写法（同步 StreamHandler + f-string）与新管线（队列 + 写线程 + 惰性格式化 + 限流）
+在调用线程（事件循环）上的耗时。
+
+用法（在 qsm 目录下）：
+    python -m scripts.bench_logging [搜索次数]
+
+模拟一次搜索产生的日志：3 条调用跟踪、1 条结果统计、100 条原始资源中 10 条解析失败告警。
+输出写到 os.devnull，只衡量调用方阻塞时间；新管线的写线程耗时不计入。
+"""
+
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+os.environ.setdefault("TMDB_API_KEY", "bench")
+
+from app.logging_config import JsonFormatter, RateLimitFilter, queued, stop_logging  # noqa: E402
+
+RAW = [{"id": i, "url": f"https://pan.quark.cn/s/{i:08x}", "title": f"资源 {i} 2160p"} for i in range(100)]
+FAILED = RAW[::10]
+
+
+def reset_root() -> logging.Logger:
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    return root
+
+
+def search_before(logger: logging.Logger, keyword: str) -> None:
+    """旧写法：每条日志立即格式化，解析失败逐条告警"""
+    logger.info(f"search_by_tmdb_id called: tmdb_id=603, max_results=20, media_type=movie")
+    logger.info(f"_search_common called: keyword={keyword}, max_results=20")
+    logger.info(f"夸克搜索找到 {len(RAW)} 个原始资源 (关键词: {keyword})")
+    for raw in FAILED:
+        link = raw["url"]
+        logger.warning(f"资源解析失败: invalid size, raw_id={raw.get('id')}, link={link[:50]}")
+    logger.info(f"解析成功: {len(RAW) - len(FAILED)}/{len(RAW)} (关键词: {keyword})")
+    logger.info(f"Quark client returned: {len(RAW)} resources")
+
+
+def search_after(logger: logging.Logger, keyword: str) -> None:
+    """新写法：调用跟踪降为 debug，参数惰性格式化，单条解析失败只记 debug"""
+    logger.debug("search_by_tmdb_id: tmdb_id=%s, max_results=%s, media_type=%s", 603, 20, "movie")
+    logger.debug("_search_common: keyword=%s, max_results=%s", keyword, 20)
+    logger.debug("夸克搜索找到 %d 个原始资源 (关键词: %s)", len(RAW), keyword)
+    for raw in FAILED:
+        logger.debug("资源解析失败: %s, raw_id=%s", "invalid size", raw.get("id"))
+    logger.info("解析成功: %d/%d (关键词: %s)", len(RAW) - len(FAILED), len(RAW), keyword)
+    logger.debug("_search_common: quark returned %d resources", len(RAW))
+
+
+def repeated_warning(logger: logging.Logger, n: int) -> None:
+    for i in range(n):
+        logger.warning("夸克搜索请求异常 (尝试 %d/%d): %s", 1, 3, "timeout")
+
+
+def timed(fn, *args) -> float:
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    searches = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    devnull = open(os.devnull, "w", encoding="utf-8")
+    logger = logging.getLogger("bench")
+
+    # 旧配置：basicConfig 风格的同步 StreamHandler
+    root = reset_root()
+    handler = logging.StreamHandler(devnull)
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    root.addHandler(handler)
+    root.setLevel(logging.INFO)
+    before = timed(lambda: [search_before(logger, f"电影{i % 50}") for i in range(searches)])
+    before_warn = timed(repeated_warning, logger, searches)
+
+    # 新配置：队列 + 写线程 + JSON + 限流
+    root = reset_root()
+    stream = logging.StreamHandler(devnull)
+    stream.setFormatter(JsonFormatter())
+    handler = queued(stream)
+    handler.addFilter(RateLimitFilter(limit=10, interval=60.0))
+    root.addHandler(handler)
+    root.setLevel(logging.INFO)
+    after = timed(lambda: [search_after(logger, f"电影{i % 50}") for i in range(searches)])
+    after_warn = timed(repeated_warning, logger, searches)
+    stop_logging()
+
+    print(f"模拟搜索 {searches} 次（调用线程耗时）")
+    print(f"  旧: {before * 1000:8.1f} ms  {before / searches * 1e6:7.1f} µs/次搜索")
+    print(f"  新: {after * 1000:8.1f} ms  {after / searches * 1e6:7.1f} µs/次搜索")
+    print(f"重复告警 {searches} 条")
+    print(f"  旧: {before_warn * 1000:8.1f} ms  {before_warn / searches * 1e6:7.1f} µs/条")
+    print(f"  新: {after_warn * 1000:8.1f} ms  {after_warn / searches * 1e6:7.1f} µs/条")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+资源记录内存与分配基准：10k 条资源从解析、打分到 DTO 构建前的内存占用与分配次数。
+
+用法（在 qsm 目录下）：
+    python -m scripts.bench_records [条数，默认 10000]
+
+对比对象是改为 slots 记录之前的实现：普通 dataclass 资源、每条资源重建一次的 item_dict、
+从字典读取字段并返回 11 个键打分明细字典（tags 排序成列表）的 score_item，以及基于 asdict 的
+to_dict。旧版 score_item 原样保留在本文件中（legacy_score_item），两边共用同一组打分子函数，
+差异只来自记录的表示方式。
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+import unicodedata
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+# quark_client 导入时读取配置，基准不访问 TMDB
+os.environ.setdefault("TMDB_API_KEY", "bench")
+
+from app.quark.core.enhanced_scoring import (  # noqa: E402
+    ARCHIVE_EXT,
+    DOC_EXT,
+    QueryMatcher,
+    alpha_from_conf,
+    extract_tags,
+    freshness_score,
+    intent_score,
+    name_features,
+    parse_size_to_gb,
+    plausibility_score,
+    popularity_score,
+    quality_score,
+    score_item,
+    text_similarity,
+)
+from app.quark.core.quark_client import QuarkResource  # noqa: E402
+
+QUERY = "流浪地球2"
+NAMES = [
+    "流浪地球2 4K HDR 杜比视界 国语中字 2023",
+    "流浪地球2 The Wandering Earth II 2160p WEB-DL H265 DDP5.1",
+    "流浪地球2 1080p BluRay x264 中英双字",
+    "流浪地球2 BDMV 原盘 REMUX",
+    "流浪地球 解说文案 合集",
+]
+SIZES = ["62.3GB", "18.4GB", "4.2GB", "71.9GB", "350MB"]
+
+
+@dataclass
+class LegacyResource:
+    """改动前的 QuarkResource：普通 dataclass，to_dict 走 asdict"""
+    id: int
+    name: str
+    link: str
+    size: str
+    updatetime: str
+    categoryid: int = 0
+    uploaderid: str = ""
+    views: int = 0
+
+    def to_dict(self):
+        return asdict(self)
+
+
+def legacy_score_item(query: str, item: dict, matcher: Optional[QueryMatcher] = None) -> Optional[Dict[str, Any]]:
+    """改动前的 score_item（原样保留）：从 item_dict 读取字段，返回打分明细字典"""
+    name = item.get("name", "")
+    size_gb = parse_size_to_gb(item.get("size", ""))
+    tags = extract_tags(name)
+    nl = unicodedata.normalize("NFKC", name).lower()
+
+    if any(ext in nl for ext in DOC_EXT): return None
+    if ".apk" in nl or ".exe" in nl or ".torrent" in nl: return None
+    if any(ext in nl for ext in ARCHIVE_EXT) and (size_gb is None or size_gb < 0.7): return None
+    if size_gb is not None and size_gb < 0.5 and ({"4k","bdmv","remux","bluray","dv","hdr"} & tags): return None
+
+    if matcher is not None:
+        c_text = matcher.similarity(name_features(name))
+    else:
+        c_text = text_similarity(query, name)
+    c_int = intent_score(name, size_gb, tags)
+    c_plaus = plausibility_score(name, size_gb, tags)
+
+    conf = c_text * (0.7 + 0.3 * (0.5 * c_int + 0.5 * c_plaus))
+    conf = max(0.0, min(1.0, conf))
+    if c_text < 0.25 or c_int == 0.0:
+        conf *= 0.15
+
+    qual = quality_score(tags, name, size_gb)
+
+    P = popularity_score(item.get("views", 0))
+    R = freshness_score(item.get("updatetime"))
+
+    zxd_high = (c_text >= 0.8 and c_int >= 0.8 and c_plaus >= 0.8)
+    plaus_low = (c_plaus < 0.4)
+    a = alpha_from_conf(conf, zxd_high=zxd_high, plaus_low=plaus_low)
+
+    pr_gate = 1.0 if conf >= 0.6 else (0.3 if conf >= 0.4 else 0.0)
+
+    score = a * conf + (1 - a) * qual + pr_gate * (0.10 * P + 0.05 * R)
+    if conf < 0.08:
+        score = conf
+
+    return {
+        "score": score,
+        "Conf": conf,
+        "Qual": qual,
+        "alpha": a,
+        "tags": sorted(tags),
+        "size_gb": size_gb,
+        "C_text": c_text,
+        "C_intent": c_int,
+        "C_plaus": c_plaus,
+        "P": P,
+        "R": R
+    }
+
+
+def raw_items(count: int):
+    return [
+        dict(
+            id=i,
+            # 名称特征按名称缓存（8192 条），名称重复使两边都命中缓存，只比较记录本身的开销
+            name=f"{NAMES[i % len(NAMES)]} [{i % 1000}]",
+            link=f"https://pan.quark.cn/s/{i:08x}",
+            size=SIZES[i % len(SIZES)],
+            updatetime="2025-12-01 10:00:00",
+            categoryid=1,
+            uploaderid=str(i % 97),
+            views=i % 500,
+        )
+        for i in range(count)
+    ]
+
+
+def legacy_pipeline(raws):
+    matcher = QueryMatcher(QUERY)
+    resources = [LegacyResource(**raw) for raw in raws]
+    scored = []
+    for r in resources:
+        item_dict = {
+            "name": r.name,
+            "link": r.link,
+            "size": r.size,
+            "updatetime": r.updatetime,
+            "categoryid": r.categoryid,
+            "uploaderid": r.uploaderid,
+            "views": r.views,
+            "search_keyword": QUERY,
+        }
+        breakdown = legacy_score_item(QUERY, item_dict, matcher=matcher)
+        if breakdown is not None:
+            scored.append((r, breakdown))
+    scored.sort(key=lambda x: x[1]["score"], reverse=True)
+    return resources, scored
+
+
+def slotted_pipeline(raws):
+    matcher = QueryMatcher(QUERY)
+    resources = [QuarkResource(**raw) for raw in raws]
+    scored = []
+    for r in resources:
+        b = score_item(QUERY, r, matcher)
+        if b is not None:
+            scored.append((r, b))
+    scored.sort(key=lambda x: x[1].score, reverse=True)
+    return resources, scored
+
+
+def measure(label, fn, raws):
+    """打印流水线结束时仍保留的内存、分配峰值、新增分配块数与（不开 tracemalloc 时的）耗时"""
+    fn(raws)  # 预热 name_features 缓存，两边计算量一致
+    start = time.perf_counter()
+    fn(raws)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    result = fn(raws)
+    after = tracemalloc.take_snapshot()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename") if stat.count_diff > 0)
+    print(f"{label:<8} 保留 {current / 1024:8.0f} KiB  峰值 {peak / 1024:8.0f} KiB  "
+          f"新增分配块 {blocks:>8}  耗时 {elapsed * 1000:7.1f} ms")
+    return result
+
+
+def bench_to_dict(resources, label):
+    start = time.perf_counter()
+    for r in resources:
+        r.to_dict()
+    print(f"{label:<8} to_dict {(time.perf_counter() - start) / len(resources) * 1e6:.2f} µs/条")
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    raws = raw_items(count)
+    print(f"{count} 条资源，查询 {QUERY!r}")
+
+    legacy_resources, legacy_scored = measure("legacy", legacy_pipeline, raws)
+    slotted_resources, slotted_scored = measure("slots", slotted_pipeline, raws)
+
+    # 结果一致性
+    legacy_ranked = [(r.link, d["score"], d["tags"]) for r, d in legacy_scored]
+    slotted_ranked = [(r.link, b.score, list(b.tags)) for r, b in slotted_scored]
+    if legacy_ranked != slotted_ranked:
+        raise SystemExit("FAIL 两种表示的打分结果不一致")
+    print(f"OK   {len(slotted_scored)} 条打分结果一致")
+
+    bench_to_dict(legacy_resources, "legacy")
+    bench_to_dict(slotted_resources, "slots")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+文本相似度微基准：对比 text_similarity 与 QueryMatcher 的结果与耗时。
+
+用法（在 qsm 目录下）：
+    python -m scripts.bench_text_similarity [quark_search_results.json]
+
+数据集默认读取仓库根目录的 quark_search_results.json（研究文档所用数据），
+每条记录使用 name 与 search_keyword 字段；文件不存在时退回内置样例。
+"""
+
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+
+from app.quark.core.enhanced_scoring import QueryMatcher, name_features, text_similarity  # noqa: E402
+
+DEFAULT_DATASET = Path(__file__).resolve().parents[2] / "quark_search_results.json"
+
+SAMPLE = [
+    ("流浪地球2", "流浪地球2 4K HDR 杜比视界 国语中字 2023 [62.3GB]"),
+    ("流浪地球2", "流浪地球2 The Wandering Earth II 2160p WEB-DL H265 DDP5.1"),
+    ("流浪地球2", "流浪地球 解说文案 合集.docx"),
+    ("Oppenheimer", "奥本海默 Oppenheimer 2023 IMAX 2160p BluRay REMUX HEVC"),
+    ("Oppenheimer", "Oppenheimer.2023.1080p.WEBRip.x264"),
+    ("三体", "三体 全30集 4K 60fps 高码率"),
+    ("三体", "三体 原著小说 听书"),
+    ("Avengers Endgame", "复仇者联盟4 Avengers.Endgame.2019.UHD.BluRay.2160p"),
+    ("沙丘2", "沙丘 Dune Part Two 2024 BDMV 原盘"),
+    ("繁花", "繁花 S01 2023 1080p 国语中字"),
+]
+
+
+def load_pairs(path: Path):
+    if not path.exists():
+        print(f"数据集 {path} 不存在，使用内置样例")
+        return list(SAMPLE)
+    raw = json.loads(path.read_text(encoding="utf-8"))
+    if isinstance(raw, dict):
+        raw = raw.get("list") or raw.get("results") or raw.get("data") or []
+        if isinstance(raw, dict):
+            raw = raw.get("list", [])
+    pairs = []
+    for item in raw:
+        name = item.get("name") or item.get("title") or ""
+        query = item.get("search_keyword") or item.get("keyword") or ""
+        if name and query:
+            pairs.append((query, name))
+    return pairs
+
+
+def main() -> None:
+    path = Path(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_DATASET
+    pairs = load_pairs(path)
+    rounds = max(1, 200_000 // max(1, len(pairs)))
+
+    # 结果一致性
+    for query, name in pairs:
+        expected = text_similarity(query, name)
+        actual = QueryMatcher(query).similarity(name_features(name))
+        if expected != actual:
+            raise SystemExit(f"FAIL mismatch query={query!r} name={name!r}: {expected} != {actual}")
+    print(f"OK   {len(pairs)} 对结果一致")
+
+    by_query = {}
+    for query, name in pairs:
+        by_query.setdefault(query, []).append(name)
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for query, names in by_query.items():
+            for name in names:
+                text_similarity(query, name)
+    baseline = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for query, names in by_query.items():
+            matcher = QueryMatcher(query)
+            for name in names:
+                matcher.similarity(name_features(name))
+    optimized = time.perf_counter() - start
+
+    total = rounds * len(pairs)
+    print(f"text_similarity: {baseline / total * 1e6:.2f} µs/对")
+    print(f"QueryMatcher:    {optimized / total * 1e6:.2f} µs/对 (x{baseline / optimized:.1f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+静态资源构建：为 static 下的 css / js / svg 生成带内容哈希的副本，并预压缩为 .gz / .br。
+
+用法（在 qsm 目录下）：
+    python scripts/build_static.py [--static-dir backend/app/static]
+
+输出写到 static/dist/，原始路径到指纹路径的映射写到 static/manifest.json，
+模板中的 asset_url('css/main.css') 据此返回 /static/dist/css/main.<hash>.css。
+未安装 brotli 时只生成 .gz。每次构建会清空 dist 目录。
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import shutil
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+SOURCE_SUFFIXES = {".css", ".js", ".svg"}
+DIST = "dist"
+MANIFEST_NAME = "manifest.json"
+
+
+def fingerprint(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=6).hexdigest()
+
+
+def write_compressed(path: Path, data: bytes) -> list:
+    """写入比原文件更小的预压缩版本，返回生成的文件"""
+    written = []
+    variants = [(".gz", gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append((".br", brotli.compress(data, quality=11)))
+    for suffix, compressed in variants:
+        if len(compressed) < len(data):
+            target = path.with_name(path.name + suffix)
+            target.write_bytes(compressed)
+            written.append(target)
+    return written
+
+
+def build(static_dir: Path) -> dict:
+    dist_dir = static_dir / DIST
+    if dist_dir.exists():
+        shutil.rmtree(dist_dir)
+
+    manifest = {}
+    for source in sorted(static_dir.rglob("*")):
+        if not source.is_file() or source.suffix not in SOURCE_SUFFIXES:
+            continue
+        relative = source.relative_to(static_dir)
+        if relative.parts[0] == DIST:
+            continue
+        data = source.read_bytes()
+        target = dist_dir / relative.with_name(f"{source.stem}.{fingerprint(data)}{source.suffix}")
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(data)
+        compressed = write_compressed(target, data)
+        manifest[relative.as_posix()] = target.relative_to(static_dir).as_posix()
+        sizes = ", ".join(f"{p.suffix[1:]} {p.stat().st_size}" for p in compressed)
+        print(f"{relative.as_posix()} -> {manifest[relative.as_posix()]} ({len(data)} B{'; ' + sizes if sizes else ''})")
+
+    (static_dir / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+    return manifest
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="生成带指纹与预压缩的静态资源")
+    parser.add_argument(
+        "--static-dir",
+        type=Path,
+        default=Path(__file__).resolve().parents[1] / "backend" / "app" / "static",
+        help="static 目录（默认 backend/app/static）",
+    )
+    args = parser.parse_args()
+    manifest = build(args.static_dir)
+    print(f"共 {len(manifest)} 个资源，清单写入 {args.static_dir / MANIFEST_NAME}")
+
+
+if __name__ == "__main__":
+    main()